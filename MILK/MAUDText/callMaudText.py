@@ -6,12 +6,13 @@ Created on Mon Oct 12 08:53:18 2020
 @author: danielsavage
 """
 
-from multiprocess import Pool, freeze_support
+from multiprocess import freeze_support
 from functools import partial
 import argparse
 import os
 import glob
 import shutil
+import signal
 import subprocess as sub
 import sys
 import tqdm
@@ -20,6 +21,12 @@ from prettytable import (PrettyTable, from_csv)
 import errno
 import time
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+from . import maudWorker
+from . import schedule
+from . import resultCache
+from . import telemetry
 try:
     maud_path_global = os.getenv('MAUD_PATH')
     maud_path_global = maud_path_global.strip("'")
@@ -55,6 +62,8 @@ def get_arguments(argsin):
                         help='Specify the maximum number of MAUD instance to run at the same time')
     parser.add_argument('--timeout', '-t', type=float, default=None,
                         help='Specify the timeout in seconds for a single MAUD batch call.')
+    parser.add_argument('--backend', '-b', choices=['process', 'worker'], default='process',
+                        help='process starts MAUD for every ins file, worker sends the ins files to long-lived MAUD processes kept for later calls')
     parser.add_argument('--maud_path', '-mp', required=False,
                         help='Specify the full path to the maud directory')
     parser.add_argument('--java_opt', '-jo', required=False,
@@ -63,6 +72,8 @@ def get_arguments(argsin):
                         help='Specify whether older step data should be removed')
     parser.add_argument('--cur_step', '-cs', required=True,
                         help='Specify the current step counter')
+    parser.add_argument('--cache', '-ca', default='False',
+                        help='Restore the archived step outputs of runs whose ins, par, data files and MAUD installation did not change instead of running MAUD')
     parser.add_argument('--simple_call', '-sc', default='False',
                         help='Supress printout to terminal and file export')
     parser.add_argument('--riet_append_result_to', '-results',
@@ -127,47 +138,54 @@ def _write_out(stream,filename):
         for line in stream:
             fID.write('%s\n' % line.strip())
 
-def run_MAUD(maud_path, java_opt, simple_call, timeout, ins_paths):
-
+def java_command(maud_path, java_opt):
+    '''
+    java executable, options and class path of the MAUD installation in maud_path as a
+    list of arguments
+    '''
     # This may be modified once general paths are filled out
     if "linux" in sys.platform:
         # linux
         java = os.path.join(maud_path, 'jdk/bin/java')
         lib = os.path.join(maud_path, 'lib/*')
-        opts = f'-{java_opt}  --enable-preview -cp "{lib}"'
+        opts = ['--enable-preview']
 
     elif "darwin" in sys.platform:
         # OS X
         java = os.path.join(maud_path, 'Contents/PlugIns/Home/bin/java')
         lib = os.path.join(maud_path, 'Contents/Java/*')
-        opts = f'-{java_opt} --enable-preview -cp "{lib}"'
+        opts = ['--enable-preview']
 
     elif "win" in sys.platform:
         # Windows...
-        #raise NotImplementedError("Windows commandline call is not implemented yet.")
         java = os.path.join(maud_path, 'jdk\\bin\\java')
         lib = os.path.join(maud_path, 'lib\\*')
-        opts = f"-{java_opt}  --enable-preview --add-opens java.base/java.net=ALL-UNNAMED -cp \"{lib}\""
+        opts = ['--enable-preview', '--add-opens', 'java.base/java.net=ALL-UNNAMED']
 
-    command = f'{java} {opts} com.radiographema.MaudText -file {ins_paths}'
+    java_opts = f'-{java_opt}'.split() if java_opt else []
+    return [java, *java_opts, *opts, '-cp', lib]
+
+def run_MAUD(maud_path, java_opt, simple_call, timeout, ins_paths):
+
+    *opts, lib = java_command(maud_path, java_opt)
+    command = f'{" ".join(opts)} "{lib}" com.radiographema.MaudText -file {ins_paths}'
     exit_code=0
+    timed_out=False
+    start=time.time()
     if simple_call == 'True':
-        with sub.Popen(command, shell=True, stdin=sub.PIPE, stdout=sub.PIPE, stderr=sub.PIPE) as p:
-            # stdout_thread = Thread(target=_write_out,
-            #     args=(p.stdout,ins_paths[:-4]+'.log'))
-            # stderr_thread = Thread(target=_write_out,
-            #     args=(p.stderr,ins_paths[:-4]+'.err'))
-            # stdout_thread.start()
-            # stderr_thread.start()
+        # the output is discarded, nothing has to be read while waiting
+        with sub.Popen(command, shell=True, stdin=sub.DEVNULL, stdout=sub.DEVNULL, stderr=sub.DEVNULL) as p:
             try:
-                _, _ = p.communicate(timeout=timeout) 
+                usage = telemetry.wait(p, timeout)
             except sub.TimeoutExpired:
                 print(f"MAUD batch call exceeded timeout of {timeout} for {ins_paths}.")
                 exit_code=1
+                timed_out=True
                 if "win" in sys.platform:
                     sub.call(['taskkill', '/F', '/T', '/PID', str(p.pid)],stdout=sub.PIPE)
                 else:
                     p.kill()
+                usage = telemetry.wait(p)
     else:
         with sub.Popen(command, shell=True, stdin=sub.PIPE, stdout=sub.PIPE, stderr=sub.PIPE) as p:
             stdout_thread = Thread(target=_write_out,
@@ -177,20 +195,127 @@ def run_MAUD(maud_path, java_opt, simple_call, timeout, ins_paths):
             stdout_thread.start()
             stderr_thread.start()
             try:
-                p.wait(timeout=timeout)
+                usage = telemetry.wait(p, timeout)
             except sub.TimeoutExpired:
                 print(f"MAUD batch call exceeded timeout of {timeout} for {ins_paths}.")
                 exit_code=1
+                timed_out=True
                 if "win" in sys.platform:
                     sub.call(['taskkill', '/F', '/T', '/PID', str(p.pid)],stdout=sub.PIPE)
                 else:
                     p.kill()
+                usage = telemetry.wait(p)
             stdout_thread.join()
             stderr_thread.join()
-        
+
+    telemetry.record(ins_paths, backend='process', start=start, wall_s=time.time()-start,
+                     exit_status=p.returncode, exit_code=exit_code, timeout=timed_out,
+                     restored=False, **telemetry.rusage_fields(usage))
+    return exit_code
+
+def run_MAUD_worker(maud_path, java_opt, simple_call, timeout, nworkers, ins_paths):
+    '''
+    run_MAUD on a long-lived MAUD process of maudWorker.get_pool. Falls back to run_MAUD if the
+    worker can not be started e.g. java older than 11.
+    '''
+    try:
+        pool = maudWorker.get_pool(maudWorker.worker_command(java_command(maud_path, java_opt)), nworkers)
+        return pool.run(ins_paths, simple_call == 'True', timeout)
+    except (OSError, RuntimeError) as e:
+        print(f"MAUD worker unavailable, starting MAUD for {ins_paths}: {str(e).splitlines()[0]}")
+        return run_MAUD(maud_path, java_opt, simple_call, timeout, ins_paths)
+
+def run_function(args):
+    '''
+    run_MAUD or run_MAUD_worker, depending on args.backend, taking the ins file as only argument
+    '''
+    if args.backend == 'worker':
+        return partial(run_MAUD_worker, args.maud_path, args.java_opt, args.simple_call,
+                       args.timeout, n_instances(args))
+    return partial(run_MAUD, args.maud_path, args.java_opt, args.simple_call, args.timeout)
+
+
+async def _write_out_async(stream, filename):
+    with open(filename, "w") as fID:
+        async for line in stream:
+            fID.write('%s\n' % line.decode(errors='replace').strip())
+
+async def _kill_MAUD(p):
+    # kill the JVM with any process it started, these would keep the output pipes open
+    if p.returncode is None:
+        if sys.platform.startswith('win'):
+            killer = await asyncio.create_subprocess_exec('taskkill', '/F', '/T', '/PID', str(p.pid),
+                                                          stdout=asyncio.subprocess.DEVNULL)
+            await killer.wait()
+        else:
+            try:
+                os.killpg(p.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+    await p.wait()
+
+async def arun_MAUD(maud_path, java_opt, simple_call, timeout, ins_paths):
+    '''
+    asyncio variant of run_MAUD. MAUD is started with asyncio.create_subprocess_exec and its
+    output is written to the .log and .err files by the event loop. On timeout or when the
+    calling task is cancelled the JVM is killed and waited for before returning or re-raising
+    CancelledError.
+    '''
+    command = java_command(maud_path, java_opt) + ['com.radiographema.MaudText', '-file', ins_paths]
+    # own process group on posix, so that _kill_MAUD reaches everything MAUD started
+    group = {} if sys.platform.startswith('win') else {'start_new_session': True}
+    exit_code=0
+    timed_out=False
+    start=time.time()
+    if simple_call == 'True':
+        p = await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.DEVNULL,
+                                                 stdout=asyncio.subprocess.DEVNULL,
+                                                 stderr=asyncio.subprocess.DEVNULL, **group)
+        waiting = p.wait()
+    else:
+        p = await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.DEVNULL,
+                                                 stdout=asyncio.subprocess.PIPE,
+                                                 stderr=asyncio.subprocess.PIPE, **group)
+        waiting = asyncio.gather(p.wait(),
+                                 _write_out_async(p.stdout, ins_paths[:-4]+'.log'),
+                                 _write_out_async(p.stderr, ins_paths[:-4]+'.err'))
+    # the event loop reaps MAUD, its resource use is sampled from /proc while it runs
+    usage = {}
+    sampler = asyncio.ensure_future(_sample_usage(p.pid, usage))
+    try:
+        await asyncio.wait_for(waiting, timeout)
+    except asyncio.TimeoutError:
+        print(f"MAUD batch call exceeded timeout of {timeout} for {ins_paths}.")
+        exit_code=1
+        timed_out=True
+        await _kill_MAUD(p)
+    except asyncio.CancelledError:
+        await _kill_MAUD(p)
+        if isinstance(waiting, asyncio.Future) and waiting.done() and not waiting.cancelled():
+            # a cancelled gather ends with a CancelledError that nobody retrieves otherwise
+            waiting.exception()
+        raise
+    finally:
+        sampler.cancel()
+
+    telemetry.record(ins_paths, backend='async', start=start, wall_s=time.time()-start,
+                     exit_status=p.returncode, exit_code=exit_code, timeout=timed_out,
+                     restored=False, **usage)
     return exit_code
 
 
+async def _sample_usage(pid, usage, interval=0.05, max_interval=2.0):
+    # last /proc sample of a running process, see telemetry.proc_usage. CPU time after the last
+    # sample is missed, the interval grows so that short runs are still sampled a few times
+    while True:
+        sample = telemetry.proc_usage(pid)
+        if sample is None:
+            return
+        usage.update({key: value for key, value in sample.items() if value is not None})
+        await asyncio.sleep(interval)
+        interval = min(interval*2, max_interval)
+
+
 def manage_step_dirs(path: str,
                      step: int,
                      riet_analysis_file: str):
@@ -308,35 +433,16 @@ def scrap_results(scrapeFileName, resultFileName, refinement_id):
             print(line)
 
 
-def main(argsin):
+def n_instances(args):
+    '''
+    number of MAUD instances to run at the same time, nMAUD limited to the number of cpus
+    '''
+    if args.nMAUD != None and args.nMAUD <= os.cpu_count():
+        return args.nMAUD
+    return os.cpu_count()
 
-    args = get_arguments(argsin)
-    paths = build_paths(args)
-
-    if args.simple_call == 'True':
-        if args.nMAUD != None:
-            if args.nMAUD == 1:
-                return [run_MAUD(args.maud_path,
-                                 args.java_opt,
-                                 args.simple_call,
-                                 args.timeout, paths[0][0])]
-            elif args.nMAUD > os.cpu_count():
-                pool = Pool(os.cpu_count())
-            else:
-                pool = Pool(args.nMAUD)
-        else:
-            pool = Pool(os.cpu_count())
-        out = list(map(partial(run_MAUD, args.maud_path,
-                               args.java_opt,
-                               args.simple_call,
-                               args.timeout), paths[0]))
-        return out
 
-    print('')
-    print(f"Starting MAUD refinement for step: {args.cur_step}, at: {time.strftime('%H:%M:%S, %B %d')}")
-    print('=========================')
-
-    # cleanup the steps if specified
+def clean_old_step_data(args, paths):
     if args.clean_old_step_data != None and (args.clean_old_step_data == 'True' or args.clean_old_step_data == 'true'):
         print('Removing old step data')
         for path in paths[0]:
@@ -358,27 +464,8 @@ def main(argsin):
         if os.path.isfile(path):
             os.remove(path)
 
-    if args.nMAUD != None:
-        if args.nMAUD > os.cpu_count():
-            pool = Pool(os.cpu_count())
-        else:
-            pool = Pool(args.nMAUD)
-    else:
-        pool = Pool(os.cpu_count())
-
-    out = list(
-        tqdm.tqdm(
-            pool.imap_unordered(partial(run_MAUD,
-                              args.maud_path,
-                              args.java_opt,
-                              args.simple_call,
-                              args.timeout),
-                      paths[0]),
-            total=len(paths[0])
-        )
-    )
 
-    # Backup the files
+def archive_step_data(args, paths):
     print('')
     print('Archiving step data')
     for path in paths[0]:
@@ -387,7 +474,9 @@ def main(argsin):
         stepdir = os.path.join(wdir, f"step_{args.cur_step}")
         for step_fname in glob.glob(os.path.join(wdir, "step_*")):
             step_number = int(step_fname.split("_")[-1])
-            if os.path.isdir(step_fname) and step_number >=int(args.cur_step):
+            # with the cache later steps are kept, they are restored if their inputs match again
+            if os.path.isdir(step_fname) and (step_number == int(args.cur_step) or
+                                              step_number > int(args.cur_step) and not use_cache(args)):
                 shutil.rmtree(step_fname)
         os.makedirs(stepdir, exist_ok=False)
 
@@ -417,7 +506,62 @@ def main(argsin):
         except:
             pass  # print('no par.lst to copy')
 
-    # Scrape results if applicable
+
+def use_cache(args):
+    return args.cache == 'True' or args.cache == 'true'
+
+
+def restore_cached_runs(args, paths):
+    '''
+    restore the runs of the step whose inputs match the archived step, see resultCache
+    Outputs:
+        run keys (None without cache), restored flag of each run
+    '''
+    if not use_cache(args):
+        return [None]*len(paths[0]), [False]*len(paths[0])
+    version = resultCache.maud_version(java_command(args.maud_path, args.java_opt)[-1])
+    keys = [resultCache.run_key(ins, version) for ins in paths[0]]
+    restored = [resultCache.restore(ins, args.cur_step, key) for ins, key in zip(paths[0], keys)]
+    if any(restored):
+        print(f'{sum(restored)} of {len(restored)} runs restored from step_{args.cur_step}')
+    return keys, restored
+
+
+def save_cached_runs(args, paths, keys, out):
+    # after archive_step_data, successful runs can be restored later
+    for i, (ins, key) in enumerate(zip(paths[0], keys)):
+        if key is not None and out[i] == 0:
+            resultCache.save(ins, args.cur_step, key, [paths[1][i], paths[2][i]])
+
+
+def _merge_runs(restored, out):
+    # exit codes of all runs, 0 for the restored ones
+    out = iter(out)
+    return [0 if hit else next(out) for hit in restored]
+
+
+def collect_telemetry(args, paths, restored=None):
+    '''
+    resource use of the runs of the step, one row per ins file, see telemetry. Restored runs
+    have restored True and no resource figures.
+    '''
+    global last_telemetry
+    rows = telemetry.collect(paths[0], step=args.cur_step)
+    for i, row in enumerate(rows):
+        row['run'] = paths[3][i]
+        if restored is not None and restored[i]:
+            row.update(restored=True, exit_code=0, wall_s=0.0)
+    last_telemetry = rows
+    return rows
+
+
+def save_telemetry(args, rows):
+    # after archive_step_data, next to the result files of the step
+    telemetry.save(rows, os.path.join(os.getcwd(), f'maud_telemetry{str(args.cur_step).zfill(2)}.csv'))
+    print(telemetry.summary(rows))
+
+
+def scrape_step_results(args, paths):
     try:
         scrap_results(paths[1], os.path.join(
             os.getcwd(), args.riet_append_result_to[:-4]+str(args.cur_step).zfill(2)+'.txt'), paths[3])
@@ -429,9 +573,179 @@ def main(argsin):
             os.getcwd(), args.riet_append_simple_result_to[:-4]+str(args.cur_step).zfill(2)+'.txt'), paths[3])
     except:
         print('unable to compile results from folders. This usually means a maud simulation didnt run')
+
+
+# Schedule of the last map_runs call, predicted and measured makespan and utilization
+last_schedule = None
+# Telemetry rows of the last main call, see collect_telemetry
+last_telemetry = None
+
+
+def plan(argsin):
+    '''
+    schedule of the runs of main without running them, e.g. to tune nMAUD:
+        plan(args).makespans(range(1, 17))
+    '''
+    args = get_arguments(argsin)
+    return schedule.Schedule(build_paths(args)[0], n_instances(args))
+
+
+def map_runs(args, ins_paths, progress=False):
+    '''
+    run the ins files with up to n_instances MAUD at the same time. MAUD runs in its own process,
+    so threads only wait for it. Runs are dispatched longest expected first (see schedule.Schedule),
+    idle threads take the next run. The executor is shut down when all runs are done, when one
+    raises or when the call is interrupted, runs not started by then are dropped. The measured
+    runtimes are added to the history of the next steps.
+    Outputs:
+        exit codes in the order of ins_paths
+    '''
+    global last_schedule
+    runs = schedule.Schedule(ins_paths, n_instances(args))
+    last_schedule = runs
+    run = run_function(args)
+    out = [None]*len(ins_paths)
+    pool = ThreadPoolExecutor(runs.nworkers)
+    try:
+        futures = {pool.submit(runs.run, run, i): i for i in runs.order}
+        done = as_completed(futures)
+        if progress:
+            done = tqdm.tqdm(done, total=len(futures))
+        for future in done:
+            out[futures[future]] = future.result()
+        return out
+    finally:
+        pool.shutdown(cancel_futures=True)
+        runs.save(args.cur_step, out, save=args.simple_call != 'True')
+
+
+def main(argsin):
+
+    args = get_arguments(argsin)
+    paths = build_paths(args)
+
+    if args.simple_call == 'True':
+        out = map_runs(args, paths[0])
+        collect_telemetry(args, paths)
+        return out
+
+    print('')
+    print(f"Starting MAUD refinement for step: {args.cur_step}, at: {time.strftime('%H:%M:%S, %B %d')}")
+    print('=========================')
+
+    # cleanup the steps if specified
+    clean_old_step_data(args, paths)
+
+    keys, restored = restore_cached_runs(args, paths)
+    out = map_runs(args, [ins for ins, hit in zip(paths[0], restored) if not hit], progress=True)
+    print(last_schedule.summary())
+    out = _merge_runs(restored, out)
+    rows = collect_telemetry(args, paths, restored)
+
+    # Backup the files
+    archive_step_data(args, paths)
+    save_cached_runs(args, paths, keys, out)
+    save_telemetry(args, rows)
+
+    # Scrape results if applicable
+    scrape_step_results(args, paths)
     
     return out
 
+
+async def amap_runs(args, ins_paths, progress=None):
+    '''
+    asyncio variant of map_runs, MAUD runs as subprocesses of the event loop
+    Optional inputs:
+        progress (tqdm): progress bar updated after every run
+
+    Outputs:
+        exit codes in the order of ins_paths
+    '''
+    global last_schedule
+    runs = schedule.Schedule(ins_paths, n_instances(args))
+    last_schedule = runs
+    # the semaphore is fair, the runs start in the order their tasks are created
+    limit = asyncio.Semaphore(runs.nworkers)
+
+    async def run(i):
+        async with limit:
+            runs.started(i)
+            try:
+                if args.backend == 'worker':
+                    exit_code = await asyncio.get_running_loop().run_in_executor(
+                        None, run_function(args), runs.ins[i])
+                else:
+                    exit_code = await arun_MAUD(args.maud_path, args.java_opt, args.simple_call,
+                                                args.timeout, runs.ins[i])
+            finally:
+                runs.finished(i)
+        if progress is not None:
+            progress.update()
+        return exit_code
+
+    out = [None]*len(runs.ins)
+    try:
+        for i, exit_code in zip(runs.order, await _run_all([run(i) for i in runs.order])):
+            out[i] = exit_code
+        return out
+    finally:
+        runs.save(args.cur_step, out, save=args.simple_call != 'True')
+
+
+async def amain(argsin):
+    '''
+    asyncio variant of main. Up to nMAUD MAUD instances run as subprocesses of the event loop,
+    no Pool is started. If the calling task is cancelled or a run fails the remaining MAUD
+    instances are killed. With the worker backend the runs are sent to maudWorker pools from
+    threads of the event loop executor, runs already sent to a worker are not interrupted.
+    Runs start longest expected first like in main, see map_runs.
+    '''
+    args = get_arguments(argsin)
+    paths = build_paths(args)
+
+    if args.simple_call == 'True':
+        out = await amap_runs(args, paths[0])
+        collect_telemetry(args, paths)
+        return out
+
+    print('')
+    print(f"Starting MAUD refinement for step: {args.cur_step}, at: {time.strftime('%H:%M:%S, %B %d')}")
+    print('=========================')
+
+    # cleanup the steps if specified
+    clean_old_step_data(args, paths)
+
+    keys, restored = restore_cached_runs(args, paths)
+    ins_paths = [ins for ins, hit in zip(paths[0], restored) if not hit]
+    with tqdm.tqdm(total=len(ins_paths)) as progress:
+        out = await amap_runs(args, ins_paths, progress)
+    print(last_schedule.summary())
+    out = _merge_runs(restored, out)
+    rows = collect_telemetry(args, paths, restored)
+
+    # Backup the files
+    archive_step_data(args, paths)
+    save_cached_runs(args, paths, keys, out)
+    save_telemetry(args, rows)
+
+    # Scrape results if applicable
+    scrape_step_results(args, paths)
+
+    return out
+
+
+async def _run_all(calls):
+    # gather that cancels, and so kills, the other runs if one fails or the caller is cancelled
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
 if __name__ == '__main__':
     freeze_support()
     main([])
@@ -16,6 +16,10 @@ class arguments:
         self.n_maud = None
         self.exit_code = None
         self.timeout = None
+        self.backend = None
+        self.cache = None
+        self.schedule = None
+        self.telemetry = None
         self.log_consol = None
         self.maud_path = None
         self.java_opt = None
@@ -62,6 +66,10 @@ class arguments:
         self.java_opt = config["compute"]["java_opt"]
         if "timeout" in config["compute"]:
             self.timeout = config["compute"]["timeout"]
+        if "backend" in config["compute"]:
+            self.backend = config["compute"]["backend"]
+        if "cache" in config["compute"]:
+            self.cache = config["compute"]["cache"]
         self.clean_old_step_data = config["compute"]["clean_old_step_data"]
         if cur_step == None:
             self.cur_step = config["compute"]["cur_step"]
@@ -173,6 +181,10 @@ class arguments:
             args = args+'--nMAUD '+self.n_maud+' '
         if self.timeout != None:
             args = f"{args}--timeout {self.timeout} "
+        if self.backend != None:
+            args = f"{args}--backend {self.backend} "
+        if self.cache != None and self.cache:
+            args = args+'--cache True'+' '
         if self.ins_file_name != None:
             args = args+'--ins_file_name '+self.ins_file_name+' '
         if self.work_dir != None and self.work_dir != '':
@@ -228,7 +240,51 @@ class maudText(arguments):
 
         Outputs: 
             Updates editor arguments and applies changes to parameter files if run=True(default)
+            exit codes in exit_code, predicted and measured makespan and utilization in schedule
+            wall time, CPU time and peak memory of each run in telemetry
         '''
+        self._refinement_arguments(itr, wizard_index, ifile, ofile, wild, wild_range, work_dir,
+                                   verboseins, verbosecompute, n_maud, import_phases, import_lcls,
+                                   export_PFs, export_plots, simple_call, timeout)
+        if export_ins:
+            generateIns.main(self.args_ins)
+        if run:
+            self.exit_code = callMaudText.main(self.args_compute)
+            self.schedule = callMaudText.last_schedule
+            self.telemetry = callMaudText.last_telemetry
+            if inc_step:
+                self.cur_step = str(int(self.cur_step)+1)
+
+    async def arefinement(self, itr=None, wizard_index=None, ifile=None, ofile=None,
+                          wild=None, wild_range=None, work_dir=None, verboseins=None,
+                          verbosecompute=None, n_maud=None, run=True, export_ins=True, import_phases=False,
+                          import_lcls=False, export_PFs=False, export_plots=False, inc_step=True,
+                          simple_call=False,timeout=None):
+        '''
+        asyncio variant of refinement, MAUD runs as subprocesses of the event loop (see callMaudText.amain).
+        Cancelling the awaiting task kills the running MAUD instances.
+        usage:
+            await maudText.arefinement(itr='4', ifile='Analysis.par', ofile='Analysis.par')
+
+        Outputs:
+            exit codes of the MAUD runs in maudText.exit_code, their schedule in maudText.schedule
+            and their resource use in maudText.telemetry
+        '''
+        self._refinement_arguments(itr, wizard_index, ifile, ofile, wild, wild_range, work_dir,
+                                   verboseins, verbosecompute, n_maud, import_phases, import_lcls,
+                                   export_PFs, export_plots, simple_call, timeout)
+        if export_ins:
+            generateIns.main(self.args_ins)
+        if run:
+            self.exit_code = await callMaudText.amain(self.args_compute)
+            self.schedule = callMaudText.last_schedule
+            self.telemetry = callMaudText.last_telemetry
+            if inc_step:
+                self.cur_step = str(int(self.cur_step)+1)
+
+    def _refinement_arguments(self, itr, wizard_index, ifile, ofile, wild, wild_range, work_dir,
+                              verboseins, verbosecompute, n_maud, import_phases, import_lcls,
+                              export_PFs, export_plots, simple_call, timeout):
         if work_dir != None:
             self.work_dir = work_dir
         if itr != None:
@@ -263,9 +319,3 @@ class maudText(arguments):
         # parse
         self.parse_arguments_ins()
         self.parse_arguments_compute()
-        if export_ins:
-            generateIns.main(self.args_ins)
-        if run:
-            self.exit_code = callMaudText.main(self.args_compute)
-            if inc_step:
-                self.cur_step = str(int(self.cur_step)+1)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 16:10:31 2026
+
+Long-lived MAUD processes that run the ins files sent to them over stdin, so that the JVM
+startup and MAUD class loading are paid once per worker instead of once per refinement.
+The worker side is resources/MaudWorker.java, any command speaking the same protocol can be
+used instead e.g. a stand-in script for testing:
+    started     -> prints MILK_READY
+    stdin line  <- <ins file>\t<log file>\t<err file>   (empty log/err: discard the output)
+    done        -> prints MILK_DONE <status>
+"""
+
+import atexit
+import functools
+import os
+import queue
+import re
+import signal
+import subprocess as sub
+import sys
+import threading
+import time
+from . import telemetry
+
+WORKER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'MaudWorker.java')
+READY = 'MILK_READY'
+DONE = 'MILK_DONE'
+
+
+@functools.lru_cache(maxsize=None)
+def java_version(java):
+    '''
+    feature version of a java executable e.g. 17, None if it can not be determined
+    '''
+    try:
+        out = sub.run([java, '-version'], stdout=sub.PIPE, stderr=sub.STDOUT, text=True, timeout=60).stdout
+    except (OSError, sub.SubprocessError):
+        return None
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', out)
+    if match is None:
+        return None
+    if match.group(1) == '1' and match.group(2) is not None:
+        return int(match.group(2))
+    return int(match.group(1))
+
+
+def worker_command(java):
+    '''
+    command starting MaudWorker.java, java is the command of callMaudText.java_command. The java
+    launcher compiles the source in memory (java 11 or newer), no build step is needed.
+    '''
+    version = java_version(java[0])
+    if version is None or version < 11:
+        raise RuntimeError(f'the MAUD worker needs java 11 or newer, found {version} for {java[0]}')
+    return [*java, '--source', str(version), WORKER_SOURCE]
+
+
+class MaudWorker:
+    '''
+    one long-lived MAUD process. run sends an ins file and waits for its exit status. A worker
+    that exits or exceeds the timeout is stopped and restarted by the next run.
+    Required Inputs:
+        command (list): worker command, see worker_command
+    Optional inputs:
+        cwd            (str): working directory of the worker, relative paths in the ins files are resolved from here
+        start_timeout (float): seconds to wait for MILK_READY
+    '''
+
+    def __init__(self, command, cwd=None, start_timeout=300):
+        self.command = list(command)
+        self.cwd = cwd
+        self.start_timeout = start_timeout
+        self.process = None
+        self.lines = None
+        self.runs = 0
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        # own process group on posix, so that kill reaches everything the worker started
+        group = {} if sys.platform.startswith('win') else {'start_new_session': True}
+        self.process = sub.Popen(self.command, stdin=sub.PIPE, stdout=sub.PIPE, stderr=sub.STDOUT,
+                                 cwd=self.cwd, text=True, bufsize=1, **group)
+        self.lines = queue.Queue()
+        threading.Thread(target=_read_lines, args=(self.process.stdout, self.lines), daemon=True).start()
+        line, output = self._wait(READY, self.start_timeout)
+        if line is None:
+            self.stop(kill=True)
+            raise RuntimeError('MAUD worker failed to start: ' + ' '.join(self.command) + '\n'
+                               + '\n'.join(output[-20:]))
+
+    def stop(self, kill=False):
+        p = self.process
+        self.process = None
+        if p is None:
+            return
+        if p.poll() is None and not kill:
+            # the worker exits at the end of stdin
+            try:
+                p.stdin.close()
+                p.wait(timeout=10)
+            except (OSError, sub.TimeoutExpired):
+                kill = True
+        if p.poll() is None:
+            if sys.platform.startswith('win'):
+                sub.call(['taskkill', '/F', '/T', '/PID', str(p.pid)], stdout=sub.PIPE)
+            else:
+                try:
+                    os.killpg(p.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        p.wait()
+        for stream in (p.stdin, p.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def run(self, ins_path, simple_call=False, timeout=None):
+        '''
+        run one ins file
+        Required Inputs:
+            ins_path   (str): ins file
+        Optional inputs:
+            simple_call (bool): discard the MAUD output instead of writing the .log and .err files
+            timeout    (float): seconds after which the worker is killed
+
+        Outputs:
+            exit code, 0 on success
+        '''
+        ins_path = os.path.abspath(ins_path)
+        if simple_call:
+            log, err = '', ''
+        else:
+            log, err = ins_path[:-4]+'.log', ins_path[:-4]+'.err'
+        job = f'{ins_path}\t{log}\t{err}\n'
+        if not self.alive():
+            self.stop()
+            self.start()
+        start = time.time()
+        before = telemetry.proc_usage(self.process.pid)
+        try:
+            self.process.stdin.write(job)
+            self.process.stdin.flush()
+        except OSError:
+            # the worker ended between two runs
+            self.stop(kill=True)
+            self.start()
+            self.process.stdin.write(job)
+            self.process.stdin.flush()
+
+        line, _ = self._wait(DONE, timeout)
+        if line is not None:
+            self.runs += 1
+            exit_code = int(line.split()[1])
+            self._record(ins_path, start, before, exit_code, exit_code, False)
+            return exit_code
+        if self.process.poll() is None:
+            print(f"MAUD batch call exceeded timeout of {timeout} for {ins_path}.")
+            self._record(ins_path, start, before, None, 1, True)
+            self.stop(kill=True)
+            return 1
+        # MaudText ended the JVM, the run is over and the next one restarts the worker
+        exit_status = self.process.returncode
+        self._record(ins_path, start, before, exit_status, 0 if exit_status == 0 else 1, False)
+        self.stop()
+        self.runs += 1
+        return 0 if exit_status == 0 else 1
+
+    def _record(self, ins_path, start, before, exit_status, exit_code, timed_out):
+        # CPU time of the worker during the run and its peak memory so far, see telemetry
+        usage = {}
+        after = telemetry.proc_usage(self.process.pid)
+        if before is not None and after is not None:
+            usage = {'user_s': after['user_s']-before['user_s'], 'sys_s': after['sys_s']-before['sys_s'],
+                     'max_rss_mb': after['max_rss_mb']}
+        telemetry.record(ins_path, backend='worker', start=start, wall_s=time.time()-start,
+                         exit_status=exit_status, exit_code=exit_code, timeout=timed_out,
+                         restored=False, **usage)
+
+    def _wait(self, token, timeout):
+        # protocol line starting with token and the other output before it, None on exit or timeout
+        end = None if timeout is None else time.monotonic()+timeout
+        output = []
+        while True:
+            try:
+                line = self.lines.get(timeout=None if end is None else max(end-time.monotonic(), 0))
+            except queue.Empty:
+                return None, output
+            if line is None:
+                # stdout closes before the process is reaped, give it time to exit
+                try:
+                    self.process.wait(timeout=5)
+                except sub.TimeoutExpired:
+                    pass
+                return None, output
+            if line.startswith(token):
+                return line, output
+            output.append(line)
+
+
+def _read_lines(stream, lines):
+    for line in stream:
+        lines.put(line.rstrip('\r\n'))
+    lines.put(None)
+
+
+class MaudWorkerPool:
+    '''
+    MaudWorker processes started on first use. run blocks until a worker is idle and may be
+    called from several threads.
+    Required Inputs:
+        command  (list): worker command, see worker_command
+        nworkers  (int): number of workers
+    Optional inputs:
+        cwd            (str): working directory of the workers
+        start_timeout (float): seconds to wait for a worker to start
+    '''
+
+    def __init__(self, command, nworkers, cwd=None, start_timeout=300):
+        self.command = list(command)
+        self.cwd = cwd
+        self.start_timeout = start_timeout
+        self.workers = []
+        self.idle = queue.LifoQueue()
+        self.error = None
+        self._lock = threading.Lock()
+        self.grow(nworkers)
+
+    def grow(self, nworkers):
+        # add workers until there are nworkers
+        with self._lock:
+            while len(self.workers) < nworkers:
+                worker = MaudWorker(self.command, self.cwd, self.start_timeout)
+                self.workers.append(worker)
+                self.idle.put(worker)
+
+    def run(self, ins_path, simple_call=False, timeout=None):
+        '''
+        run one ins file on an idle worker, see MaudWorker.run. Raises RuntimeError if a worker
+        of this pool failed to start.
+        '''
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        worker = self.idle.get()
+        try:
+            return worker.run(ins_path, simple_call, timeout)
+        except RuntimeError as e:
+            self.error = str(e)
+            raise
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(command, nworkers):
+    '''
+    pool of at least nworkers workers of command in the current directory. Pools are kept for later
+    calls, e.g. the refinements of a calibration recipe, until close_pools or the end of the program.
+    '''
+    key = (tuple(command), os.getcwd())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = MaudWorkerPool(command, nworkers, cwd=key[1])
+    pool.grow(nworkers)
+    return pool
+
+
+def close_pools():
+    '''
+    stop the workers of all pools of get_pool
+    '''
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pools)
@@ -0,0 +1,67 @@
+/*
+ * Long-lived MAUD process for MILK/MAUDText/maudWorker.py.
+ *
+ * Started with the java source launcher (java 11 or newer), e.g.
+ *   java -cp "<maud>/lib/*" --source 17 MaudWorker.java
+ * Prints MILK_READY once MaudText is loaded, then reads one job per line from stdin:
+ *   <ins file>\t<log file>\t<err file>
+ * and runs MaudText -file <ins file> with System.out and System.err sent to the log and err
+ * files (discarded when empty). Every job is answered with MILK_DONE <status> on stdout,
+ * 0 on success and 1 if MaudText threw. The worker exits at the end of stdin.
+ */
+
+import java.io.BufferedReader;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+
+public class MaudWorker {
+
+    public static void main(String[] args) throws Exception {
+        PrintStream protocol = System.out;
+        PrintStream stderr = System.err;
+        Method maudText = Class.forName("com.radiographema.MaudText").getMethod("main", String[].class);
+        BufferedReader jobs = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        protocol.println("MILK_READY");
+        protocol.flush();
+
+        String line;
+        while ((line = jobs.readLine()) != null) {
+            String[] job = line.split("\t", -1);
+            int status = 0;
+            if (job.length != 3) {
+                stderr.println("MaudWorker: malformed job " + line);
+                status = 2;
+            } else {
+                PrintStream out = open(job[1]);
+                PrintStream err = open(job[2]);
+                System.setOut(out);
+                System.setErr(err);
+                try {
+                    maudText.invoke(null, (Object) new String[] {"-file", job[0]});
+                } catch (Throwable t) {
+                    t.printStackTrace(err);
+                    status = 1;
+                } finally {
+                    System.setOut(protocol);
+                    System.setErr(stderr);
+                    out.close();
+                    err.close();
+                }
+            }
+            protocol.println("MILK_DONE " + status);
+            protocol.flush();
+        }
+    }
+
+    private static PrintStream open(String fname) throws IOException {
+        if (fname.isEmpty()) {
+            return new PrintStream(OutputStream.nullOutputStream());
+        }
+        return new PrintStream(new FileOutputStream(fname), true, "UTF-8");
+    }
+}
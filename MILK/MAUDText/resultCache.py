@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 18:21:07 2026
+
+Content-addressed cache of MAUD runs. A run of a step is keyed by a hash of its ins file, the
+par and data files it names, the data files of the par files and the MAUD installation. The
+archived step_N folder of the run holds the key in maud_cache.json, a later run of the same step
+with the same key restores the archived outputs instead of starting MAUD.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from .schedule import read_ins
+from .telemetry import TELEMETRY_FILE
+
+CACHE_FILE = 'maud_cache.json'
+# copied, not moved, to the step folders by callMaudText.archive_step_data i.e. inputs
+INPUT_EXTS = ('.esg', '.gda', '.chi')
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    '''
+    sha256 of a file, remembered while its size and modification time do not change
+    '''
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        cached = _digests.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    digest = h.hexdigest()
+    with _digests_lock:
+        _digests[path] = (stamp, digest)
+    return digest
+
+
+def maud_version(lib):
+    '''
+    fingerprint of a MAUD installation from the names and sizes of the files matching lib e.g.
+    the class path of callMaudText.java_command
+    '''
+    h = hashlib.sha256()
+    for fname in sorted(glob.glob(lib)):
+        if os.path.isfile(fname):
+            h.update(f'{os.path.basename(fname)} {os.path.getsize(fname)}\n'.encode())
+    return h.hexdigest()
+
+
+def data_files(par_path):
+    '''
+    data files named by _riet_meas_datafile_name in a parameter file, resolved relative to the
+    parameter file and then to the current directory. Bank suffixes e.g. file.esg(3) are dropped.
+    '''
+    names = []
+    with open(par_path, errors='replace') as f:
+        for line in f:
+            if line.startswith('_riet_meas_datafile_name'):
+                name = line[len('_riet_meas_datafile_name'):].strip().strip('\'"')
+                names.append(re.sub(r'\(\d+\)$', '', name))
+    files = []
+    for name in dict.fromkeys(names):
+        path = os.path.join(os.path.dirname(par_path), name)
+        files.append(path if os.path.isfile(path) else name)
+    return files
+
+
+def _find(name, ins_path):
+    # file named in an ins row, relative to the ins file and then to the current directory
+    for path in (os.path.join(os.path.dirname(ins_path), name), name):
+        if name and os.path.isfile(path):
+            return path
+    return None
+
+
+def run_key(ins_path, version):
+    '''
+    hash of the inputs of a MAUD run, None if the ins file can not be read
+    Required Inputs:
+        ins_path (str): ins file
+        version  (str): maud_version of the installation running it
+    '''
+    try:
+        rows = read_ins(ins_path)
+        h = hashlib.sha256(f'maud {version}\n'.encode())
+        h.update(f'ins {file_digest(ins_path)}\n'.encode())
+    except (OSError, ValueError):
+        return None
+    for row in rows:
+        par = row.get('_riet_analysis_file', '')
+        path = _find(par, ins_path)
+        if path is None:
+            h.update(f'par {par} missing\n'.encode())
+        else:
+            h.update(f'par {par} {file_digest(path)}\n'.encode())
+            for data in data_files(path):
+                digest = file_digest(data) if os.path.isfile(data) else 'missing'
+                h.update(f'data {os.path.basename(data)} {digest}\n'.encode())
+        # data files replacing the ones of the par file for this analysis
+        for key, value in row.items():
+            if key.startswith('_riet_meas_datafile_name'):
+                name = re.sub(r'\(\d+\)$', '', value)
+                path = _find(name, ins_path)
+                digest = 'missing' if path is None else file_digest(path)
+                h.update(f'ins data {name} {digest}\n'.encode())
+    return h.hexdigest()
+
+
+def step_dir(ins_path, step):
+    return os.path.join(os.path.dirname(os.path.abspath(ins_path)), f'step_{step}')
+
+
+def lookup(ins_path, step, key):
+    '''
+    manifest of the archived run of step with the same key, None if there is none
+    '''
+    if key is None:
+        return None
+    try:
+        with open(os.path.join(step_dir(ins_path, step), CACHE_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('key') == key else None
+
+
+def restore(ins_path, step, key):
+    '''
+    put the archived outputs of a cached run back into the run folder, as if MAUD had run. The
+    step archive is rebuilt from them by callMaudText.archive_step_data.
+    Outputs:
+        True if the run was restored
+    '''
+    manifest = lookup(ins_path, step, key)
+    if manifest is None:
+        return False
+    wdir = os.path.dirname(os.path.abspath(ins_path))
+    sdir = step_dir(ins_path, step)
+    for name in os.listdir(sdir):
+        src = os.path.join(sdir, name)
+        if name in (CACHE_FILE, TELEMETRY_FILE, os.path.basename(ins_path)) or not os.path.isfile(src):
+            continue
+        if name in manifest['outputs']:
+            shutil.copy2(src, os.path.join(wdir, manifest['outputs'][name]))
+        elif not name.endswith(INPUT_EXTS):
+            shutil.copy2(src, os.path.join(wdir, name))
+    for fname, line in manifest['results'].items():
+        with open(os.path.join(wdir, fname), 'a') as f:
+            f.write(line if line.endswith('\n') else line+'\n')
+    return True
+
+
+def save(ins_path, step, key, results=()):
+    '''
+    write the manifest of a run to its archived step folder, after callMaudText.archive_step_data
+    Required Inputs:
+        ins_path (str): ins file
+        step     (str): step counter
+        key      (str): run_key computed before the run
+    Optional inputs:
+        results (list): result files MAUD appends a line to, the last lines are restored with the run
+    '''
+    if key is None:
+        return
+    wdir = os.path.dirname(os.path.abspath(ins_path))
+    sdir = step_dir(ins_path, step)
+    # the parameter file archived with the step number, see archive_step_data
+    outputs = {}
+    pars = glob.glob(os.path.join(wdir, '*.par'))
+    if pars:
+        parname = os.path.basename(max(pars, key=os.path.getctime))
+        archived = parname[:-4]+str(step).zfill(2)+'.par'
+        outputs[archived] = parname
+        outputs[archived+'.lst'] = parname+'.lst'
+    lines = {}
+    for fname in results:
+        if fname and os.path.isfile(fname):
+            with open(fname) as f:
+                tail = f.readlines()[-1:]
+            if tail:
+                lines[os.path.relpath(fname, wdir)] = tail[0]
+    with open(os.path.join(sdir, CACHE_FILE), 'w') as f:
+        json.dump({'key': key, 'outputs': outputs, 'results': lines}, f, indent=1)
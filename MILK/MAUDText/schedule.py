@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 17:02:44 2026
+
+Longest-expected-first scheduling of MAUD runs. The cost of a run is estimated from its ins
+and par files and scaled to seconds with the runtimes of earlier steps, stored next to each
+ins file in maud_runtimes.csv.
+"""
+
+import csv
+import heapq
+import os
+import shlex
+import statistics
+import threading
+import time
+
+HISTORY_FILE = 'maud_runtimes.csv'
+HISTORY_FIELDS = ['step', 'seconds', 'cost', 'exit_code']
+HISTORY_ROWS = 20
+# ODF cells costing as much as one more phase, about a 5 degree grid
+ODF_CELLS_PER_PHASE = 50000
+
+# runtimes of this session, also kept for simple calls which do not write history files
+_runtimes = {}
+_runtimes_lock = threading.Lock()
+
+
+def read_ins(ins_path):
+    '''
+    rows of the loop of an ins file
+    Outputs:
+        list of dict, one per analysis e.g. {'_riet_analysis_file': 'a.par', '_riet_analysis_iteration_number': '4'}
+    '''
+    with open(ins_path) as f:
+        lines = f.read().splitlines()
+    rows = []
+    keys = None
+    for line in lines:
+        line = line.strip()
+        if line == 'loop_':
+            keys = []
+        elif keys is not None and line.startswith('_') and not rows:
+            keys.append(line)
+        elif keys and line:
+            values = shlex.split(line)
+            rows.append(dict(zip(keys, values)))
+    return rows
+
+
+def par_metadata(par_path):
+    '''
+    number of datafiles, phases and ODF cells of a parameter file, read with a line scan
+    '''
+    datafiles = phases = odf_cells = 0
+    in_odf = False
+    with open(par_path, errors='replace') as f:
+        for line in f:
+            if in_odf:
+                if not line.strip() or line.startswith('#'):
+                    in_odf = False
+                else:
+                    odf_cells += len(line.split())
+            elif line.startswith('_riet_meas_datafile_name'):
+                datafiles += 1
+            elif line.startswith('_pd_phase_name'):
+                phases += 1
+            elif line.startswith('_rita_wimv_odf_values'):
+                in_odf = True
+    return {'datafiles': datafiles, 'phases': phases, 'odf_cells': odf_cells}
+
+
+def estimate_cost(ins_path):
+    '''
+    relative cost of a run, the sum over the analyses of the ins file of
+        iterations * datafiles * (phases + ODF cells / ODF_CELLS_PER_PHASE)
+    Par files are looked up next to the ins file, then in the current directory, missing par files
+    count as one unit per iteration.
+    Outputs:
+        cost, None if the ins file can not be read
+    '''
+    try:
+        rows = read_ins(ins_path)
+    except (OSError, ValueError):
+        return None
+    if not rows:
+        return None
+    cost = 0.0
+    for row in rows:
+        try:
+            iterations = max(int(row.get('_riet_analysis_iteration_number', 1)), 1)
+        except ValueError:
+            iterations = 1
+        par = row.get('_riet_analysis_file', '')
+        for path in (os.path.join(os.path.dirname(ins_path), par), par):
+            if par and os.path.isfile(path):
+                meta = par_metadata(path)
+                cost += iterations * max(meta['datafiles'], 1) * \
+                    (max(meta['phases'], 1) + meta['odf_cells']/ODF_CELLS_PER_PHASE)
+                break
+        else:
+            cost += iterations
+    return cost
+
+
+def _history_path(ins_path):
+    return os.path.join(os.path.dirname(os.path.abspath(ins_path)), HISTORY_FILE)
+
+
+def read_history(ins_path):
+    '''
+    last successful (seconds, cost) of a run, from this session or the runtime file, None if unknown.
+    The cost is None if it could not be estimated.
+    '''
+    ins_path = os.path.abspath(ins_path)
+    with _runtimes_lock:
+        if ins_path in _runtimes:
+            return _runtimes[ins_path]
+    try:
+        with open(_history_path(ins_path), newline='') as f:
+            rows = [row for row in csv.DictReader(f) if row['exit_code'] == '0']
+    except (OSError, KeyError):
+        return None
+    if not rows:
+        return None
+    try:
+        cost = rows[-1]['cost']
+        return float(rows[-1]['seconds']), float(cost) if cost else None
+    except (KeyError, ValueError):
+        return None
+
+
+def write_history(ins_path, step, seconds, cost, exit_code, save=True):
+    '''
+    remember the runtime of a run, with save the last HISTORY_ROWS runs are kept in maud_runtimes.csv
+    '''
+    ins_path = os.path.abspath(ins_path)
+    if exit_code == 0:
+        with _runtimes_lock:
+            _runtimes[ins_path] = (seconds, cost)
+    if not save:
+        return
+    fname = _history_path(ins_path)
+    rows = []
+    if os.path.isfile(fname):
+        with open(fname, newline='') as f:
+            rows = list(csv.DictReader(f))
+    rows.append({'step': step, 'seconds': f'{seconds:.3f}', 'cost': '' if cost is None else f'{cost:.6g}', 'exit_code': exit_code})
+    with open(fname, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=HISTORY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows[-HISTORY_ROWS:])
+
+
+def _lpt(durations, order, nworkers):
+    # list scheduling in order on nworkers, the worker and start of each run
+    free = [(0.0, w) for w in range(nworkers)]
+    worker = [0]*len(durations)
+    start = [0.0]*len(durations)
+    for i in order:
+        t, w = heapq.heappop(free)
+        worker[i], start[i] = w, t
+        heapq.heappush(free, (t+durations[i], w))
+    return worker, start
+
+
+class Schedule:
+    '''
+    longest-expected-first order of a batch of runs and its predicted and measured makespan
+    Required Inputs:
+        ins_paths (list): ins files
+        nworkers   (int): number of MAUD instances run at the same time
+    Optional inputs:
+        costs     (list): relative costs, estimate_cost by default
+
+    Attributes:
+        predicted   (list): expected seconds of each run, relative cost units if no run has a history (unit)
+        order       (list): positions of the runs in dispatch order
+        makespan   (float): predicted time until the last run ends
+        utilization (list): predicted busy fraction of each worker
+        seconds     (list): measured seconds of each run, None for runs that did not run
+    '''
+
+    def __init__(self, ins_paths, nworkers, costs=None):
+        self.ins = list(ins_paths)
+        self.nworkers = max(int(nworkers), 1)
+        self.costs = [estimate_cost(ins) for ins in self.ins] if costs is None else list(costs)
+        self.history = [read_history(ins) for ins in self.ins]
+        rates = [seconds/cost for seconds, cost in filter(None, self.history) if cost]
+        rate = statistics.median(rates) if rates else None
+        known = [cost for cost in self.costs if cost is not None]
+        typical = statistics.median(known) if known else 1.0
+        self.unit = 'cost' if rate is None else 's'
+        self.predicted = []
+        for cost, history in zip(self.costs, self.history):
+            if history is not None and (cost is None or not history[1]):
+                self.predicted.append(history[0])
+            elif history is not None:
+                # the run itself, scaled if its ins or par changed
+                self.predicted.append(history[0]*cost/history[1])
+            else:
+                cost = typical if cost is None else cost
+                self.predicted.append(cost if rate is None else cost*rate)
+        self.order = sorted(range(len(self.ins)), key=lambda i: self.predicted[i], reverse=True)
+        self.worker, self.start = _lpt(self.predicted, self.order, self.nworkers)
+        self.seconds = [None]*len(self.ins)
+        self._started = [None]*len(self.ins)
+        self._slots = [None]*len(self.ins)
+        self._free = list(range(self.nworkers))
+        self._lock = threading.Lock()
+        self._t0 = None
+
+    @property
+    def makespan(self):
+        return max([s+d for s, d in zip(self.start, self.predicted)], default=0.0)
+
+    @property
+    def utilization(self):
+        return _utilization(self.worker, self.predicted, self.nworkers, self.makespan)
+
+    def makespans(self, nworkers):
+        '''
+        predicted makespan and mean utilization for other numbers of MAUD instances, to tune n_maud
+        Outputs:
+            dict nworkers: (makespan, mean utilization)
+        '''
+        out = {}
+        for n in nworkers:
+            worker, start = _lpt(self.predicted, self.order, n)
+            makespan = max([s+d for s, d in zip(start, self.predicted)], default=0.0)
+            out[n] = (makespan, sum(_utilization(worker, self.predicted, n, makespan))/n)
+        return out
+
+    def started(self, i):
+        # run i takes the lowest free worker slot
+        with self._lock:
+            now = time.monotonic()
+            if self._t0 is None:
+                self._t0 = now
+            self._slots[i] = heapq.heappop(self._free)
+            self._started[i] = now
+
+    def finished(self, i):
+        with self._lock:
+            self.seconds[i] = time.monotonic()-self._started[i]
+            heapq.heappush(self._free, self._slots[i])
+
+    def run(self, func, i):
+        '''
+        call func(ins) for run i and record its runtime, called by the worker threads
+        '''
+        self.started(i)
+        try:
+            return func(self.ins[i])
+        finally:
+            self.finished(i)
+
+    @property
+    def measured_makespan(self):
+        ends = [s+d for s, d in zip(self._started, self.seconds) if d is not None]
+        return max(ends)-self._t0 if ends else None
+
+    @property
+    def measured_utilization(self):
+        return _utilization([w or 0 for w in self._slots], [d or 0.0 for d in self.seconds],
+                            self.nworkers, self.measured_makespan)
+
+    def save(self, step, exit_codes, save=True):
+        '''
+        add the measured runtimes to the history, see write_history
+        '''
+        for i, seconds in enumerate(self.seconds):
+            if seconds is not None and exit_codes[i] is not None:
+                write_history(self.ins[i], step, seconds, self.costs[i], exit_codes[i], save)
+
+    def summary(self):
+        '''
+        one line with the predicted and, after the runs, the measured makespan and mean utilization
+        '''
+        unit = 's' if self.unit == 's' else ' cost units'
+        text = (f'{len(self.ins)} runs on {self.nworkers} MAUD instances, predicted makespan '
+                f'{self.makespan:.4g}{unit}, utilization {_mean(self.utilization):.0%}')
+        if self.measured_makespan is not None:
+            text += (f', measured makespan {self.measured_makespan:.4g}s, utilization '
+                     f'{_mean(self.measured_utilization):.0%}')
+        return text
+
+    def frame(self):
+        '''
+        DataFrame with one row per run in dispatch order
+        '''
+        import pandas as pd
+        return pd.DataFrame({'ins': [self.ins[i] for i in self.order],
+                             'cost': [self.costs[i] for i in self.order],
+                             'predicted': [self.predicted[i] for i in self.order],
+                             'worker': [self.worker[i] for i in self.order],
+                             'start': [self.start[i] for i in self.order],
+                             'seconds': [self.seconds[i] for i in self.order]})
+
+
+def _utilization(worker, durations, nworkers, makespan):
+    busy = [0.0]*nworkers
+    for w, d in zip(worker, durations):
+        busy[w] += d
+    return [b/makespan if makespan else 0.0 for b in busy]
+
+
+def _mean(values):
+    return sum(values)/len(values) if values else 0.0
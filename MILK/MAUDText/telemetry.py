@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:05:12 2026
+
+Resource use of MAUD runs: wall time, user and system CPU, peak resident memory, exit status and
+timeouts. The run functions of callMaudText record one row per ins file, callMaudText.main saves
+the rows of a step next to the step_N archive and prints a summary.
+"""
+
+import csv
+import json
+import os
+import subprocess as sub
+import sys
+import threading
+import time
+
+FIELDS = ['run', 'step', 'ins', 'backend', 'start', 'wall_s', 'user_s', 'sys_s', 'max_rss_mb',
+          'exit_status', 'exit_code', 'timeout', 'restored']
+TELEMETRY_FILE = 'maud_telemetry.json'
+
+_records = {}
+_lock = threading.Lock()
+
+
+def record(ins_path, **fields):
+    '''
+    add fields to the row of an ins file, called by the run functions
+    '''
+    with _lock:
+        _records.setdefault(os.path.abspath(ins_path), {}).update(fields)
+
+
+def collect(ins_paths, **fields):
+    '''
+    take the rows of ins files, fields are added to every row e.g. step
+    Outputs:
+        list of dict with the keys of FIELDS, None for values that were not measured
+    '''
+    rows = []
+    with _lock:
+        for ins in ins_paths:
+            row = dict.fromkeys(FIELDS)
+            row.update(_records.pop(os.path.abspath(ins), {}))
+            row.update(fields)
+            row['ins'] = ins
+            rows.append(row)
+    return rows
+
+
+def rusage_fields(usage):
+    '''
+    CPU times and peak memory of a resource.struct_rusage
+    '''
+    if usage is None:
+        return {}
+    # ru_maxrss is in KiB on linux and in bytes on macOS
+    rss = usage.ru_maxrss/1024**2 if sys.platform == 'darwin' else usage.ru_maxrss/1024
+    return {'user_s': usage.ru_utime, 'sys_s': usage.ru_stime, 'max_rss_mb': rss}
+
+
+def wait(p, timeout=None):
+    '''
+    Popen.wait that also returns the resource usage of the process and the children it waited for
+    through os.wait4. Raises subprocess.TimeoutExpired like Popen.wait.
+    Outputs:
+        resource.struct_rusage, None where wait4 is not available
+    '''
+    if not hasattr(os, 'wait4'):
+        p.wait(timeout)
+        return None
+    end = None if timeout is None else time.monotonic()+timeout
+    delay = 0.0005
+    while True:
+        try:
+            pid, status, usage = os.wait4(p.pid, 0 if end is None else os.WNOHANG)
+        except ChildProcessError:
+            # reaped elsewhere
+            p.wait()
+            return None
+        if pid == p.pid:
+            p.returncode = os.waitstatus_to_exitcode(status)
+            return usage
+        remaining = end-time.monotonic()
+        if remaining <= 0:
+            raise sub.TimeoutExpired(p.args, timeout)
+        delay = min(delay*2, remaining, 0.05)
+        time.sleep(delay)
+
+
+def proc_usage(pid):
+    '''
+    CPU times and peak memory of a running process from /proc, including the children it waited
+    for. None if /proc is not available or the process ended.
+    '''
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/status') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+    except (OSError, IndexError, ValueError):
+        return None
+    tick = os.sysconf('SC_CLK_TCK')
+    # fields 14-17 of /proc/pid/stat: utime stime cutime cstime, here counted after the name
+    utime, stime, cutime, cstime = (int(x) for x in stat[11:15])
+    # no memory figures once the process is a zombie
+    rss = status.get('VmHWM', '').split()
+    return {'user_s': (utime+cutime)/tick, 'sys_s': (stime+cstime)/tick,
+            'max_rss_mb': int(rss[0])/1024 if rss else None}
+
+
+def save(rows, csv_file=None):
+    '''
+    write the row of every run to maud_telemetry.json in its step_N folder and all rows to csv_file
+    '''
+    for row in rows:
+        stepdir = os.path.join(os.path.dirname(os.path.abspath(row['ins'])), f"step_{row['step']}")
+        if os.path.isdir(stepdir):
+            with open(os.path.join(stepdir, TELEMETRY_FILE), 'w') as f:
+                json.dump(row, f, indent=1)
+    if csv_file is not None:
+        with open(csv_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def summary(rows):
+    '''
+    a few lines on the runs of a step: times, memory, failures and the slowest and largest runs
+    '''
+    ran = [row for row in rows if not row['restored'] and row['wall_s'] is not None]
+    lines = [f"{len(rows)} runs, {len(ran)} ran, {len(rows)-len(ran)} restored or not run, "
+             f"{sum(1 for row in rows if row['timeout'])} timed out, "
+             f"{sum(1 for row in rows if row['exit_code'] not in (0, None))} failed"]
+    if not ran:
+        return '\n'.join(lines)
+    walls = sorted(row['wall_s'] for row in ran)
+    cpu = [row['user_s']+row['sys_s'] for row in ran if row['user_s'] is not None]
+    slowest = max(ran, key=lambda row: row['wall_s'])
+    lines.append(f"wall time median {walls[len(walls)//2]:.1f}s, max {walls[-1]:.1f}s ({slowest['run']})")
+    if cpu:
+        lines.append(f"cpu time total {sum(cpu):.1f}s, {sum(cpu)/max(sum(walls), 1e-9):.2f} cpus per run")
+    rss = [row for row in ran if row['max_rss_mb'] is not None]
+    if rss:
+        largest = max(rss, key=lambda row: row['max_rss_mb'])
+        lines.append(f"peak memory max {largest['max_rss_mb']:.0f} MB ({largest['run']})")
+    return '\n'.join(lines)
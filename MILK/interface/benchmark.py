@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:12:40 2026
+
+Micro-benchmarks of the parameter editor on the shipped templates and on synthetic
+parameter files with many phases, banks and datafiles. See bin/milk_benchmark.py
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from . import parameterEditor
+from .model import (texture, sizeStrain)
+from .parDocument import ParDocument, write_lines
+
+MOD_DIR = Path(__file__).parent
+TEMPLATES = OrderedDict([
+    ('template_4768', MOD_DIR / '../../examples/Synchrotron/sequential_refinement/templates/template_4768.par'),
+    ('FeCustart', MOD_DIR / '../../examples/maudbatch/FeCustart.par'),
+    ('G2vsMAUD', MOD_DIR / '../../examples/misc/G2vsMAUD/test.par'),
+])
+# ODF values of each phase of the ODF cases when a file has none, a 5 degree WIMV grid
+ODF_CELLS = 73*37*73
+
+
+def _renamed(doc, obj, body, k):
+    # copy k of an object: the header, end and name lines get the suffix _k
+    if k == 0:
+        return body
+    name = f'{obj.name}_{k}'
+    body = list(body)
+    body[0] = body[0].replace(obj.name, name)
+    body[-1] = body[-1].replace(obj.name, name)
+    key = doc.object_type(obj)
+    if key is not None:
+        for j in range(1, len(body)):
+            if body[j].startswith(key):
+                body[j] = body[j].replace(obj.name, name)
+                break
+    return body
+
+
+def _gap(lines, obj, siblings):
+    # blank lines between obj and the next object on the same level
+    later = [sib.start for sib in siblings if sib.start > obj.end]
+    if not later:
+        return ['\n']
+    return lines[obj.end+1:min(later)]
+
+
+def _replicate(lines, start, stop, children, replace):
+    # lines[start:stop] with the children in replace swapped for their lines, None drops a child
+    out = []
+    last = start
+    for obj in children:
+        if obj in replace and replace[obj] is None:
+            last = obj.end+1
+            continue
+        out += lines[last:obj.start]
+        out += replace[obj] if obj in replace else lines[obj.start:obj.end+1]
+        last = obj.end+1
+    return out + lines[last:stop]
+
+
+def _odf_block(ncells, rng, per_row=10):
+    values = np.round(rng.random(ncells)*3, 5)
+    rows = [' '+' '.join(repr(float(x)) for x in values[i:i+per_row])+'\n'
+            for i in range(0, ncells, per_row)]
+    return ['#custom_object_odf\n', 'loop_\n', '_rita_wimv_odf_values\n'] + rows + ['#end_custom_object_odf\n']
+
+
+def synthesize_par(template, nphases=1, nbanks=1, ndatafiles=1, odf_cells=0, seed=0):
+    '''
+    synthetic parameter file built by repeating the first phase, bank (datafile set) and
+    datafile of a template. Other phases, banks and datafiles of the template are dropped,
+    all other objects are kept
+    Required Inputs:
+        template   (str): parameter file providing the blocks e.g. TEMPLATES['template_4768']
+    Optional inputs:
+        nphases    (int): number of phases
+        nbanks     (int): number of datafile sets
+        ndatafiles (int): number of datafiles in each datafile set, templates without a datafile keep none
+        odf_cells  (int): number of ODF values added to every phase, 0 adds no ODF
+        seed       (int): seed of the random ODF values
+
+    Outputs:
+        list of lines
+    '''
+    doc = ParDocument.from_file(str(template))
+    lines = [line.rstrip('\r\n')+'\n' for line in doc.lines]
+    top = doc.root.children
+    banks = [obj for obj in top if doc.object_type(obj) == '_pd_meas_dataset_id']
+    phases = [obj for obj in top if doc.object_type(obj) == '_pd_phase_name']
+    assert banks and phases, f'{template} needs a datafile set and a phase to synthesize parameter files'
+    rng = np.random.default_rng(seed)
+
+    def repeated(obj, body, n, siblings, extra=lambda body: body):
+        gap = _gap(lines, obj, siblings)
+        out = []
+        for k in range(n):
+            out += (gap if k else []) + extra(_renamed(doc, obj, body, k))
+        return out
+
+    # a bank with its datafiles repeated
+    bank = banks[0]
+    datafiles = [obj for obj in bank.children if doc.object_type(obj) == '_riet_meas_datafile_name']
+    replace = {obj: None for obj in datafiles[1:]}
+    if datafiles:
+        datafile = datafiles[0]
+        replace[datafile] = repeated(datafile, lines[datafile.start:datafile.end+1], ndatafiles, bank.children)
+    bank_lines = _replicate(lines, bank.start, bank.end+1, bank.children, replace)
+
+    def with_odf(body):
+        if not odf_cells:
+            return body
+        return body[:-1] + _odf_block(odf_cells, rng) + body[-1:]
+
+    replace = {obj: None for obj in banks[1:]+phases[1:]}
+    replace[bank] = repeated(bank, bank_lines, nbanks, top)
+    replace[phases[0]] = repeated(phases[0], lines[phases[0].start:phases[0].end+1], nphases, top, with_odf)
+    return _replicate(lines, 0, len(lines), top, replace)
+
+
+def write_synthetic_par(fname, template, nphases=1, nbanks=1, ndatafiles=1, odf_cells=0, seed=0):
+    '''
+    write a parameter file from synthesize_par
+    Outputs:
+        number of lines written
+    '''
+    lines = synthesize_par(template, nphases, nbanks, ndatafiles, odf_cells, seed)
+    write_lines(lines, fname)
+    return len(lines)
+
+
+def _task(task, key=None, ifile='bench.par', **kwargs):
+    def prepare(work_dir, phase):
+        options = dict(kwargs)
+        if options.get('sobj') == 'phase':
+            # the first phase of the file is the source
+            options['sobj'] = [None, phase]
+        args = parameterEditor.task_arguments(task, key, ifile, ofile='out.par', work_dir=work_dir, **options)
+        return lambda: parameterEditor.edit(args)
+    return prepare
+
+
+def _model(module, key):
+    def prepare(work_dir, phase):
+        argsin = f'--ifile model.par --ofile out.par --key {key} --sobj None --work_dir {work_dir} --run_dir . --wild 0'
+        return lambda: module.main(argsin)
+    return prepare
+
+
+def _search(func):
+    def prepare(work_dir, phase):
+        lines = parameterEditor.read_par(os.path.join(work_dir, 'bench.par'))
+        d = parameterEditor.template_dict()
+        return lambda: func(lines, d['Biso'], d)
+    return prepare
+
+
+def _read(work_dir, phase):
+    fname = os.path.join(work_dir, 'bench.par')
+    return lambda: parameterEditor.read_par(fname)
+
+
+def _add_background(work_dir, phase):
+    fname = os.path.join(work_dir, 'bench.par')
+    d = parameterEditor.template_dict()
+    return lambda: parameterEditor.add_datafile_background_keys(parameterEditor.read_par(fname), d, [None], [None])
+
+
+# name: function(work_dir, phase) returning the call to time. Task cases read the prepared
+# inputs bench.par, ref.par (Biso referenced), tex.par (with ODF) or model.par (with a texture
+# object in every phase) and write out.par
+CASES = OrderedDict([
+    ('read_par', _read),
+    ('search_list', _search(parameterEditor.search_list)),
+    ('search_list_reverse', _search(parameterEditor.search_list_reverse)),
+    ('free_par', _task('free_par', 'Biso')),
+    ('fix_par', _task('fix_par', 'Biso')),
+    ('set_par', _task('set_par', 'Biso', value='0.5')),
+    ('get_val', _task('get_val', 'Biso')),
+    ('get_err', _task('get_err', 'Biso')),
+    ('get_phases', _task('get_phases', '_pd_phase_name')),
+    ('fix_all', _task('fix_all', 'blah')),
+    ('ref_par', _task('ref_par', ['Biso', 'Biso'], sobj=[None, 'First'], value='1 0')),
+    ('un_ref_par', _task('un_ref_par', 'Biso', ifile='ref.par')),
+    ('add_par', _task('add_par', 'Background')),
+    ('rem_par', _task('rem_par', 'Background')),
+    ('resize_par', _task('resize_par', 'Background', value='8')),
+    ('add_datafile_bk_par', _task('add_datafile_bk_par', 'Background')),
+    ('add_datafile_background_keys', _add_background),
+    ('reset_odf', _task('reset_odf', 'ODFValues', ifile='tex.par')),
+    ('scale_odf', _task('scale_odf', 'ODFValues', ifile='tex.par', value='2')),
+    ('copy_odf', _task('copy_odf', ['ODFValues', 'ODFValues'], ifile='tex.par', sobj='phase')),
+    ('get_odf', _task('get_odf', 'ODFValues', ifile='tex.par')),
+    ('export_odf', _task('export_odf', 'ODFValues', ifile='tex.par', value='odf.npz')),
+    ('track_par', _task('track_par', 'Biso')),
+    ('untrack_par', _task('untrack_par', 'Biso')),
+    ('untrack_all', _task('untrack_all', 'blah')),
+    ('texture', _model(texture, 'EWIMV')),
+    ('size_strain', _model(sizeStrain, 'Isotropic')),
+])
+
+
+def _in_phases(doc, block):
+    # lines of doc with block() inserted at the end of every phase
+    lines = [line.rstrip('\r\n')+'\n' for line in doc.lines]
+    for obj in reversed(doc.objects()):
+        if doc.object_type(obj) == '_pd_phase_name':
+            lines[obj.end:obj.end] = block()
+    return lines
+
+
+def _prepare(fname, work_dir):
+    # copy the parameter file to work_dir/bench.par and derive the inputs of the cases
+    shutil.copyfile(fname, os.path.join(work_dir, 'bench.par'))
+    parameterEditor.edit(parameterEditor.task_arguments(
+        'ref_par', ['Biso', 'Biso'], 'bench.par', ofile='ref.par', sobj=[None, 'First'],
+        value='1 0', work_dir=work_dir))
+    doc = ParDocument.from_file(os.path.join(work_dir, 'bench.par'))
+    if doc.odf_loops():
+        shutil.copyfile(fname, os.path.join(work_dir, 'tex.par'))
+    else:
+        rng = np.random.default_rng(0)
+        write_lines(_in_phases(doc, lambda: _odf_block(ODF_CELLS, rng)), os.path.join(work_dir, 'tex.par'))
+    # a texture object the texture model can replace
+    none_tex = parameterEditor.read_par(texture.resource_file_path('NoTexture.txt'))
+    write_lines(_in_phases(doc, lambda: list(none_tex)), os.path.join(work_dir, 'model.par'))
+    phases = [obj.name for obj in doc.objects() if doc.object_type(obj) == '_pd_phase_name']
+    return len(doc), phases[0] if phases else None
+
+
+def time_call(call, repeat=5, memory=True):
+    '''
+    time a function without arguments
+    Required Inputs:
+        call (function): function to time
+    Optional inputs:
+        repeat    (int): number of timed calls
+        memory   (bool): measure the peak memory allocated by python during one extra call
+
+    Outputs:
+        dict with best_s, median_s and peak_kib (nan if memory is False)
+    '''
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        call()
+        times.append(time.perf_counter()-t)
+    peak = np.nan
+    if memory:
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        call()
+        peak = (tracemalloc.get_traced_memory()[1]-base)/1024
+        if not tracing:
+            tracemalloc.stop()
+    return {'best_s': min(times), 'median_s': float(np.median(times)), 'peak_kib': peak}
+
+
+def run_cases(fname, cases=None, repeat=5, memory=True, label=None):
+    '''
+    time the editor cases on one parameter file. The file is not modified
+    Required Inputs:
+        fname   (str): parameter file
+    Optional inputs:
+        cases  (list): names in CASES, all by default
+        repeat  (int): number of timed calls of each case
+        memory (bool): measure the peak memory of each case
+        label   (str): name of the file in the results, defaults to the file name
+
+    Outputs:
+        pandas.DataFrame with one row per case: file, nlines, case, best_s, median_s, peak_kib, error
+    '''
+    if cases is None:
+        cases = list(CASES)
+    if label is None:
+        label = os.path.basename(fname)
+    rows = []
+    work_dir = tempfile.mkdtemp(prefix='milk_benchmark_')
+    try:
+        nlines, phase = _prepare(fname, work_dir)
+        for case in cases:
+            row = {'file': label, 'nlines': nlines, 'case': case, 'best_s': np.nan,
+                   'median_s': np.nan, 'peak_kib': np.nan, 'error': ''}
+            try:
+                row.update(time_call(CASES[case](work_dir, phase), repeat, memory))
+            except Exception as e:
+                row['error'] = f'{type(e).__name__}: {e}'
+            rows.append(row)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return pd.DataFrame(rows)
+
+
+def run_templates(templates=None, cases=None, repeat=5, memory=True):
+    '''
+    run_cases on the shipped templates
+    Optional inputs:
+        templates (list): names in TEMPLATES, all by default
+        cases, repeat, memory: see run_cases
+
+    Outputs:
+        pandas.DataFrame, see run_cases
+    '''
+    if templates is None:
+        templates = list(TEMPLATES)
+    return pd.concat([run_cases(str(TEMPLATES[name]), cases, repeat, memory, name) for name in templates],
+                     ignore_index=True)
+
+
+def scaling(template=None, axis='phases', sizes=(1, 2, 4, 8, 16), cases=None, repeat=3, memory=True,
+            odf_cells=0, **counts):
+    '''
+    scaling curve of the editor cases with the number of phases, banks or datafiles of a
+    synthetic parameter file
+    Optional inputs:
+        template  (str): template of synthesize_par, defaults to TEMPLATES['template_4768']
+        axis      (str): phases, banks or datafiles
+        sizes    (list): numbers of phases, banks or datafiles
+        cases, repeat, memory: see run_cases
+        odf_cells (int): number of ODF values of every phase, see synthesize_par
+        counts         : fixed numbers of the other axes e.g. nbanks=2
+
+    Outputs:
+        pandas.DataFrame, see run_cases, with the columns axis and size
+    '''
+    assert axis in ('phases', 'banks', 'datafiles'), f'axis must be phases, banks or datafiles not {axis}'
+    if template is None:
+        template = TEMPLATES['template_4768']
+    frames = []
+    with tempfile.TemporaryDirectory(prefix='milk_benchmark_') as tmp:
+        for size in sizes:
+            counts['n'+axis] = size
+            fname = os.path.join(tmp, f'{axis}_{size}.par')
+            write_synthetic_par(fname, template, odf_cells=odf_cells, **counts)
+            frame = run_cases(fname, cases, repeat, memory, f'{Path(template).stem}_{axis}_{size}')
+            frame.insert(0, 'axis', axis)
+            frame.insert(1, 'size', size)
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def compare(results, baseline, tolerance=1.5):
+    '''
+    cases that got slower than a baseline
+    Required Inputs:
+        results  (DataFrame): from run_cases, run_templates or scaling
+        baseline (DataFrame/str): earlier results or the csv file they were saved to
+    Optional inputs:
+        tolerance    (float): allowed ratio of best_s to the baseline best_s
+
+    Outputs:
+        pandas.DataFrame of the cases over the tolerance with the column ratio
+    '''
+    if isinstance(baseline, str):
+        baseline = pd.read_csv(baseline, keep_default_na=False, na_values=[''])
+    on = [col for col in ('axis', 'size', 'file', 'case') if col in results and col in baseline]
+    merged = results.merge(baseline[on+['best_s']], on=on, suffixes=('', '_baseline'))
+    merged['ratio'] = merged['best_s']/merged['best_s_baseline']
+    return merged[merged['ratio'] > tolerance].reset_index(drop=True)
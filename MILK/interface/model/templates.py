@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 13:40:02 2026
+
+Registry of the texture and size-strain model templates. The template files are read
+once from the package resources and spliced into parsed parameter files.
+"""
+
+import importlib.resources
+import os
+import sys
+import threading
+from ..parDocument import ParDocument
+
+# kind: subordinate objects of a phase replaced by a model and the template file of each key
+MODELS = {
+    'texture': {
+        'objects': ('arbitrary tex', 'none tex', 'E-WIMV'),
+        'keys': {'None': 'NoTexture.txt', 'Arbitrary': 'arbitraryTexture.txt', 'EWIMV': 'EWIMVTexture.txt'},
+    },
+    'sizeStrain': {
+        'objects': ('Isotropic', 'Anisotropic no rules'),
+        'keys': {'Isotropic': 'IsotropicSizeStrain.txt', 'Anisotropic': 'AnisotropicSizeStrain.txt'},
+    },
+}
+
+_templates = {}
+_lock = threading.Lock()
+
+
+def _read_resource(fname):
+    resource = importlib.resources.files(__package__) / 'resources' / fname
+    if resource.is_file():
+        return resource.read_text()
+    # resources added to the search path, see MILK/__init__.py
+    for d in sys.path:
+        path = os.path.join(d, fname)
+        if os.path.isfile(path):
+            with open(path) as f:
+                return f.read()
+    return None
+
+
+def register_model(kind: str, key: str, template, objects=None):
+    '''
+    add or replace a model template
+    Required Inputs:
+        kind     (str): texture, sizeStrain or a new kind of model
+        key      (str): name of the model e.g. EWIMV
+        template (str/list): template file name in the resources or the lines of the template
+    Optional inputs:
+        objects (tuple): names (starts) of the subordinate objects replaced by models of a new kind
+    '''
+    with _lock:
+        if kind not in MODELS:
+            assert objects is not None, f'objects replaced by {kind} models are needed'
+            MODELS[kind] = {'objects': tuple(objects), 'keys': {}}
+        elif objects is not None:
+            MODELS[kind]['objects'] = tuple(objects)
+        if isinstance(template, str):
+            MODELS[kind]['keys'][key] = template
+            _templates.pop((kind, key), None)
+        else:
+            MODELS[kind]['keys'][key] = None
+            _templates[(kind, key)] = tuple(line.rstrip('\r\n')+'\n' for line in template)
+
+
+def model_lines(kind: str, key: str):
+    '''
+    lines of a model template, read on first use
+    Outputs:
+        tuple of lines
+    '''
+    lines = _templates.get((kind, key))
+    if lines is not None:
+        return lines
+    assert kind in MODELS, f'{kind} is not a model kind: {", ".join(MODELS)}'
+    keys = MODELS[kind]['keys']
+    if key not in keys:
+        raise NameError(f'{kind} model {key} is not available, specify one of: {", ".join(keys)}')
+    text = _read_resource(keys[key])
+    assert text is not None, f'Unable to find the support files for {kind} models'
+    lines = tuple(text.splitlines(keepends=True))
+    with _lock:
+        _templates[(kind, key)] = lines
+    return lines
+
+
+def model_sections(doc: ParDocument, kind: str, sobj=None):
+    '''
+    model objects of the phases in a parsed parameter file
+    Required Inputs:
+        doc (ParDocument): parsed parameter file
+        kind       (str): texture or sizeStrain
+    Optional inputs:
+        sobj      (list): subordinate object strings or path queries the model objects have to be in, see ParDocument.scope
+
+    Outputs:
+        list of ParObject in document order
+    '''
+    names = MODELS[kind]['objects']
+    phase = doc.find('_pd_phase_name')
+    if not phase:
+        return []
+    sections = [obj for obj in doc.objects('subordinate')
+                if obj.start > phase[0] and obj.end is not None and obj.name.startswith(names)]
+    if sobj is not None:
+        keep = doc.scope([obj.start for obj in sections], sobj)
+        sections = [sections[j] for j in keep]
+    return sections
+
+
+def splice_model(doc, kind: str, key: str, sobj=None):
+    '''
+    replace the model objects of the phases by a model template, one slice assignment each
+    Required Inputs:
+        doc (ParDocument/list): parsed parameter file or its lines, modified in place
+        kind       (str): texture or sizeStrain
+        key        (str): model name e.g. EWIMV, see MODELS
+    Optional inputs:
+        sobj      (list): subordinate object scope of the replaced objects, see model_sections
+
+    Outputs:
+        number of replaced objects
+    '''
+    if not isinstance(doc, ParDocument):
+        doc = ParDocument(doc)
+    template = model_lines(kind, key)
+    sections = model_sections(doc, kind, sobj)
+    # proceed from the end of the file to keep the indexing
+    for obj in reversed(sections):
+        doc[obj.start:obj.end+1] = template
+    return len(sections)
+
+
+def splice_model_file(kind: str, key: str, sobj, ifile: str, ofile: str, preserve: bool = False):
+    '''
+    splice_model on one parameter file, see parameterEditor.set_model
+    Outputs:
+        number of replaced objects
+    '''
+    doc = ParDocument.from_file(ifile, lazy=True, preserve=preserve)
+    n = splice_model(doc, kind, key, sobj)
+    doc.write(ofile, skip_unchanged=n == 0)
+    return n
@@ -9,6 +9,9 @@ Created on Tue Jan  5 16:35:10 2021
 import argparse
 import os
 import sys
+from ..parDocument import ParDocument, write_lines
+from .templates import model_lines, splice_model, splice_model_file
+
 def resource_file_path(filename):
     for d in sys.path:
         filepath = os.path.join(d, filename)
@@ -22,8 +25,7 @@ def read_par(ifile):
     return lines
 
 def write_par(lines,ofile):
-    with open(ofile, 'w') as f:
-        f.writelines("%s\n" % line.strip() for line in lines)
+    write_lines(lines, ofile)
         
 def search_list(lines):
     index=[]
@@ -125,30 +127,26 @@ def get_arguments(argsin):
     return args
 
 def insert_tex(lines,index,args):
-
-    if args.key=='Arbitrary':
-        fname='arbitraryTexture.txt'
-    elif args.key=='None':
-        fname='NoTexture.txt'
-    elif args.key=='EWIMV':
-        fname='EWIMVTexture.txt'
-    else:
-        raise NameError('TexModel not initialized correctly')
-    
-    fname=resource_file_path(fname)    
-    assert fname!=None, 'Unable to find the support files for texture models' 
-    
-    lines_texModel = read_par(fname)
+    #Template lines are read once, see templates.model_lines
+    lines_model = list(model_lines('texture', args.key))
 
     #To not messup the indexing proceed from the end of the file
     for i in reversed(range(0,len(index),2)):
-        for line in reversed(lines_texModel):
-            lines.insert(index[i+1]+1,line)
+        #Replace the old section
+        lines[index[i]:index[i+1]+1]=lines_model
 
-        #Remove the old section
-        for j in reversed(range(index[i],index[i+1]+1)):
-            lines.pop(j)
+    return lines
 
+def model_scope(args):
+    #Subordinate object scope of the model sections, None for all phases
+    if args.sobj[0][0] != None and args.sobj[0][0] != 'None':
+        return args.sobj[0]
+    return None
+
+def set_model(lines,args):
+    #Replace the model sections of the phases in the parsed lines
+    doc = lines if isinstance(lines, ParDocument) else ParDocument(lines)
+    splice_model(doc, 'texture', args.key, model_scope(args))
     return lines
 
 def main(argsin):
@@ -157,28 +155,7 @@ def main(argsin):
     
     #Main loop through files to edit
     for ind in range(0,len(args.ifile)):
-        #read in the lines
-        lines = read_par(args.ifile[ind])
-                       
-        tmp=search_list(lines)
-        index=tmp[0]
-        sobj_index=tmp[1]
-
-                
-        #Filter keyword by subordinate object
-        if args.sobj[0][0] != None and args.sobj[0][0] != 'None':
-            indextmp=[]
-            for j in range(0,len(index)): 
-                sobjs=''.join(sobj_index[j])
-                if all(x in sobjs for x in args.sobj[0]):
-                    indextmp.append(index[j])
-            index=indextmp
-        
-        
-        lines=insert_tex(lines,index,args)
-        
-        #write back the par
-        write_par(lines,args.ofile[ind])    
+        splice_model_file('texture', args.key, model_scope(args), args.ifile[ind], args.ofile[ind])
 
 if __name__ == '__main__':
     main([])
@@ -0,0 +1,1877 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 09:30:12 2026
+
+Parsed, in-memory model of MAUD .par files used by the parameter editor.
+"""
+
+import bisect
+import codecs
+import fnmatch
+import hashlib
+import io
+import itertools
+import locale
+import mmap
+import os
+import pickle
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _value_error(token):
+    # value(error) -> value, error; error is None for a fixed parameter. Only unquoted numbers
+    # carry an error, other tokens e.g. 'Fe(1)' are returned whole
+    value, paren, error = token.partition('(')
+    if not paren or error[-1:] != ')':
+        return token, None
+    try:
+        float(value)
+    except ValueError:
+        return token, None
+    return value, error[:-1]
+
+
+def parameter_value(line, offset=1):
+    '''
+    value and error (None if not refined) of a parameter line without
+    building a Parameter, for read only queries
+    '''
+    tokens = line.split(None, offset + 1)
+    return _value_error(tokens[offset] if offset < len(tokens) else '')
+
+
+class Parameter:
+    '''
+    Tokenized parameter line.
+
+    key value(error) #min a #max b #autotrace #equalTo m + a * #refN #refM
+    in plain key lines the value is token 1, in loop rows token 0 (or the
+    column of the key in a multi key loop). The line is split once and the
+    '#' flags are only scanned when one of them is asked for. The edits
+    touch the affected tokens and line() re-emits the tokens joined by
+    single spaces, callers only write back lines that changed.
+    '''
+
+    __slots__ = ('tokens', 'offset', 'value', 'error', 'changed', '_flags')
+
+    def __init__(self, line, offset=None):
+        tokens = line.split()
+        if offset is None:
+            offset = 1 if tokens and tokens[0][:1] == '_' else 0
+        self.tokens = tokens
+        self.offset = offset
+        self.value, self.error = _value_error(tokens[offset] if offset < len(tokens) else '')
+        self.changed = False
+        self._flags = None
+
+    def _scan(self):
+        # [min, max, autotrace, index of #equalTo, ref, ref inside #equalTo]
+        flags = [None, None, False, -1, None, None]
+        tokens = self.tokens
+        n = len(tokens)
+        for j in range(self.offset + 1, n):
+            token = tokens[j]
+            if token[:1] != '#':
+                continue
+            if token == '#min':
+                if j + 1 < n:
+                    flags[0] = tokens[j + 1]
+            elif token == '#max':
+                if j + 1 < n:
+                    flags[1] = tokens[j + 1]
+            elif token == '#autotrace':
+                flags[2] = True
+            elif token == '#equalTo':
+                flags[3] = j
+            elif token[:4] == '#ref':
+                if 0 <= flags[3] < j <= flags[3] + 5:
+                    flags[5] = token
+                else:
+                    flags[4] = token
+        self._flags = flags
+        return flags
+
+    @property
+    def min(self):
+        return (self._flags or self._scan())[0]
+
+    @property
+    def max(self):
+        return (self._flags or self._scan())[1]
+
+    @property
+    def autotrace(self):
+        return (self._flags or self._scan())[2]
+
+    @property
+    def equal_to(self):
+        '''token index of #equalTo, -1 if the parameter is not bound'''
+        return (self._flags or self._scan())[3]
+
+    @property
+    def ref(self):
+        '''reference id of a reference target, e.g. #ref8'''
+        return (self._flags or self._scan())[4]
+
+    @property
+    def refers_to(self):
+        '''reference id used in the #equalTo expression, e.g. #ref8'''
+        return (self._flags or self._scan())[5]
+
+    @property
+    def refined(self):
+        return self.error is not None
+
+    def line(self):
+        '''The (modified) line, without line end.'''
+        tokens = self.tokens
+        if self.offset < len(tokens):
+            if self.error is None:
+                tokens[self.offset] = self.value
+            else:
+                tokens[self.offset] = f'{self.value}({self.error})'
+        return " ".join(tokens)
+
+    def free(self):
+        if self.error is None:
+            self.error = '0.0'
+            self.changed = True
+        return self.changed
+
+    def fix(self):
+        if self.error is not None:
+            self.error = None
+            self.changed = True
+        return self.changed
+
+    def set(self, value):
+        # a refined parameter restarts from an error of 0
+        self.value = value
+        if self.error is not None:
+            self.error = '0.0'
+        self.changed = True
+        return self.changed
+
+    def track(self):
+        if '#autotrace' not in self.tokens:
+            self.tokens.insert(self.offset + 1, '#autotrace')
+            self._flags = None
+            self.changed = True
+        return self.changed
+
+    def untrack(self):
+        if '#autotrace' in self.tokens:
+            self.tokens = [token for token in self.tokens if token != '#autotrace']
+            self._flags = None
+            self.changed = True
+        return self.changed
+
+    def add_ref(self, ref):
+        '''Mark the parameter as reference target ref, e.g. #ref8.'''
+        self.tokens.append(ref)
+        self._flags = None
+        self.changed = True
+        return self.changed
+
+    def equal(self, addition, multiple, ref):
+        '''Bind the parameter to #equalTo addition + multiple * ref, e.g. #equalTo 0.5 + 0 * #ref8.'''
+        j = self.equal_to
+        if j >= 0:
+            self.tokens[j + 1] = addition
+            self.tokens[j + 3] = multiple
+            self.tokens[j + 5] = ref
+        else:
+            self.tokens.extend(['#equalTo', addition, '+', multiple, '*', ref])
+            self._flags = None
+        self.changed = True
+        return self.changed
+
+    def unequal(self):
+        '''Remove the #equalTo expression.'''
+        j = self.equal_to
+        if j >= 0:
+            del self.tokens[j:j + 6]
+            self._flags = None
+            self.changed = True
+        return self.changed
+
+    def remove_ref(self):
+        '''Remove the reference id of a reference target.'''
+        ref = self.ref
+        if ref is not None:
+            j = self.equal_to
+            self.tokens = [token for k, token in enumerate(self.tokens)
+                           if token != ref or 0 <= j < k <= j + 5]
+            self._flags = None
+            self.changed = True
+        return self.changed
+
+
+class ParObject:
+    '''A subordinate or custom object block in a MAUD parameter file.'''
+
+    __slots__ = ('name', 'kind', 'start', 'end', 'parent', 'children', 'path', 'path_id')
+
+    def __init__(self, name, kind, start, parent=None):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end = None
+        self.parent = parent
+        self.children = []
+        self.path = ''
+        self.path_id = 0
+
+    def __repr__(self):
+        return f"ParObject({self.kind!r}, {self.name!r}, {self.start}, {self.end})"
+
+
+class LoopBlock:
+    '''A loop_ block. Rows are the lines row_start <= i < row_end.'''
+
+    __slots__ = ('start', 'header', 'keys', 'row_start', 'row_end', 'odf', 'obj')
+
+    def __init__(self, start, header, keys, odf, obj):
+        self.start = start
+        self.header = header
+        self.keys = keys
+        self.row_start = header + 1
+        self.row_end = header + 1
+        self.odf = odf
+        self.obj = obj
+
+    @property
+    def nrows(self):
+        return self.row_end - self.row_start
+
+    def __repr__(self):
+        return f"LoopBlock({self.keys!r}, rows={self.row_start}:{self.row_end})"
+
+
+class _Source:
+    '''
+    Parameter file that bulk data blocks are read from. No handle is kept open, every read opens
+    the file for a moment, so that the file can be replaced (also on Windows).
+    '''
+
+    def __init__(self, fname, stamp=None):
+        self.fname = fname
+        self.stamp = _stamp(fname) if stamp is None else stamp
+
+    def check(self):
+        assert _stamp(self.fname) == self.stamp, \
+            f"Parameter file <{self.fname}> changed on disk while its bulk data blocks were not loaded"
+
+
+def _stamp(fname):
+    st = os.stat(fname)
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class BulkData(str):
+    '''
+    Placeholder line for the contents of a bulk data block (e.g. the measured
+    intensities of a datafile) that is left on disk.
+
+    Only the byte range of the block in the source file is kept. The lines
+    are streamed from the file, in the write_par format, when the document is
+    written. Before the source file itself is replaced, write_lines loads the
+    block into memory (data).
+    '''
+
+    chunk_size = 1 << 20
+
+    def __new__(cls, name, source, start, stop):
+        self = super().__new__(cls, f'#bulk_data_{name}\n')
+        self.name = name
+        self.source = source
+        self.start = start
+        self.stop = stop
+        self.data = None
+        return self
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (_bulk_from_file, (self.name, self.source.fname, self.start, self.stop, self.source.stamp,
+                                  self.data))
+
+    @property
+    def nbytes(self):
+        return self.stop - self.start
+
+    def load(self):
+        '''Read the block into memory, it no longer depends on the source file.'''
+        if self.data is None:
+            self.data = b''.join(data for data, final in self._chunks())
+
+    def _chunks(self):
+        if self.data is not None:
+            yield self.data, True
+            return
+        self.source.check()
+        with open(self.source.fname, 'rb') as f:
+            f.seek(self.start)
+            pos = self.start
+            while pos < self.stop:
+                data = f.read(min(self.chunk_size, self.stop - pos))
+                if not data:
+                    break
+                pos += len(data)
+                yield data, pos >= self.stop
+
+    def text(self, encoding=None):
+        '''Text of the block exactly as in the source file, in chunks.'''
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        for data, final in self._chunks():
+            yield decoder.decode(data, final=final)
+
+    def lines(self, encoding=None):
+        '''Stripped lines of the block, read from the source file in chunks of lines.'''
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+        tail = ''
+        for data, final in self._chunks():
+            text = tail + decoder.decode(data, final=final)
+            cut = text.rfind('\n') + 1
+            tail = text[cut:]
+            if cut:
+                yield '\n'.join([line.strip() for line in text[:cut - 1].split('\n')]) + '\n'
+        tail += decoder.decode(b'', final=True)
+        if tail:
+            yield "%s\n" % tail.strip()
+
+
+def _bulk_from_file(name, fname, start, stop, stamp, data=None):
+    source = _Source(fname, stamp)
+    if data is None:
+        source.check()
+    bulk = BulkData(name, source, start, stop)
+    bulk.data = data
+    return bulk
+
+
+def _line_end(mm, i):
+    '''Offset after the line end following i if only white space is in between, else -1.'''
+    n = len(mm)
+    while i < n:
+        c = mm[i:i + 1]
+        if c == b'\n':
+            return i + 1
+        if c == b'\r':
+            return i + 2 if mm[i + 1:i + 2] == b'\n' else i + 1
+        if not c.isspace():
+            return -1
+        i += 1
+    return -1
+
+
+def _line_start(mm, i):
+    return i == 0 or mm[i - 1:i] in (b'\n', b'\r')
+
+
+def read_lines(fname, bulk_objects=(), newline=None):
+    '''
+    Lines of a parameter file as read by readlines, with the contents of the
+    custom objects named in bulk_objects left on disk as BulkData lines.
+    newline is passed on like to open, '' keeps the line ends of the file.
+    '''
+    source = _Source(fname)
+    if source.stamp[0] == 0:
+        return []
+    encoding = locale.getpreferredencoding(False)
+    with open(fname, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        blocks = []
+        for name in bulk_objects:
+            marker = b'#custom_object_' + name.encode()
+            end_marker = b'#end_custom_object_' + name.encode()
+            pos = mm.find(marker)
+            while pos >= 0:
+                start = _line_end(mm, pos + len(marker)) if _line_start(mm, pos) else -1
+                stop = -1
+                if start > 0:
+                    stop = mm.find(end_marker, start)
+                    while stop >= 0 and not (_line_start(mm, stop) and _line_end(mm, stop + len(end_marker)) > 0):
+                        stop = mm.find(end_marker, stop + 1)
+                if stop > start:
+                    blocks.append((start, stop, name))
+                    pos = mm.find(marker, stop)
+                else:
+                    pos = mm.find(marker, pos + 1)
+        blocks.sort()
+
+        lines = []
+        pos = 0
+        for start, stop, name in blocks:
+            if start < pos:
+                continue
+            lines.extend(io.StringIO(mm[pos:start].decode(encoding), newline=newline).readlines())
+            lines.append(BulkData(name, source, start, stop))
+            pos = stop
+        lines.extend(io.StringIO(mm[pos:].decode(encoding), newline=newline).readlines())
+    return lines
+
+
+def par_lines(lines, preserve=False):
+    '''
+    Lines in the write_par format, streaming BulkData blocks from disk.
+
+    With preserve the lines are kept as they are, only lines without a line
+    end (the ones rewritten by the editor) get the line end of the file.
+    '''
+    if preserve:
+        newline = _newline(lines)
+        for line in lines:
+            if isinstance(line, BulkData):
+                yield from line.text()
+            elif line.endswith('\n'):
+                yield line
+            else:
+                yield line + newline
+        return
+    for line in lines:
+        if isinstance(line, BulkData):
+            yield from line.lines()
+        else:
+            yield "%s\n" % line.strip()
+
+
+def _format_rows(values, counts, fmt):
+    '''Rows holding counts[k] values each, formatted with a single % operation.'''
+    template = '\n'.join([' '.join([fmt]*n) for n in counts])
+    return (template % tuple(values.tolist())).split('\n')
+
+
+def _newline(lines):
+    for line in lines:
+        if line.endswith('\n') and not isinstance(line, BulkData):
+            return '\r\n' if line.endswith('\r\n') else '\n'
+    return '\n'
+
+
+def write_lines(lines, ofile, preserve=False, skip_unchanged=False):
+    '''
+    Write lines in the write_par format (see par_lines).
+
+    The file is written to a temporary file that then replaces ofile, a
+    concurrent reader (MAUD) sees either the old or the new file. With
+    skip_unchanged nothing is written if ofile already holds the output.
+    Outputs:
+        False if the write was skipped, else True
+    '''
+    ofile = os.path.realpath(ofile)
+    if skip_unchanged and _same_content(par_lines(lines, preserve), ofile):
+        return False
+    # blocks left in ofile are read before ofile is replaced
+    for line in lines:
+        if isinstance(line, BulkData) and line.data is None and os.path.realpath(line.source.fname) == ofile:
+            line.load()
+    try:
+        mode = os.stat(ofile).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = None
+    fd, tmp = _temp_file(os.path.dirname(ofile))
+    try:
+        with os.fdopen(fd, 'w', newline='' if preserve else None) as f:
+            f.writelines(par_lines(lines, preserve))
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, ofile)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return True
+
+
+def _temp_file(dirname):
+    '''
+    new file next to the output, created like open does (mode 0o666 less the umask) so that a
+    new parameter file gets the usual permissions
+    '''
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        tmp = os.path.join(dirname, f'.{os.urandom(6).hex()}.par.tmp')
+        try:
+            return os.open(tmp, flags, 0o666), tmp
+        except FileExistsError:
+            continue
+
+
+def _same_content(chunks, fname):
+    '''True if the file fname holds exactly the text in chunks.'''
+    try:
+        f = open(fname, newline='')
+    except OSError:
+        return False
+    with f:
+        try:
+            buf = []
+            n = 0
+            for chunk in chunks:
+                buf.append(chunk)
+                n += len(chunk)
+                if n >= 1 << 16:
+                    text = ''.join(buf)
+                    if f.read(len(text)) != text:
+                        return False
+                    buf = []
+                    n = 0
+            text = ''.join(buf)
+            return f.read(len(text)) == text and f.read(1) == ''
+        except UnicodeDecodeError:
+            return False
+
+
+class ParDocument:
+    '''
+    Parsed, in-memory model of a MAUD .par file.
+
+    The file is parsed once into a tree of subordinate/custom objects, plain
+    keys and loop_ blocks (including the ODF value blocks) together with a
+    key -> line index so that editor searches run in O(hits) instead of a
+    full scan of the file. The raw lines are kept as the single source of
+    truth and are shared with the caller, so the module level task functions
+    in parameterEditor keep operating on doc.lines directly.
+
+    Line inserts and deletes made through the document (insert, pop,
+    slice assignment and del) keep the indices valid without re-parsing
+    the file. Key locations are shifted lazily through a log of the edits,
+    the object tree, loop blocks and parameter flags are shifted in place and
+    only the inserted lines are parsed. Edits that change the structure
+    around them (e.g. splitting a loop_ block) fall back to a full re-parse.
+    '''
+
+    odf_key = '_rita_wimv_odf_values'
+    odf_end = '#end_custom_object_odf'
+    # number format of rewritten ODF values
+    odf_format = '%.8g'
+    bulk_objects = ('intensity_data', 'texture_factors', 'Fhkl')
+    max_log = 256
+    # ParCache used by from_file, see use_cache
+    cache = None
+    # object types of the path queries, the type of a subordinate object is its first key
+    object_types = {'phase': '_pd_phase_name',
+                    'instrument': '_diffrn_measurement_device',
+                    'dataset': '_pd_meas_dataset_id',
+                    'datafile': '_riet_meas_datafile_name',
+                    'texture': '_pd_proc_ls_pref_orient_corr',
+                    'size_strain': '_riet_size_strain_model',
+                    'site': '_atom_site_label',
+                    'scatterer': '_rg_site_scatterer'}
+
+    def __init__(self, lines=None, fname=None):
+        if lines is None:
+            lines = []
+        self.lines = lines
+        self.fname = fname
+        self.preserve = False
+        self._dirty = True
+        self.parse()
+
+    @classmethod
+    def from_file(cls, fname, lazy=False, preserve=False):
+        '''
+        Read and parse a parameter file.
+
+        With lazy the contents of the custom objects in bulk_objects (measured
+        intensities, texture factors, Fhkl) are not read but kept as BulkData
+        lines that are streamed from the file when the document is written.
+        The file must not be changed by other programs until then, writing the
+        document back to the same file is fine.
+
+        With preserve the lines keep their line ends and the document is
+        written back with the original line ends and white space, only the
+        lines changed by the editor are rewritten.
+
+        When a cache is enabled (see use_cache) unchanged files are not parsed
+        again, the document is an independent copy of the cached one.
+        '''
+        if cls.cache is not None:
+            return cls.cache.open(fname, lazy, preserve)
+        return cls._read(fname, lazy, preserve)
+
+    @classmethod
+    def _read(cls, fname, lazy, preserve=False):
+        newline = '' if preserve else None
+        if lazy:
+            lines = read_lines(fname, cls.bulk_objects, newline)
+        else:
+            with open(fname, newline=newline) as f:
+                lines = f.readlines()
+        doc = cls(lines, fname=fname)
+        doc.preserve = preserve
+        return doc
+
+    def copy(self):
+        '''
+        Independent copy of the document.
+
+        The line strings are shared, the object tree, loop blocks and indices
+        are copied without parsing the lines again.
+        '''
+        self._check()
+        new = self._clone()
+        new.lines = list(self.lines)
+        new._line_path = list(self._line_path)
+        return new
+
+    def _clone(self):
+        # copy of everything but the lines and the path ids of the lines
+        new = self.__class__.__new__(self.__class__)
+        new.fname = self.fname
+        new.preserve = self.preserve
+        new._dirty = False
+
+        objs = {}
+        root = ParObject('', 'root', 0)
+        objs[id(self.root)] = root
+        for obj in self._objs:
+            o = ParObject(obj.name, obj.kind, obj.start, objs[id(obj.parent)])
+            o.end = obj.end
+            o.path = obj.path
+            o.path_id = obj.path_id
+            objs[id(obj)] = o
+        for obj in [self.root] + self._objs:
+            objs[id(obj)].children = [objs[id(child)] for child in obj.children]
+        new.root = root
+        new._objs = [objs[id(obj)] for obj in self._objs]
+        # objects deleted since the last parse keep their (unused) path ids
+        new.chains = [tuple(objs.get(id(obj), obj) for obj in chain) for chain in self.chains]
+        new.paths = list(self.paths)
+        new._scopes = dict(self._scopes)
+
+        loop_list = []
+        for loop in self._loop_list:
+            lp = LoopBlock(loop.start, loop.header, loop.keys, loop.odf, objs[id(loop.obj)])
+            lp.row_start = loop.row_start
+            lp.row_end = loop.row_end
+            loop_list.append(lp)
+        new._loop_list = loop_list
+        new._loops = None
+        new._refined = set(self._refined)
+        new._tracked = set(self._tracked)
+        new._constrained = set(self._constrained)
+        new._refs = None
+        new._log = list(self._log)
+        new._key_epoch = dict(self._key_epoch)
+        new._match_cache = dict(self._match_cache)
+        new._key_lines = {key: list(pos) for key, pos in self._key_lines.items()}
+        return new
+
+    def snapshot(self):
+        '''
+        Snapshot of the current state, see ParSnapshot.
+
+        Unchanged parts are shared with the previous snapshot of the document,
+        roll back with restore, branch with ParSnapshot.document or save it
+        with ParSnapshot.write.
+        '''
+        self._check()
+        snapshot = ParSnapshot(self, getattr(self, '_snapshot', None))
+        self._snapshot = snapshot
+        return snapshot
+
+    def restore(self, snapshot):
+        '''
+        Return to the state of snapshot, without parsing. The lines list is
+        kept (and refilled) so that views of it (editor.lines) stay valid.
+        '''
+        lines = self.lines
+        new = snapshot.document()
+        lines[:] = new.lines
+        self.__dict__.update(new.__dict__)
+        self.lines = lines
+        self._snapshot = snapshot
+
+    # ------------------------------------------------------------------
+    # parsing
+    # ------------------------------------------------------------------
+    def parse(self):
+        '''(Re)build the object tree and the indices from self.lines.'''
+        self.root = ParObject('', 'root', 0)
+        self.paths = ['']
+        self.chains = [()]
+        self._scopes = {}
+        self._objs = []
+        self._loop_list = []
+        self._loops = None
+        self._refined = set()
+        self._tracked = set()
+        self._constrained = set()
+        self._refs = None
+        self._log = []
+        self._key_epoch = {}
+        self._match_cache = {}
+        self._line_path, self._key_lines, _, _ = self._scan(0, len(self.lines), [self.root],
+                                                             self._objs, self._loop_list)
+        self._dirty = False
+
+    def _scan(self, start, stop, stack, objs, loops, strict=False):
+        '''
+        Parse lines[start:stop] inside the open objects in stack.
+
+        New objects are linked into the tree and appended to objs, new loop_
+        blocks to loops and parameter flags added to the document. Every new
+        subordinate object gets its own path id. The path ids of the lines
+        and the key locations are returned. With strict an
+        end marker closing an object opened before start raises _Unbalanced
+        instead of being ignored.
+        '''
+        lines = self.lines
+        refined = self._refined
+        tracked = self._tracked
+        constrained = self._constrained
+        floor = len(stack) if strict else 1
+        key_lines = {}
+        line_path = [0]*(stop - start)
+        path_id = stack[-1].path_id
+
+        inloop = None
+        prev_loop = False
+        for i in range(start, stop):
+            line = lines[i]
+            line_path[i - start] = path_id
+            c = line[:1]
+            if inloop is not None:
+                # rows of a loop run until a blank line (ODF: until the end marker)
+                if inloop.odf:
+                    if self.odf_end not in line:
+                        inloop.row_end = i + 1
+                        continue
+                    inloop = None
+                elif line.strip():
+                    inloop.row_end = i + 1
+                    if c == '_':
+                        key_lines.setdefault(line.split(None, 1)[0], []).append(i)
+                    if '#min' in line and '(' in line:
+                        refined.add(i)
+                    if ' #autotrace' in line:
+                        tracked.add(i)
+                    if '#ref' in line:
+                        constrained.add(i)
+                    continue
+                else:
+                    inloop = None
+
+            if prev_loop:
+                prev_loop = False
+                keys = line.split()
+                for key in keys:
+                    key_lines.setdefault(key, []).append(i)
+                inloop = LoopBlock(i - 1, i, keys, self.odf_key in keys, stack[-1])
+                loops.append(inloop)
+                continue
+
+            if c == '_':
+                key = line.split(None, 1)[0]
+                key_lines.setdefault(key, []).append(i)
+                if '#min' in line and '(' in line:
+                    refined.add(i)
+                if ' #autotrace' in line:
+                    tracked.add(i)
+                if '#ref' in line:
+                    constrained.add(i)
+            elif c == '#':
+                if line.startswith('#end_subordinateObject') or line.startswith('#end_custom_object'):
+                    if len(stack) > floor:
+                        obj = stack.pop()
+                        obj.end = i
+                        if obj.kind == 'subordinate':
+                            path_id = stack[-1].path_id
+                            line_path[i - start] = path_id
+                    elif strict:
+                        raise _Unbalanced(i)
+                elif line.startswith('#subordinateObject') or line.startswith('#custom_object'):
+                    parent = stack[-1]
+                    if line.startswith('#subordinateObject'):
+                        tag = line.partition('subordinateObject')[2].rstrip('\r\n')
+                        obj = ParObject(tag[1:], 'subordinate', i, parent)
+                        obj.path = parent.path + tag + '\n'
+                        obj.path_id = path_id = len(self.paths)
+                        self.paths.append(obj.path)
+                        self.chains.append(self.chains[parent.path_id] + (obj,))
+                        line_path[i - start] = path_id
+                    else:
+                        obj = ParObject(line.partition('custom_object')[2].strip()[1:], 'custom', i, parent)
+                        obj.path = parent.path
+                        obj.path_id = parent.path_id
+                    children = parent.children
+                    if children and children[-1].start > i:
+                        j = len(children)
+                        while j > 0 and children[j - 1].start > i:
+                            j -= 1
+                        children.insert(j, obj)
+                    else:
+                        children.append(obj)
+                    objs.append(obj)
+                    stack.append(obj)
+            elif line.startswith('loop_'):
+                prev_loop = True
+
+        return line_path, key_lines, inloop, prev_loop
+
+    def invalidate(self):
+        '''Mark the indices stale after edits made directly to self.lines.'''
+        self._dirty = True
+
+    def _check(self):
+        if self._dirty:
+            self.parse()
+
+    def refresh(self, index):
+        '''Update the per-line parameter flags after in place line edits.'''
+        self._check()
+        lines = self.lines
+        for i in index:
+            line = lines[i]
+            if '#min' in line and '(' in line:
+                self._refined.add(i)
+            else:
+                self._refined.discard(i)
+            if ' #autotrace' in line:
+                self._tracked.add(i)
+            else:
+                self._tracked.discard(i)
+            if '#ref' in line:
+                self._constrained.add(i)
+            else:
+                self._constrained.discard(i)
+        self._refs = None
+
+    # ------------------------------------------------------------------
+    # incremental maintenance
+    # ------------------------------------------------------------------
+    def _positions(self, key):
+        '''Current line indices of key, shifting them through the edit log.'''
+        pos = self._key_lines[key]
+        epoch = self._key_epoch.get(key, 0)
+        if epoch < len(self._log):
+            pos = _shift(pos, self._log, epoch)
+            self._key_lines[key] = pos
+            self._key_epoch[key] = len(self._log)
+        return pos
+
+    def _compact(self):
+        '''Rebuild the key index from the lines and drop the edit log.'''
+        lines = self.lines
+        headers = {loop.header: loop.keys for loop in self._loop_list}
+        odf_rows = [(loop.row_start, loop.row_end) for loop in self._loop_list if loop.odf]
+        key_lines = {}
+        for i, line in enumerate(lines):
+            if i in headers:
+                for key in headers[i]:
+                    key_lines.setdefault(key, []).append(i)
+            elif line[:1] == '_':
+                key_lines.setdefault(line.split(None, 1)[0], []).append(i)
+        for start, stop in odf_rows:
+            for i in range(start, stop):
+                if lines[i][:1] == '_':
+                    key_lines[lines[i].split(None, 1)[0]].remove(i)
+        self._key_lines = {k: v for k, v in key_lines.items() if v}
+        self._log = []
+        self._key_epoch = {}
+        self._match_cache = {}
+
+    def _add_keys(self, key_lines):
+        epoch = len(self._log)
+        for key, pos in key_lines.items():
+            if key in self._key_lines:
+                old = self._positions(key)
+                self._key_lines[key] = sorted(old + pos)
+            else:
+                self._key_lines[key] = pos
+                self._match_cache = {}
+            self._key_epoch[key] = epoch
+
+    def _loop_map(self):
+        if self._loops is None:
+            self._loops = {loop.header: loop for loop in self._loop_list}
+        return self._loops
+
+    def _stack_at(self, i):
+        '''Open objects at the position before line i.'''
+        stack = [self.root]
+        children = self.root.children
+        while children:
+            k = _bisect_start(children, i) - 1
+            if k < 0:
+                break
+            obj = children[k]
+            if obj.end is not None and obj.end < i:
+                break
+            stack.append(obj)
+            children = obj.children
+        return stack
+
+    def _insert_lines(self, i, new):
+        m = len(new)
+        self.lines[i:i] = new
+        if m == 0 or self._dirty:
+            return
+        lines = self.lines
+        loop_list = self._loop_list
+        kl = _bisect_start(loop_list, i)
+        loop = loop_list[kl - 1] if kl > 0 else None
+        if loop is not None and i <= loop.row_end:
+            # only whole rows of a plain loop_ block
+            if loop.odf or i == loop.header or not all(line.strip() for line in new):
+                self._dirty = True
+                return
+        elif i > 0 and lines[i - 1].startswith('loop_'):
+            self._dirty = True
+            return
+        else:
+            loop = None
+
+        # shift everything at or after i
+        stack = self._stack_at(i)
+        objs = self._objs
+        ko = _bisect_start(objs, i)
+        self._log.append((True, i, m))
+        for obj in stack[1:]:
+            if obj.end is not None:
+                obj.end += m
+        for obj in objs[ko:]:
+            obj.start += m
+            if obj.end is not None:
+                obj.end += m
+        if loop is not None:
+            loop.row_end += m
+        for lp in loop_list[kl:]:
+            lp.start += m
+            lp.header += m
+            lp.row_start += m
+            lp.row_end += m
+        self._loops = None
+        self._refined = {p + m if p >= i else p for p in self._refined}
+        self._tracked = {p + m if p >= i else p for p in self._tracked}
+        self._constrained = {p + m if p >= i else p for p in self._constrained}
+        self._refs = None
+
+        # parse the new lines
+        if loop is not None:
+            path_id = self._line_path[loop.header]
+            key_lines = {}
+            for j in range(i, i + m):
+                line = lines[j]
+                if line[:1] == '_':
+                    key_lines.setdefault(line.split(None, 1)[0], []).append(j)
+                if '#min' in line and '(' in line:
+                    self._refined.add(j)
+                if ' #autotrace' in line:
+                    self._tracked.add(j)
+                if '#ref' in line:
+                    self._constrained.add(j)
+            self._line_path[i:i] = [path_id]*m
+        else:
+            depth = len(stack)
+            new_objs = []
+            new_loops = []
+            try:
+                line_path, key_lines, inloop, prev_loop = self._scan(i, i + m, stack, new_objs,
+                                                                     new_loops, strict=True)
+            except _Unbalanced:
+                self._dirty = True
+                return
+            end = i + m
+            if len(stack) != depth or prev_loop or \
+                    (inloop is not None and (inloop.odf or (end < len(lines) and lines[end].strip()))):
+                self._dirty = True
+                return
+            objs[ko:ko] = new_objs
+            loop_list[kl:kl] = new_loops
+            self._line_path[i:i] = line_path
+            if new_objs:
+                self._scopes = {}
+        self._add_keys(key_lines)
+        if len(self._log) > self.max_log:
+            self._compact()
+
+    def _delete_lines(self, a, b):
+        n = b - a
+        if n <= 0:
+            return
+        lines = self.lines
+        if self._dirty:
+            del lines[a:b]
+            return
+
+        # the edit may not cut through a loop_ block or an object
+        loop_list = self._loop_list
+        ka = _bisect_start(loop_list, a)
+        kb = _bisect_start(loop_list, b)
+        loop = loop_list[ka - 1] if ka > 0 else None
+        if loop is None:
+            cut = False
+        elif loop.row_end <= a:
+            # a blank line ending a loop_ block may not be removed if rows would follow
+            cut = loop.row_end == a and not loop.odf and b < len(lines) and bool(lines[b].strip())
+            loop = None
+        else:
+            cut = not (loop.row_start <= a and b <= loop.row_end)
+        stack = self._stack_at(a)
+        objs = self._objs
+        koa = _bisect_start(objs, a)
+        kob = _bisect_start(objs, b)
+        if cut or any(lp.row_end > b for lp in loop_list[ka:kb]) or \
+                any(obj.end is not None and obj.end < b for obj in stack[1:]) or \
+                any(obj.end is None or obj.end >= b for obj in objs[koa:kob]):
+            del lines[a:b]
+            self._dirty = True
+            return
+
+        del lines[a:b]
+        self._log.append((False, a, n))
+        for obj in objs[koa:kob]:
+            if obj.parent.kind == 'root' or obj.parent.start < a:
+                obj.parent.children.remove(obj)
+        del objs[koa:kob]
+        for obj in stack[1:]:
+            if obj.end is not None:
+                obj.end -= n
+        for obj in objs[koa:]:
+            obj.start -= n
+            if obj.end is not None:
+                obj.end -= n
+        if loop is not None:
+            loop.row_end -= n
+        del loop_list[ka:kb]
+        for lp in loop_list[ka:]:
+            lp.start -= n
+            lp.header -= n
+            lp.row_start -= n
+            lp.row_end -= n
+        self._loops = None
+        self._refined = {p - n if p >= b else p for p in self._refined if not a <= p < b}
+        self._tracked = {p - n if p >= b else p for p in self._tracked if not a <= p < b}
+        self._constrained = {p - n if p >= b else p for p in self._constrained if not a <= p < b}
+        self._refs = None
+        del self._line_path[a:b]
+        self._match_cache = {}
+        if koa < kob:
+            self._scopes = {}
+        if len(self._log) > self.max_log:
+            self._compact()
+
+    # list interface used by the structural editor tasks
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __getitem__(self, i):
+        return self.lines[i]
+
+    def __setitem__(self, i, value):
+        if isinstance(i, slice):
+            a, b, step = i.indices(len(self.lines))
+            assert step == 1, 'extended slices are not supported'
+            b = max(a, b)
+            value = list(value)
+        else:
+            a = i if i >= 0 else len(self.lines) + i
+            b = a + 1
+            value = [value]
+        self._delete_lines(a, b)
+        self._insert_lines(a, value)
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            a, b, step = i.indices(len(self.lines))
+            assert step == 1, 'extended slices are not supported'
+            self._delete_lines(a, max(a, b))
+        else:
+            a = i if i >= 0 else len(self.lines) + i
+            self._delete_lines(a, a + 1)
+
+    def insert(self, i, line):
+        '''Insert line before line i (list.insert semantics).'''
+        n = len(self.lines)
+        if i < 0:
+            i = max(0, n + i)
+        self._insert_lines(min(i, n), [line])
+
+    def pop(self, i=-1):
+        '''Remove and return line i (list.pop semantics).'''
+        a = i if i >= 0 else len(self.lines) + i
+        line = self.lines[a]
+        self._delete_lines(a, a + 1)
+        return line
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+    def keys(self):
+        '''All CIF keys in the document.'''
+        self._check()
+        return [k for k in self._key_lines if self._positions(k)]
+
+    def loops(self):
+        '''All loop_ blocks in document order.'''
+        self._check()
+        return list(self._loop_list)
+
+    def objects(self, kind=None):
+        '''Depth first list of the objects in the tree.'''
+        self._check()
+        out = []
+        stack = list(reversed(self.root.children))
+        while stack:
+            obj = stack.pop()
+            if kind is None or obj.kind == kind:
+                out.append(obj)
+            stack.extend(reversed(obj.children))
+        return out
+
+    def path(self, i):
+        '''Concatenated subordinate object names enclosing line i.'''
+        self._check()
+        return self.paths[self._line_path[i]]
+
+    def chain(self, i):
+        '''Subordinate objects enclosing line i, outermost first.'''
+        self._check()
+        return self.chains[self._line_path[i]]
+
+    def object_type(self, obj):
+        '''First key of a subordinate object, e.g. _pd_phase_name for a phase.'''
+        lines = self.lines
+        stop = len(lines) if obj.end is None else obj.end
+        for i in range(obj.start + 1, stop):
+            c = lines[i][:1]
+            if c == '_':
+                return lines[i].split(None, 1)[0]
+            if c == '#' or lines[i].startswith('loop_'):
+                break
+        return None
+
+    def select(self, query):
+        '''
+        Path ids of the lines inside the objects matched by a path query.
+
+        A query is a '/' separated list of objects, each given as
+        type:name, a bare type or a bare name. Types are the keys of
+        object_types or the first key of the object (_pd_phase_name:alpha),
+        names are glob patterns on the object name or quoted literals, **
+        skips any number of objects. The first object may be at any depth,
+        the following ones are its direct children:
+
+            phase:alpha/texture         texture object of phase alpha
+            datafile:*.gda              all .gda datafiles
+            'Bank 1'/**/site:Fe         Fe sites anywhere below object Bank 1
+
+        The result is cached until objects are added or removed.
+        Required Inputs:
+            query (str): object path query
+        Outputs:
+            frozenset of the path ids of the matched objects and all objects below them
+        '''
+        self._check()
+        ids = self._scopes.get(query)
+        if ids is None:
+            objs = [obj for obj in self._objs if obj.kind == 'subordinate']
+            first = True
+            for seg in self._parse_query(query):
+                if seg is None:
+                    # ** keeps the objects and adds everything below them
+                    if not first:
+                        top = {obj.path_id for obj in objs}
+                        objs = [obj for obj in self._objs if obj.kind == 'subordinate'
+                                and any(o.path_id in top for o in self.chains[obj.path_id])]
+                    continue
+                if not first:
+                    objs = [child for obj in objs for child in _subordinates(obj)]
+                typ, name = seg
+                objs = [obj for obj in objs if (name is None or name.match(obj.name))
+                        and (typ is None or self.object_type(obj) == typ)]
+                first = False
+            matched = {obj.path_id for obj in objs}
+            ids = frozenset(pid for pid, chain in enumerate(self.chains)
+                            if any(obj.path_id in matched for obj in chain))
+            self._scopes[query] = ids
+        return ids
+
+    def _parse_query(self, query):
+        segments = []
+        for seg in _query_segment.findall(query):
+            seg = seg.strip()
+            if seg == '**':
+                segments.append(None)
+                continue
+            typ, colon, name = seg.partition(':')
+            if not colon or typ[:1] in ('"', "'"):
+                if seg in self.object_types:
+                    typ, name = seg, '*'
+                else:
+                    typ, name = '*', seg
+            typ = typ.strip()
+            name = name.strip()
+            if typ in ('', '*'):
+                typ = None
+            else:
+                typ = self.object_types.get(typ, typ)
+                if typ[:1] != '_':
+                    raise NameError(f'unknown object type in {query!r}, use one of '
+                                    f'{sorted(self.object_types)} or the first key of the object')
+            if name in ('', '*'):
+                name = None
+            elif len(name) > 1 and name[0] == name[-1] and name[0] in ('"', "'"):
+                name = re.compile(re.escape(name[1:-1]) + r'\Z')
+            else:
+                name = re.compile(fnmatch.translate(name))
+            segments.append((typ, name))
+        assert segments, f'empty object path query {query!r}'
+        return segments
+
+    def scope(self, index, sobj=None, nsobj=None):
+        '''
+        Positions j of the lines index[j] inside the subordinate object scope.
+
+        Mirrors the editor sobj/nsobj filters: every sobj entry has to match
+        and no nsobj entry may match the objects enclosing a line. Entries
+        with a ':' are path queries (see select), other entries are sub strings
+        of the concatenated object path. The sobj 'First' keeps only the first
+        line, the nsobj 'First' drops it. Each entry is resolved once for the
+        document and the lines are filtered through their path id.
+        Required Inputs:
+            index (list): line indices e.g. from search
+        Optional inputs:
+            sobj  (list): objects the lines have to be in
+            nsobj (list): objects the lines may not be in
+        Outputs:
+            positions in index of the lines in scope
+        '''
+        self._check()
+        sobj = _scope_entries(sobj)
+        nsobj = _scope_entries(nsobj)
+        keep = range(len(index))
+        if sobj[:1] == ['First']:
+            return list(keep[:1])
+        if nsobj[:1] == ['First']:
+            keep = keep[1:]
+        if not sobj and not nsobj:
+            return list(keep)
+        allowed = None
+        for x in sobj:
+            ids = self._entry_ids(x)
+            allowed = ids if allowed is None else allowed & ids
+        for x in nsobj:
+            allowed = (frozenset(range(len(self.paths))) if allowed is None else allowed) - \
+                self._entry_ids(x)
+        line_path = self._line_path
+        return [j for j in keep if line_path[index[j]] in allowed]
+
+    def _entry_ids(self, x):
+        if ':' in x:
+            return self.select(x)
+        key = ('sub string', x)
+        ids = self._scopes.get(key)
+        if ids is None:
+            ids = frozenset(pid for pid, path in enumerate(self.paths) if x in path)
+            self._scopes[key] = ids
+        return ids
+
+    def loop_at(self, header):
+        '''Loop block whose header is line header, else None.'''
+        self._check()
+        return self._loop_map().get(header)
+
+    def loop_of(self, i):
+        '''Loop block holding row i, else None.'''
+        self._check()
+        k = _bisect_start(self._loop_list, i + 1)
+        if k > 0:
+            loop = self._loop_list[k - 1]
+            if loop.row_start <= i < loop.row_end:
+                return loop
+        return None
+
+    def append_rows(self, loop, rows):
+        '''
+        Append rows to a loop_ block. Any number of rows is a single edit of
+        the document (one list insert and one index update). Returns the
+        number of rows added.
+        '''
+        rows = list(rows)
+        self._insert_lines(loop.row_end, rows)
+        return len(rows)
+
+    def remove_rows(self, loop, n):
+        '''Remove the last n rows (at most all) of a loop_ block in a single edit, returns the number removed.'''
+        n = max(0, min(n, loop.nrows))
+        self._delete_lines(loop.row_end - n, loop.row_end)
+        return n
+
+    def resize_loop(self, loop, nrows, row='0 #min -10000.0 #max 10000.0'):
+        '''
+        Append copies of row to, or remove rows from the end of, a loop_ block
+        until it holds nrows rows. Returns the change in the number of rows.
+        '''
+        if nrows > loop.nrows:
+            return self.append_rows(loop, [row]*(nrows - loop.nrows))
+        return -self.remove_rows(loop, loop.nrows - nrows)
+
+    def refined_lines(self):
+        '''Sorted line indices of free (refined) parameters.'''
+        self._check()
+        return sorted(self._refined)
+
+    def tracked_lines(self):
+        '''Sorted line indices of parameters with #autotrace.'''
+        self._check()
+        return sorted(self._tracked)
+
+    # ------------------------------------------------------------------
+    # #ref / #equalTo constraints
+    # ------------------------------------------------------------------
+    def _ref_graph(self):
+        '''
+        Reference graph of the parameters holding a #ref token.
+
+        Built from the lines flagged while parsing on first use and dropped
+        by every edit, so a batch of lookups costs a single pass over the
+        constrained lines.
+        '''
+        self._check()
+        graph = self._refs
+        if graph is None:
+            ids, targets, refers, users = {}, {}, {}, {}
+            lines = self.lines
+            for i in sorted(self._constrained):
+                par = Parameter(lines[i])
+                ref = par.ref
+                if ref is not None:
+                    ids[i] = ref
+                    targets.setdefault(ref, []).append(i)
+                ref = par.refers_to
+                if ref is not None:
+                    refers[i] = ref
+                    users.setdefault(ref, []).append(i)
+            graph = self._refs = (ids, targets, refers, users)
+        return graph
+
+    def ref_id(self, i):
+        '''Reference id carried by line i (e.g. '#ref8'), else None.'''
+        return self._ref_graph()[0].get(i)
+
+    def ref_target(self, ref):
+        '''Line index of the parameter carrying reference id ref, else None.'''
+        targets = self._ref_graph()[1].get(ref)
+        return targets[0] if targets else None
+
+    def ref_users(self, ref):
+        '''Sorted line indices of the parameters bound to reference id ref.'''
+        return list(self._ref_graph()[3].get(ref, ()))
+
+    def referent(self, i):
+        '''Line index of the parameter line i is bound to by #equalTo, else None.'''
+        ref = self._ref_graph()[2].get(i)
+        return None if ref is None else self.ref_target(ref)
+
+    def referrers(self, i):
+        '''Sorted line indices of the parameters bound to line i by #equalTo.'''
+        ref = self.ref_id(i)
+        return [] if ref is None else self.ref_users(ref)
+
+    def new_ref_id(self):
+        '''A reference id not used anywhere in the document.'''
+        ids, targets, refers, users = self._ref_graph()
+        top = 0
+        for ref in list(targets) + list(users):
+            if ref[4:].isdigit():
+                top = max(top, int(ref[4:]))
+        return f'#ref{top + 1}'
+
+    # ------------------------------------------------------------------
+    # ODF value blocks
+    # ------------------------------------------------------------------
+    def odf_loops(self, sobj=None, nsobj=None):
+        '''ODF value loop_ blocks in document order, filtered like scope.'''
+        self._check()
+        loops = [loop for loop in self._loop_list if loop.odf]
+        return [loops[j] for j in self.scope([loop.header for loop in loops], sobj, nsobj)]
+
+    def odf_values(self, loop):
+        '''Values of an ODF block as a flat float array, parsed from its rows in one go.'''
+        return np.array(' '.join(self.lines[loop.row_start:loop.row_end]).split(), dtype=float)
+
+    def set_odf_values(self, loop, values):
+        '''
+        Replace the values of an ODF block, keeping the number of values on
+        every row.
+        Required Inputs:
+            loop (LoopBlock): ODF block, see odf_loops
+            values   (float): a single value for all cells, written as repr(float(values)) e.g. 1.0,
+                              or an array of as many values as the block holds, formatted with odf_format
+        Outputs:
+            number of rows rewritten
+        '''
+        rows = self.lines[loop.row_start:loop.row_end]
+        counts = [len(row.split()) for row in rows]
+        if np.ndim(values) == 0:
+            token = repr(float(values))
+            new = [" ".join([token]*n) for n in counts]
+        else:
+            values = np.asarray(values, dtype=float).ravel()
+            assert values.size == sum(counts), \
+                f'ODF block holds {sum(counts)} values, {values.size} were given'
+            new = _format_rows(values, counts, self.odf_format)
+        self.lines[loop.row_start:loop.row_end] = new
+        return len(new)
+
+    def copy_odf(self, loop, source, source_loop):
+        '''
+        Copy the values of source_loop in source (may be self) to loop. Rows
+        are copied as text when both blocks have the same layout, else the
+        values are reformatted. Returns the number of rows rewritten.
+        '''
+        rows = source.lines[source_loop.row_start:source_loop.row_end]
+        counts = [len(row.split()) for row in rows]
+        if counts == [len(row.split()) for row in self.lines[loop.row_start:loop.row_end]]:
+            self.lines[loop.row_start:loop.row_end] = [row.strip() for row in rows]
+            return len(rows)
+        return self.set_odf_values(loop, source.odf_values(source_loop))
+
+    def save_odf(self, fname, sobj=None, nsobj=None):
+        '''
+        Save the ODF blocks in scope with numpy, a single block to a .npy
+        file, any number of blocks to a .npz file (arr_0, arr_1, ...).
+        Returns the number of blocks saved.
+        '''
+        values = [self.odf_values(loop) for loop in self.odf_loops(sobj, nsobj)]
+        if fname.endswith('.npz'):
+            np.savez(fname, *values)
+        else:
+            assert len(values) == 1, f'{len(values)} ODF blocks are in scope, save them to a .npz file'
+            np.save(fname, values[0])
+        return len(values)
+
+    def find(self, keyword):
+        '''
+        Line indices containing keyword.
+
+        Keywords that look like CIF keys (start with '_' and hold no white
+        space) are resolved through the key index, anything else falls back
+        to a scan of the lines.
+        Required Inputs:
+            keyword (str): key or sub string of a key
+        Outputs:
+            sorted line indices
+        '''
+        self._check()
+        if keyword[:1] == '_' and len(keyword.split()) == 1:
+            keys = self._match_cache.get(keyword)
+            if keys is None:
+                keys = [k for k in self._key_lines if keyword in k]
+                self._match_cache[keyword] = keys
+            if len(keys) == 1:
+                return list(self._positions(keys[0]))
+            index = set()
+            for k in keys:
+                index.update(self._positions(k))
+            return sorted(index)
+        return [i for i, line in enumerate(self.lines) if keyword in line]
+
+    def find_many(self, keywords):
+        '''
+        find for several keywords at once.
+
+        Keys are resolved through the key index, all other keywords share one
+        pass over the document: the lines are joined once and every keyword
+        is located in the joined text with str.find (faster than one regular
+        expression alternating the keywords), only the hits are mapped back
+        to line indices.
+        Outputs:
+            dict of the sorted line indices of every keyword
+        '''
+        self._check()
+        found = {}
+        scan = []
+        for keyword in keywords:
+            if keyword in found:
+                continue
+            if (keyword[:1] == '_' and len(keyword.split()) == 1) or '\n' in keyword:
+                found[keyword] = self.find(keyword)
+            else:
+                found[keyword] = None
+                scan.append(keyword)
+        if len(scan) == 1:
+            # joining the lines only pays off for several keywords
+            found[scan[0]] = self.find(scan[0])
+        elif scan:
+            lines = self.lines
+            text = '\n'.join(lines)
+            ends = None
+            for keyword in scan:
+                index = []
+                pos = text.find(keyword)
+                if pos >= 0 and ends is None:
+                    # text offset after the separator of every line
+                    ends = (np.cumsum(np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))) +
+                            np.arange(1, len(lines) + 1)).tolist()
+                while pos >= 0:
+                    i = bisect.bisect_right(ends, pos)
+                    index.append(i)
+                    pos = text.find(keyword, ends[i])
+                found[keyword] = index
+        return found
+
+    def search_many(self, keywords, max_hit=1e6, reverse=False):
+        '''
+        search for several keywords, see search. The keywords are located with
+        find_many, so N keywords cost about as much as one.
+        Outputs:
+            one [index, sobj, isloop, indloop, endloop] per keyword
+        '''
+        found = self.find_many(keywords)
+        return [self._expand(found[keyword], max_hit, reverse) for keyword in keywords]
+
+    def search(self, keyword, max_hit=1e6, reverse=False):
+        '''
+        Locate keyword in the document.
+
+        Mirrors parameterEditor.search_list: loop keys expand to their rows
+        and ODF value blocks to all lines up to #end_custom_object_odf.
+        Required Inputs:
+            keyword (str): key to search for
+        Optional inputs:
+            max_hit (int): maximum number of keyword hits
+            reverse (bool): start the search at the end of the file
+        Outputs:
+            [index, sobj, isloop, indloop, endloop] where sobj holds the concatenated
+            subordinate object path of each hit
+        '''
+        return self._expand(self.find(keyword), max_hit, reverse)
+
+    def _expand(self, hits, max_hit, reverse):
+        '''search results of the lines hits.'''
+        index = []
+        sobj = []
+        isloop = []
+        indloop = []
+        endloop = []
+
+        if reverse:
+            hits = reversed(hits)
+        paths = self.paths
+        line_path = self._line_path
+        loops = self._loop_map()
+        nhit = 0
+        for i in hits:
+            loop = loops.get(i)
+            path = paths[line_path[i]]
+            if loop is None:
+                index.append(i)
+                sobj.append(path)
+                isloop.append(False)
+                indloop.append(-1)
+                endloop.append(False)
+            else:
+                rows = range(loop.row_start, loop.row_end)
+                ids = range(0, loop.nrows)
+                if reverse:
+                    rows = reversed(rows)
+                    ids = reversed(ids)
+                for ind, indlooploc in zip(rows, ids):
+                    index.append(ind)
+                    sobj.append(path)
+                    isloop.append(True)
+                    indloop.append(indlooploc)
+                    endloop.append(False)
+                if loop.nrows > 0:
+                    endloop[-1] = True
+            nhit += 1
+            if nhit >= max_hit:
+                break
+
+        return [index, sobj, isloop, indloop, endloop]
+
+    # ------------------------------------------------------------------
+    # output
+    # ------------------------------------------------------------------
+    def serialize(self):
+        '''Text as written by parameterEditor.write_par (or as read with preserve).'''
+        return ''.join(par_lines(self.lines, self.preserve))
+
+    def write(self, ofile, skip_unchanged=False):
+        '''
+        Write the document in the parameterEditor.write_par format, or with
+        the original line ends and white space if it was read with preserve.
+        See write_lines.
+        '''
+        return write_lines(self.lines, ofile, self.preserve, skip_unchanged)
+
+
+class ParSnapshot:
+    '''
+    Frozen state of a ParDocument, see ParDocument.snapshot.
+
+    The lines and the path ids of the lines are stored in chunks of
+    chunk_size entries. A chunk equal to the same chunk of the snapshot
+    taken before is shared with it, so a series of snapshots of a document
+    that is edited in between stores only the chunks around the edits. The
+    line strings are always shared with the document, the object tree and
+    the key index are copied.
+    '''
+
+    chunk_size = 4096
+
+    def __init__(self, doc, base=None):
+        self.fname = doc.fname
+        self.preserve = doc.preserve
+        self._state = doc._clone()
+        self._lines = _share_chunks(doc.lines, base._lines if base else (), self.chunk_size)
+        self._line_path = _share_chunks(doc._line_path, base._line_path if base else (), self.chunk_size)
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._lines)
+
+    def lines(self):
+        '''The lines of the snapshot as a new list.'''
+        return list(itertools.chain.from_iterable(self._lines))
+
+    def document(self):
+        '''Independent ParDocument in the state of the snapshot.'''
+        new = self._state._clone()
+        new.lines = self.lines()
+        new._line_path = list(itertools.chain.from_iterable(self._line_path))
+        return new
+
+    def write(self, ofile, skip_unchanged=False):
+        '''Write the snapshot like ParDocument.write.'''
+        return write_lines(self.lines(), ofile, self.preserve, skip_unchanged)
+
+
+def _share_chunks(items, base, size):
+    '''items in chunks of size, reusing the equal chunks of base.'''
+    chunks = []
+    for k, start in enumerate(range(0, len(items), size)):
+        chunk = tuple(items[start:start + size])
+        if k < len(base) and base[k] == chunk:
+            chunk = base[k]
+        chunks.append(chunk)
+    return tuple(chunks)
+
+
+class ParCache:
+    '''
+    LRU cache of parsed parameter files.
+
+    Documents are looked up by file path and checked against the size and
+    modification time of the file. When those changed (e.g. MAUD rewrote the
+    file) the content hash decides whether the cached document is still
+    valid, only files with new contents are parsed again. Every open returns
+    an independent copy, edits never reach the cached document.
+
+    With a directory the parsed documents are also pickled there by content
+    hash so that other processes (process pools, the cinema builders) can
+    load them instead of parsing. Only use a directory you trust, the files
+    are unpickled.
+    Optional inputs:
+        maxsize   (int): number of documents kept in memory and on disk
+        directory (str): directory for the pickled documents, memory only if None
+        verify   (bool): always compare the content hash, for file systems with a coarse modification time
+    '''
+
+    # bumped whenever the pickled document state changes
+    format = 2
+
+    def __init__(self, maxsize=32, directory=None, verify=False):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.verify = verify
+        self.hits = 0
+        self.misses = 0
+        self._docs = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def open(self, fname, lazy=False, preserve=False):
+        '''Parsed copy of fname, see ParDocument.from_file.'''
+        path = os.path.abspath(fname)
+        key = (path, lazy, preserve)
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            entry = self._docs.get(key)
+            if entry is not None and entry[0] == stamp and not self.verify:
+                self._docs.move_to_end(key)
+                self.hits += 1
+                return self._copy(entry[2], fname)
+
+        digest = _file_digest(path)
+        doc = None
+        if entry is not None and entry[1] == digest:
+            doc = entry[2]
+            if entry[0] != stamp:
+                _rebind(doc.lines, path)
+        elif self.directory is not None:
+            doc = self._load(digest, key[1:], path)
+        if doc is None:
+            self.misses += 1
+            doc = ParDocument._read(path, lazy, preserve)
+            if self.directory is not None:
+                self._dump(doc, digest, key[1:])
+        else:
+            self.hits += 1
+        with self._lock:
+            self._docs[key] = (stamp, digest, doc)
+            self._docs.move_to_end(key)
+            while len(self._docs) > self.maxsize:
+                self._docs.popitem(last=False)
+        return self._copy(doc, fname)
+
+    def clear(self):
+        '''Drop the documents held in memory.'''
+        with self._lock:
+            self._docs.clear()
+
+    @staticmethod
+    def _copy(doc, fname):
+        new = doc.copy()
+        new.fname = fname
+        return new
+
+    def _file(self, digest, mode):
+        lazy, preserve = mode
+        return os.path.join(self.directory, digest + ('_lazy' if lazy else '') +
+                            ('_preserve' if preserve else '') + '.pardoc')
+
+    def _load(self, digest, mode, path):
+        fname = self._file(digest, mode)
+        try:
+            with open(fname, 'rb') as f:
+                fmt, lines, state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if fmt != self.format:
+            return None
+        os.utime(fname)
+        doc = ParDocument.__new__(ParDocument)
+        doc.__dict__.update(state)
+        doc.lines = lines
+        doc.fname = path
+        _rebind(lines, path)
+        return doc
+
+    def _dump(self, doc, digest, mode):
+        # bulk data blocks are stored by position, they are bound to the file when loaded
+        lines = [('#bulk_data', line.name, line.start, line.stop) if isinstance(line, BulkData) else line
+                 for line in doc.lines]
+        state = {k: v for k, v in doc.__dict__.items() if k not in ('lines', 'fname', '_snapshot')}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((self.format, lines, state), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._file(digest, mode))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.pardoc')]
+        if len(files) > self.maxsize:
+            files.sort(key=lambda f: os.stat(f).st_mtime_ns)
+            for f in files[:len(files) - self.maxsize]:
+                try:
+                    os.unlink(f)
+                except OSError:
+                    pass
+
+
+def use_cache(maxsize=32, directory=None, verify=False):
+    '''
+    Enable the parse cache of ParDocument.from_file, see ParCache.
+
+    A maxsize of 0 disables the cache. The cache is used by everything that
+    reads parameter files through ParDocument (the editor tasks, transactions,
+    extract and summary).
+    Outputs:
+        the enabled ParCache holding the hit and miss counts, or None
+    '''
+    ParDocument.cache = ParCache(maxsize, directory, verify) if maxsize > 0 else None
+    return ParDocument.cache
+
+
+def _file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _rebind(lines, path):
+    '''Bind the bulk data lines to the current file (same contents, new handle).'''
+    source = None
+    for k, line in enumerate(lines):
+        if isinstance(line, (BulkData, tuple)):
+            if source is None:
+                source = _Source(path)
+            if isinstance(line, tuple):
+                _, name, start, stop = line
+            else:
+                name, start, stop = line.name, line.start, line.stop
+            lines[k] = BulkData(name, source, start, stop)
+
+
+class _Unbalanced(Exception):
+    pass
+
+
+# '/' separated query segments, quoted names may hold a '/'
+_query_segment = re.compile(r"""(?:'[^']*'|"[^"]*"|[^/])+""")
+
+
+def _scope_entries(entries):
+    # editor filters come as None, a string or a list starting with None/'None' for no filter
+    if entries is None or isinstance(entries, str):
+        entries = [entries]
+    if not entries or entries[0] is None or entries[0] == 'None':
+        return []
+    return list(entries)
+
+
+def _subordinates(obj):
+    '''Subordinate objects directly below obj, looking through custom objects.'''
+    for child in obj.children:
+        if child.kind == 'subordinate':
+            yield child
+        else:
+            yield from _subordinates(child)
+
+
+def _bisect_start(items, i):
+    '''First index of items (ordered by .start) with start >= i.'''
+    lo, hi = 0, len(items)
+    while lo < hi:
+        mid = (lo + hi)//2
+        if items[mid].start < i:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _shift(pos, log, epoch):
+    '''Map line indices through the inserts/deletes in log[epoch:].'''
+    for insert, at, n in log[epoch:]:
+        if insert:
+            pos = [p + n if p >= at else p for p in pos]
+        else:
+            end = at + n
+            pos = [p - n if p >= end else p for p in pos if not at <= p < end]
+    return pos
@@ -6,8 +6,16 @@ Created on Wed Oct  7 15:54:04 2020
 @author: danielsavage
 """
 import argparse
+import asyncio
+import json
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from .model import (texture, sizeStrain)
+from .model.templates import splice_model_file
+from .parDocument import ParDocument, Parameter, parameter_value, use_cache, write_lines
 from pathlib import Path
 
 class arguments:
@@ -30,8 +38,13 @@ class arguments:
         self.args = None
         self.verbose = None
         self.lines = None
+        self.doc = None
         self.max_search_hits = None
         self.reverse_search = None
+        self.nworkers = None
+        self.pool_type = None
+        self.preserve_format = None
+        self.all_runs = None
         
     def parseConfig(self, config, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None, verbose=None):
 
@@ -124,10 +137,35 @@ class arguments:
             args = args+'--reverse_search '+str(self.reverse_search)+' '
         if self.max_search_hits != None:
             args = args+'--max_search_hits '+str(self.max_search_hits)+' '
+        if self.nworkers != None:
+            args = args+'--nworkers '+str(self.nworkers)+' '
+        if self.pool_type != None:
+            args = args+'--pool_type '+self.pool_type+' '
+        if self.preserve_format:
+            args = args+'--preserve_format '
+        if self.all_runs:
+            args = args+'--all_runs '
 
         # trim at the end
         self.args = args[0:-1]
 
+    def get_task_arguments(self):
+        '''
+        structured arguments of the current editor task, used instead of parse_arguments
+        to call the editor in-process without building and re-parsing a commandline
+        '''
+        keys = [key for key in (self.key1, self.key2) if key is not None]
+        wild_range = self.wild_range
+        if wild_range == [[]]:
+            wild_range = None
+        return task_arguments(self.task, keys, self.ifile, ofile=self.ofile,
+                              sobj=[self.sobj1, self.sobj2], nsobj=[self.nsobj1, self.nsobj2],
+                              value=self.value, loopid=self.loopid, work_dir=self.work_dir,
+                              run_dir=self.run_dirs, wild=self.wild, wild_range=wild_range,
+                              reverse_search=self.reverse_search, max_search_hits=self.max_search_hits,
+                              verbose=self.verbose, nworkers=self.nworkers, pool_type=self.pool_type,
+                              preserve_format=self.preserve_format, all_runs=self.all_runs)
+
     def parse_arguments_model(self):
         args = ''
 
@@ -161,17 +199,109 @@ class arguments:
 class editor(arguments):
     def __init__(self):
         super().__init__()
+        self._transaction = None
+        self._deferred = None
+
+    @contextmanager
+    def transaction(self):
+        '''
+        batch editor operations: each parameter file is read and parsed once, all
+        operations in the with block are applied to that copy and the modified files
+        are written once when the block exits. Nothing is written if the block raises.
+
+        usage:
+            with editor.transaction() as t:
+                editor.fix_all()
+                editor.free(key='Scale')
+                editor.set_val(key='Biso',value='0.5')
+            print(t.report)
+
+        Outputs:
+            Transaction holding the per-operation hit counts in Transaction.report
+        '''
+        assert self._transaction is None, 'editor transactions can not be nested'
+        self._transaction = Transaction(preserve=bool(self.preserve_format))
+        try:
+            yield self._transaction
+            self._transaction.flush()
+            if self.verbose is not None and self.verbose > 0:
+                self._transaction.print_report()
+        finally:
+            self._transaction = None
+
+    def run_task(self, lines=None, do_write=True):
+        '''
+        apply the current task with edit, or queue it on the open transaction
+        '''
+        args = self.get_task_arguments()
+        if self._transaction is not None and lines is None:
+            return self._transaction.apply(args)
+        if self._deferred is not None:
+            self._deferred.append((args, lines, do_write))
+            return None
+        return edit(args, lines, do_write)
+
+    async def arun_task(self, lines=None, do_write=True):
+        '''
+        asyncio variant of run_task, the files are edited with aedit
+        '''
+        args = self.get_task_arguments()
+        if self._transaction is not None and lines is None:
+            return self._transaction.apply(args)
+        return await aedit(args, lines, do_write)
+
+    async def _arun(self, method, args, kwargs):
+        # call the blocking method with run_task deferred, then apply its task with aedit
+        self._deferred = []
+        try:
+            method(self, *args, **kwargs)
+            deferred = self._deferred
+        finally:
+            self._deferred = None
+        for task_args, lines, do_write in deferred:
+            value = await aedit(task_args, lines, do_write)
+            if task_args.task in get_tasks:
+                self.value = value
+                return value
 
     def read_par(self):
         file = Path(self.ifile)
         assert file.is_file(), f"Parameter file <{file}> is not found on the absolute or relative path of the file"
-        with open(self.ifile) as f:
-            self.lines = f.readlines()
+        self.doc = ParDocument.from_file(self.ifile, preserve=bool(self.preserve_format))
+        self.lines = self.doc.lines
+
+    def get_doc(self):
+        '''
+        parsed document of the stored parameter file lines
+        Outputs:
+            ParDocument sharing editor.lines, re-parsed only if editor.lines was replaced
+        '''
+        if self.lines is None:
+            self.read_par()
+        if self.doc is None or self.doc.lines is not self.lines:
+            self.doc = ParDocument(self.lines, fname=self.ifile)
+        return self.doc
+
+    def snapshot(self):
+        '''
+        in-memory snapshot of the stored parameter file (see use_stored_par). Unchanged parts
+        are shared with the previous snapshot, no file is copied
+        Outputs:
+            ParSnapshot, roll back with restore or save it with its write method
+        '''
+        return self.get_doc().snapshot()
+
+    def restore(self, snapshot):
+        '''
+        roll the stored parameter file back to a snapshot
+        Required Inputs:
+            snapshot (ParSnapshot): snapshot from editor.snapshot
+        '''
+        self.get_doc().restore(snapshot)
 
     def write_par(self):
         assert self.lines is not None, 'trying to write uninitialized lines'
-        with open(self.ofile, 'w') as f:
-            f.writelines("%s\n" % line.strip() for line in self.lines)
+        write_lines(self.lines, self.ofile, preserve=bool(self.preserve_format))
 
     def free(self, key, loopid=None, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
         '''
@@ -204,9 +334,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = key
@@ -220,9 +348,10 @@ class editor(arguments):
         self.loopid = loopid
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -258,9 +387,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = key
@@ -274,9 +401,10 @@ class editor(arguments):
         self.loopid = loopid
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -312,9 +440,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         if ('e-' in value or 'E-' in value):
@@ -332,14 +458,15 @@ class editor(arguments):
         self.loopid = loopid
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
 
-    def get_phases(self, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+    def get_phases(self, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False,all_runs=None):
         '''
         get the phase names in .par file
         Required Inputs: 
@@ -349,6 +476,8 @@ class editor(arguments):
             run     (bool): specifies whether to apply changes to parameter files
             ifile    (str): input parameter file 
             dir      (str): working work_dir
+            all_runs(bool): store the value of every run in wild order as a list, by default the
+                            value of the first run. See editor.nworkers to read the runs in parallel
 
         Outputs: 
             Updates editor arguments and populates editor.value
@@ -366,10 +495,10 @@ class editor(arguments):
             self.wild = wild
         if wild_range != None:
             self.wild_range = wild_range
+        if all_runs != None:
+            self.all_runs = all_runs
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = '_pd_phase_name'
@@ -383,11 +512,12 @@ class editor(arguments):
         self.loopid = None
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            self.value = main(self.args,lines,False)
+            self.value = self.run_task(lines,False)
+        else:
+            self.parse_arguments()
 
-    def get_val(self, key, loopid=None, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+    def get_val(self, key, loopid=None, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False,all_runs=None):
         '''
         get parameter value in .par file
         Required Inputs: 
@@ -399,6 +529,8 @@ class editor(arguments):
             run     (bool): specifies whether to apply changes to parameter files
             ifile    (str): input parameter file 
             dir      (str): working work_dir
+            all_runs(bool): store the value of every run in wild order as a list, by default the
+                            value of the first run. See editor.nworkers to read the runs in parallel
 
         Outputs: 
             Updates editor arguments and applies changes to parameter files if run=True(default)
@@ -416,10 +548,10 @@ class editor(arguments):
             self.wild = wild
         if wild_range != None:
             self.wild_range = wild_range
+        if all_runs != None:
+            self.all_runs = all_runs
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
 
@@ -434,12 +566,12 @@ class editor(arguments):
         self.loopid = loopid
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
-
         if run:
-            self.value = main(self.args,lines,False)
+            self.value = self.run_task(lines,False)
+        else:
+            self.parse_arguments()
 
-    def get_err(self, key, loopid=None, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+    def get_err(self, key, loopid=None, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False,all_runs=None):
         '''
         get parameter value err in .par file
         Required Inputs: 
@@ -451,6 +583,8 @@ class editor(arguments):
             run     (bool): specifies whether to apply changes to parameter files
             ifile    (str): input parameter file 
             dir      (str): working work_dir
+            all_runs(bool): store the value of every run in wild order as a list, by default the
+                            value of the first run. See editor.nworkers to read the runs in parallel
 
         Outputs: 
             Updates editor arguments and applies changes to parameter files if run=True(default)
@@ -468,10 +602,10 @@ class editor(arguments):
             self.wild = wild
         if wild_range != None:
             self.wild_range = wild_range
+        if all_runs != None:
+            self.all_runs = all_runs
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         
@@ -486,9 +620,48 @@ class editor(arguments):
         self.loopid = loopid
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            self.value = main(self.args,lines,False)
+            self.value = self.run_task(lines,False)
+        else:
+            self.parse_arguments()
+
+    def extract(self, keys, errors=True, ifile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None, use_stored_par=False):
+        '''
+        get the values (and errors) of many keys from one or many .par files in a single pass per file
+        Required Inputs: 
+            keys    (list): Background, Intensity,ODFRefine,MicroStrain,CrystSize, DetPosX, DetPosY, DetPosDist, Biso, or userdefined (e.g. _cell_length_a)
+        Optional inputs:
+            errors  (bool): include the parameter errors
+            ifile    (str): input parameter file 
+            dir      (str): working work_dir
+            use_stored_par (bool): extract from the stored parameter file
+
+        Outputs: 
+            DataFrame with one row per value, see extract, also stored in editor.value
+        '''
+        if work_dir != None:
+            self.work_dir = work_dir
+        if ifile != None:
+            self.ifile = ifile
+        if run_dirs != None:
+            self.run_dirs = run_dirs
+
+        if wild != None:
+            self.wild = wild
+        if wild_range != None:
+            self.wild_range = wild_range
+        if isinstance(keys, str):
+            keys = [keys]
+
+        if use_stored_par:
+            self.value = extract_frame([extract_doc(self.get_doc(), keys, errors, self.ifile)], errors)
+        else:
+            wild_range = self.wild_range
+            if wild_range == [[]]:
+                wild_range = None
+            ifiles, _ = resolve_files(self.ifile, None, self.work_dir, self.run_dirs, self.wild, wild_range)
+            self.value = extract(ifiles, keys, errors, self.nworkers, self.pool_type)
+        return self.value
 
     def fix_all(self, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
         '''
@@ -517,9 +690,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = 'blah'
@@ -533,9 +704,10 @@ class editor(arguments):
         self.loopid = None
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -546,7 +718,8 @@ class editor(arguments):
         Required Inputs: 
             key1     (str): Background, Intensity,ODFRefine,MicroStrain,CrystSize, DetPosX, DetPosY, DetPosDist, Biso, or userdefined (e.g. _riet_par_spec_displac_x)
             key2(ref)(str): Background, Intensity,ODFRefine,MicroStrain,CrystSize, DetPosX, DetPosY, DetPosDist, Biso, or userdefined (e.g. _riet_par_spec_displac_x)
-            value    (str): A triplet of values (e.g. 1 2 10000 which gives 1 + 2*var at reference 10000) best to set to large unique value and let MAUD relabel
+            value    (str): A triplet of values (e.g. 1 2 10000 which gives 1 + 2*var at reference 10000) best to set to large unique value and let MAUD relabel.
+                           The reference may be left out (e.g. 1 2), a reference id not used in the file is then chosen
         Optional inputs:
             loopid   (str): a zero based integer specifying a parameter location in a loop variable. By default all loop values are changed
             sobj1    (str): one or more subordinate objects to include in the scope of operation
@@ -574,9 +747,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = key1
@@ -590,15 +761,67 @@ class editor(arguments):
         self.loopid = loopid
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
 
-    def un_ref(self):
-        print('un_ref is currently unimplemented')
+    def un_ref(self, key, loopid=None, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+        '''
+        remove the #equalTo references of parameters in .par file. Reference targets left 
+        without bound parameters also lose their reference id
+        Required Inputs: 
+            key      (str): Background, Intensity,ODFRefine,MicroStrain,CrystSize, DetPosX, DetPosY, DetPosDist, Biso, or userdefined (e.g. _riet_par_spec_displac_x)
+
+        Optional inputs:   
+            loopid   (str): a zero based integer specifying a parameter location in a loop variable. By default all loop values are changed
+            sobj     (str): one or more subordinate objects to include in the scope of operation
+            nsobj    (str): one or more subordinate objects to exclude in the scope of operation
+            run     (bool): specifies whether to apply changes to parameter files
+            ifile    (str): input parameter file 
+            dir      (str): working work_dir
+
+        Outputs: 
+            Updates editor arguments and applies changes to parameter files if run=True(default)
+        '''
+        if work_dir != None:
+            self.work_dir = work_dir
+        if ifile != None:
+            self.ifile = ifile
+        if ofile != None:
+            self.ofile = ofile
+        if run_dirs != None:
+            self.run_dirs = run_dirs
+
+        if wild != None:
+            self.wild = wild
+        if wild_range != None:
+            self.wild_range = wild_range
+        if use_stored_par:
+            lines = self.get_doc()
+        else:
+            lines = None
+        self.key1 = key
+        self.key2 = None
+        self.task = 'un_ref_par'
+        self.sobj1 = sobj
+        self.sobj2 = None
+        self.nsobj1 = nsobj
+        self.nsobj2 = None
+        self.value = None
+        self.loopid = loopid
+
+        # combine the arguments and run if applicable
+        if run:
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
+
+        # Prevent reinitialization
+        self.ifile = self.ofile
  
     def add_datafile_bk_par(self, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
         '''
@@ -627,9 +850,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = 'Background'
@@ -643,14 +864,15 @@ class editor(arguments):
         self.loopid = None
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
 
-    def add_loop_par(self, key, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+    def add_loop_par(self, key, sobj=None, nsobj=None, nrows=1, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
         '''
         add parameters to a loop variable. Should probably only be used with background to my knowledge
         Required Inputs: 
@@ -658,6 +880,7 @@ class editor(arguments):
         Optional inputs: 
             sobj     (str): one or more subordinate objects to include in the scope of operation
             nsobj    (str): one or more subordinate objects to exclude in the scope of operation
+            nrows    (int): number of rows to append, in a single edit of each loop
             run     (bool): specifies whether to apply changes to parameter files
             ifile    (str): input parameter file 
             dir      (str): working work_dir
@@ -679,9 +902,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = key
@@ -691,18 +912,19 @@ class editor(arguments):
         self.sobj2 = None
         self.nsobj1 = nsobj
         self.nsobj2 = None
-        self.value = None
+        self.value = str(nrows)
         self.loopid = None
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
 
-    def rem_loop_par(self, key, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+    def rem_loop_par(self, key, sobj=None, nsobj=None, nrows=1, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
         '''
         remove parameters in a loop variable. Should probably only be used with background
         Required Inputs: 
@@ -710,6 +932,7 @@ class editor(arguments):
         Optional inputs: 
             sobj     (str): one or more subordinate objects to include in the scope of operation
             nsobj    (str): one or more subordinate objects to exclude in the scope of operation
+            nrows    (int): number of rows to remove from the end (at most all), in a single edit of each loop
             run     (bool): specifies whether to apply changes to parameter files
             ifile    (str): input parameter file 
             dir      (str): working work_dir
@@ -731,9 +954,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = key
@@ -743,13 +964,66 @@ class editor(arguments):
         self.sobj2 = None
         self.nsobj1 = nsobj
         self.nsobj2 = None
-        self.value = None
+        self.value = str(nrows)
+        self.loopid = None
+
+        # combine the arguments and run if applicable
+        if run:
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
+
+        # Prevent reinitialization
+        self.ifile = self.ofile
+
+    def resize_loop_par(self, key, nrows, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+        '''
+        set the number of parameters in a loop variable, rows are appended or removed at the end
+        Required Inputs: 
+            keys     (str): Background
+            nrows    (int): number of rows of each loop
+        Optional inputs: 
+            sobj     (str): one or more subordinate objects to include in the scope of operation
+            nsobj    (str): one or more subordinate objects to exclude in the scope of operation
+            run     (bool): specifies whether to apply changes to parameter files
+            ifile    (str): input parameter file 
+            dir      (str): working work_dir
+
+        Outputs: 
+            Updates editor arguments and applies changes to parameter files if run=True(default)
+        '''
+        if work_dir != None:
+            self.work_dir = work_dir
+        if ifile != None:
+            self.ifile = ifile
+        if ofile != None:
+            self.ofile = ofile
+        if run_dirs != None:
+            self.run_dirs = run_dirs
+
+        if wild != None:
+            self.wild = wild
+        if wild_range != None:
+            self.wild_range = wild_range
+        if use_stored_par:
+            lines = self.get_doc()
+        else:
+            lines = None
+        self.key1 = key
+        self.key2 = None
+        self.task = 'resize_par'
+        self.sobj1 = sobj
+        self.sobj2 = None
+        self.nsobj1 = nsobj
+        self.nsobj2 = None
+        self.value = str(nrows)
         self.loopid = None
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -782,9 +1056,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = 'ODFValues'
@@ -798,9 +1070,221 @@ class editor(arguments):
         self.loopid = None
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
+
+        # Prevent reinitialization
+        self.ifile = self.ofile
+
+    def scale_odf(self, factor, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+        '''
+        scale the ODF values, the rows are parsed and rewritten as whole blocks
+        Required Inputs: 
+            factor (float): factor applied to every ODF value
+
+        Optional inputs: 
+            sobj     (str): one or more subordinate objects to include in the scope of operation
+            nsobj    (str): one or more subordinate objects to exclude in the scope of operation
+            run     (bool): specifies whether to apply changes to parameter files
+            ifile    (str): input parameter file 
+            dir      (str): working work_dir
+
+        Outputs: 
+            Updates editor arguments and applies changes to parameter files if run=True(default)
+        '''
+        if work_dir != None:
+            self.work_dir = work_dir
+        if ifile != None:
+            self.ifile = ifile
+        if ofile != None:
+            self.ofile = ofile
+        if run_dirs != None:
+            self.run_dirs = run_dirs
+
+        if wild != None:
+            self.wild = wild
+        if wild_range != None:
+            self.wild_range = wild_range
+        if use_stored_par:
+            lines = self.get_doc()
+        else:
+            lines = None
+        self.key1 = 'ODFValues'
+        self.key2 = None
+        self.task = 'scale_odf'
+        self.sobj1 = sobj
+        self.sobj2 = None
+        self.nsobj1 = nsobj
+        self.nsobj2 = None
+        self.value = str(factor)
+        self.loopid = None
+
+        # combine the arguments and run if applicable
+        if run:
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
+
+        # Prevent reinitialization
+        self.ifile = self.ofile
+
+    def copy_odf(self, source=None, sobj=None, nsobj=None, source_sobj=None, source_nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+        '''
+        copy (seed) the ODF from another parameter file or from another phase of the same file.
+        Source blocks are assigned to the ODF blocks in scope in order, a single source block is
+        copied to all of them. Blocks with the same layout are copied as text without parsing
+
+        Optional inputs: 
+            source       (str): parameter file to copy from, relative to work_dir. By default the same file
+            sobj         (str): one or more subordinate objects to include in the scope of operation
+            nsobj        (str): one or more subordinate objects to exclude in the scope of operation
+            source_sobj  (str): subordinate objects of the source ODF blocks to include
+            source_nsobj (str): subordinate objects of the source ODF blocks to exclude
+            run     (bool): specifies whether to apply changes to parameter files
+            ifile    (str): input parameter file 
+            dir      (str): working work_dir
+
+        Outputs: 
+            Updates editor arguments and applies changes to parameter files if run=True(default)
+        '''
+        if work_dir != None:
+            self.work_dir = work_dir
+        if ifile != None:
+            self.ifile = ifile
+        if ofile != None:
+            self.ofile = ofile
+        if run_dirs != None:
+            self.run_dirs = run_dirs
+
+        if wild != None:
+            self.wild = wild
+        if wild_range != None:
+            self.wild_range = wild_range
+        if use_stored_par:
+            lines = self.get_doc()
+        else:
+            lines = None
+        self.key1 = 'ODFValues'
+        self.key2 = 'ODFValues'
+        self.task = 'copy_odf'
+        self.sobj1 = sobj
+        self.sobj2 = source_sobj
+        self.nsobj1 = nsobj
+        self.nsobj2 = source_nsobj
+        self.value = source
+        self.loopid = None
+
+        # combine the arguments and run if applicable
+        if run:
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
+
+        # Prevent reinitialization
+        self.ifile = self.ofile
+
+    def get_odf(self, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False,all_runs=None):
+        '''
+        get the ODF values as flat numpy arrays, one per ODF block in scope
+
+        Optional inputs: 
+            sobj     (str): one or more subordinate objects to include in the scope of operation
+            nsobj    (str): one or more subordinate objects to exclude in the scope of operation
+            run     (bool): specifies whether to apply changes to parameter files
+            ifile    (str): input parameter file 
+            dir      (str): working work_dir
+            all_runs(bool): store the value of every run in wild order as a list, by default the
+                            value of the first run. See editor.nworkers to read the runs in parallel
+
+        Outputs: 
+            Stores the ODF arrays in editor.value if run=True(default)
+        '''
+        if work_dir != None:
+            self.work_dir = work_dir
+        if ifile != None:
+            self.ifile = ifile
+        if ofile != None:
+            self.ofile = ofile
+        if run_dirs != None:
+            self.run_dirs = run_dirs
+
+        if wild != None:
+            self.wild = wild
+        if wild_range != None:
+            self.wild_range = wild_range
+        if all_runs != None:
+            self.all_runs = all_runs
+        if use_stored_par:
+            lines = self.get_doc()
+        else:
+            lines = None
+        self.key1 = 'ODFValues'
+        self.key2 = None
+        self.task = 'get_odf'
+        self.sobj1 = sobj
+        self.sobj2 = None
+        self.nsobj1 = nsobj
+        self.nsobj2 = None
+        self.value = None
+        self.loopid = None
+
+        # combine the arguments and run if applicable
+        if run:
+            self.value = self.run_task(lines,False)
+        else:
+            self.parse_arguments()
+
+    def export_odf(self, fname, sobj=None, nsobj=None, run=True, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None,use_stored_par=False):
+        '''
+        save the ODF values with numpy next to each parameter file
+        Required Inputs: 
+            fname    (str): file name relative to the parameter file directory. A single ODF block
+                            is saved to a .npy file, several blocks to a .npz file (arr_0, arr_1, ...)
+
+        Optional inputs: 
+            sobj     (str): one or more subordinate objects to include in the scope of operation
+            nsobj    (str): one or more subordinate objects to exclude in the scope of operation
+            run     (bool): specifies whether to apply changes to parameter files
+            ifile    (str): input parameter file 
+            dir      (str): working work_dir
+
+        Outputs: 
+            Updates editor arguments and applies changes to parameter files if run=True(default)
+        '''
+        if work_dir != None:
+            self.work_dir = work_dir
+        if ifile != None:
+            self.ifile = ifile
+        if ofile != None:
+            self.ofile = ofile
+        if run_dirs != None:
+            self.run_dirs = run_dirs
+
+        if wild != None:
+            self.wild = wild
+        if wild_range != None:
+            self.wild_range = wild_range
+        if use_stored_par:
+            lines = self.get_doc()
+        else:
+            lines = None
+        self.key1 = 'ODFValues'
+        self.key2 = None
+        self.task = 'export_odf'
+        self.sobj1 = sobj
+        self.sobj2 = None
+        self.nsobj1 = nsobj
+        self.nsobj2 = None
+        self.value = fname
+        self.loopid = None
+
+        # combine the arguments and run if applicable
+        if run:
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -835,9 +1319,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = key
@@ -851,9 +1333,10 @@ class editor(arguments):
         self.loopid = loopid
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -888,9 +1371,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = key
@@ -904,9 +1385,10 @@ class editor(arguments):
         self.loopid = loopid
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -939,9 +1421,7 @@ class editor(arguments):
         if wild_range != None:
             self.wild_range = wild_range
         if use_stored_par:
-            if self.lines is None:
-                self.read_par()
-            lines = self.lines
+            lines = self.get_doc()
         else:
             lines = None
         self.key1 = None
@@ -955,13 +1435,23 @@ class editor(arguments):
         self.loopid = None
 
         # combine the arguments and run if applicable
-        self.parse_arguments()
         if run:
-            main(self.args,lines,not use_stored_par)
+            self.run_task(lines,not use_stored_par)
+        else:
+            self.parse_arguments()
 
         # Prevent reinitialization
         self.ifile = self.ofile
 
+    def _set_model(self, kind):
+        # model objects of the phases in all parameter files, see set_model
+        wild_range = self.wild_range
+        if wild_range == [[]]:
+            wild_range = None
+        ifiles, ofiles = resolve_files(self.ifile, self.ofile, self.work_dir, self.run_dirs, self.wild, wild_range)
+        sobj = None if self.sobj1 in (None, 'None') else self.sobj1.split()
+        set_model(kind, self.key1, ifiles, ofiles, sobj, self.nworkers, self.pool_type, bool(self.preserve_format))
+
     def texture(self, key=None, sobj=None, ifile=None, ofile=None, work_dir=None, run_dirs=None, wild=None, wild_range=None, run=True):
         '''
               texture inserts a MAUD texture model into all phases or to particular phase using sobj
@@ -991,8 +1481,10 @@ class editor(arguments):
 
         # combine the arguments and run if applicable
         self.parse_arguments_model()
-        if run:
-            texture.main(self.args)
+        if run and self._transaction is not None:
+            self._transaction.apply_model(texture, self.args)
+        elif run:
+            self._set_model('texture')
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -1026,8 +1518,10 @@ class editor(arguments):
 
         # combine the arguments and run if applicable
         self.parse_arguments_model()
-        if run:
-            sizeStrain.main(self.args)
+        if run and self._transaction is not None:
+            self._transaction.apply_model(sizeStrain, self.args)
+        elif run:
+            self._set_model('sizeStrain')
 
         # Prevent reinitialization
         self.ifile = self.ofile
@@ -1069,8 +1563,8 @@ class editor(arguments):
 
         # Main loop through files to edit
         for ind in range(0, len(ifiles)):
-            # read in the lines
-            lines = read_par(ifiles[ind])
+            # read in the lines, the bulk data blocks hold no parameters
+            lines = ParDocument.from_file(ifiles[ind], lazy=True).lines
             nfree = 0
             inloop = False
             d = dict()
@@ -1099,6 +1593,26 @@ class editor(arguments):
             print('')
 
 
+def _async_task(name):
+    method = getattr(editor, name)
+
+    async def amethod(self, *args, **kwargs):
+        return await self._arun(method, args, kwargs)
+    amethod.__name__ = 'a'+name
+    amethod.__qualname__ = 'editor.a'+name
+    amethod.__doc__ = f'''
+        asyncio variant of editor.{name}, see aedit. Takes the same arguments and
+        returns the value of get tasks, which is also stored in editor.value
+        '''
+    return amethod
+
+
+for _name in ('free', 'fix', 'set_val', 'get_phases', 'get_val', 'get_err', 'fix_all', 'ref', 'un_ref',
+              'add_datafile_bk_par', 'add_loop_par', 'rem_loop_par', 'resize_loop_par', 'reset_odf',
+              'scale_odf', 'copy_odf', 'get_odf', 'export_odf', 'track', 'untrack', 'untrack_all'):
+    setattr(editor, 'a'+_name, _async_task(_name))
+
+
 def read_par(ifile):
     with open(ifile) as f:
         lines = f.readlines()
@@ -1106,8 +1620,27 @@ def read_par(ifile):
 
 
 def write_par(lines, ofile):
-    with open(ofile, 'w') as f:
-        f.writelines("%s\n" % line.strip() for line in lines)
+    write_lines(lines, ofile)
+
+
+def search_many(lines, keys, d=None, max_hit=1e6, reverse=False):
+    '''
+    locate several keys in one pass over a parameter file
+    Required Inputs:
+        lines (list/ParDocument): parameter file lines or parsed parameter file
+        keys             (list): keys, names in template_dict or sub strings of lines
+    Optional inputs:
+        d                (dict): dictionary of standard keys, see template_dict
+        max_hit           (int): maximum number of hits of each key
+        reverse          (bool): search from the end of the file
+
+    Outputs:
+        one [index, sobj, isloop, indloop, endloop] per key, see ParDocument.search
+    '''
+    if d is None:
+        d = template_dict()
+    doc = lines if isinstance(lines, ParDocument) else ParDocument(lines)
+    return doc.search_many([d.get(key, key) for key in keys], max_hit, reverse)
 
 
 def search_list_reverse(lines, keyword, d, max_hit=1e6):
@@ -1242,78 +1775,32 @@ def search_list(lines, keyword, d,max_hit=1e6):
 
 def free_parameter(lines, index, isloop, indloop, loopid):
     nlineMod = 0
-    for i in range(0, len(index)):
-        ind = index[i]
-        line = lines[ind].split()
-
-        indstart = lines[ind].find('(')
-        if indstart == -1:
-            if isloop[i]:
-                offset = 0
-                if str(indloop[i]) == loopid or loopid == 'None':
-                    nlineMod += 1
-                    line[offset] = line[offset]+'(0.0)'
-                    lines[ind] = " ".join(line)
-            else:
-                offset = 1
+    for i, ind in enumerate(index):
+        if not isloop[i] or str(indloop[i]) == loopid or loopid == 'None':
+            par = Parameter(lines[ind], 0 if isloop[i] else 1)
+            if par.free():
                 nlineMod += 1
-                line[offset] = line[offset]+'(0.0)'
-                lines[ind] = " ".join(line)
+                lines[ind] = par.line()
     return lines, nlineMod
 
 
 def set_par(lines, value, index, isloop, indloop, loopid):
     nlineMod = 0
-    for i in range(0, len(index)):
-        ind = index[i]
-        line = lines[ind].split()
-
-        # Get if it is a loop variable in which case the value is at index 0 else 1
-        if isloop[i]:
-            if str(indloop[i]) == loopid or loopid == 'None':
-                nlineMod += 1
-                offset = 0
-
-                # If the variable is being refined, reset the refinement value
-                indstart = lines[ind].find('(')
-                if indstart == -1:
-                    line[offset] = str(value[0])
-                else:
-                    # refining
-                    line[offset] = str(value[0])+'(0.0)'
-
-                lines[ind] = " ".join(line)
-
-        else:
+    for i, ind in enumerate(index):
+        if not isloop[i] or str(indloop[i]) == loopid or loopid == 'None':
+            # If the variable is being refined, the refinement value is reset
+            par = Parameter(lines[ind], 0 if isloop[i] else 1)
+            par.set(str(value[0]))
             nlineMod += 1
-            offset = 1
-
-            # If the variable is being refined, reset the refinement value
-            indstart = lines[ind].find('(')
-            if indstart == -1:
-                line[offset] = str(value[0])
-            else:
-                # refining
-                line[offset] = str(value[0])+'(0.0)'
-
-            lines[ind] = " ".join(line)
+            lines[ind] = par.line()
     return lines, nlineMod
 
 
 def get_val(lines, index, isloop, indloop, loopid):
     value = []
     for i, ind in enumerate(index):
-        if isloop[i]:
-            offset = 0
-            if str(indloop[i]) == loopid or loopid == 'None':
-                tmp = lines[ind].lstrip(' ')
-                tmp = tmp.split(' ')[offset]
-                value.append(tmp.split('(')[0])
-        else:
-            offset = 1
-            tmp = lines[ind].lstrip(' ')
-            tmp = tmp.split(' ')[offset]
-            value.append(tmp.split('(')[0])
+        if not isloop[i] or str(indloop[i]) == loopid or loopid == 'None':
+            value.append(parameter_value(lines[ind], 0 if isloop[i] else 1)[0])
 
     return value
 
@@ -1329,160 +1816,176 @@ def get_phases(lines, index):
 def get_err(lines, index, isloop, indloop, loopid):
     err = []
     for i, ind in enumerate(index):
-        if isloop[i]:
-            offset = 0
-            if str(indloop[i]) == loopid or loopid == 'None':
-                tmp = lines[ind].lstrip(' ')
-                tmp = tmp.split(' ')[offset]
-                if '(' in tmp:
-                    err.append(tmp.split('(')[1].split(')')[0])
-                else:
-                    err.append('0.0')
-        else:
-            offset = 1
-            tmp = lines[ind].lstrip(' ')
-            tmp = tmp.split(' ')[offset]
-            if '(' in tmp:
-                err.append(tmp.split('(')[1].split(')')[0])
-            else:
-                err.append('0.0')
+        if not isloop[i] or str(indloop[i]) == loopid or loopid == 'None':
+            error = parameter_value(lines[ind], 0 if isloop[i] else 1)[1]
+            err.append('0.0' if error is None else error)
 
     return err
 
 
 def fix_parameter(lines, index, isloop, indloop, loopid):
     nlineMod = 0
-    for i in range(0, len(index)):
-        ind = index[i]
-        line = lines[ind]
-        indstart = line.find('(')
-        indend = line.find(')')
-        if isloop[i]:
-            if str(indloop[i]) == loopid or loopid == 'None':
+    for i, ind in enumerate(index):
+        if not isloop[i] or str(indloop[i]) == loopid or loopid == 'None':
+            par = Parameter(lines[ind], 0 if isloop[i] else 1)
+            if par.fix():
                 nlineMod += 1
-                lines[ind] = line.replace(line[indstart:indend+1], "")
-        else:
-            nlineMod += 1
-            lines[ind] = line.replace(line[indstart:indend+1], "")
-        # imin = line.index('#min')
-        # imax = line.index('#max')
-        #lines[ind] = [j for i, j in enumerate(lines[ind]) if i not in range(indstart,indend+1)]
+                lines[ind] = par.line()
     return lines, nlineMod
 
 
-def fix_all(lines):
+def fix_all(lines, index=None):
     nlineMod = 0
-    for ind in range(0, len(lines)):
-        indstart = lines[ind].find('(')
-        if indstart > -1 and '#min' in lines[ind]:
-            nlineMod += 1
-            tmp = fix_parameter([lines[ind]], [0], [False], [], [])[0]
-            lines[ind] = tmp[0]
+    if index is None:
+        index = range(0, len(lines))
+    for ind in index:
+        if '(' in lines[ind] and '#min' in lines[ind]:
+            par = Parameter(lines[ind])
+            if par.fix():
+                nlineMod += 1
+                lines[ind] = par.line()
 
     return lines, nlineMod
 
 
-def untrack_all(lines):
+def untrack_all(lines, index=None):
     nlineMod = 0
-    for ind in range(0, len(lines)):
-        if ' #autotrace' in lines[ind]:
-            lines[ind] = lines[ind].replace(' #autotrace', '')
+    if index is None:
+        index = range(0, len(lines))
+    for ind in index:
+        if '#autotrace' in lines[ind]:
+            par = Parameter(lines[ind])
+            if par.untrack():
+                lines[ind] = par.line()
     return lines, nlineMod
 
 
 def track_par(lines, index, isloop, indloop, loopid):
     nlineMod = 0
-    for i in range(0, len(index)):
-        ind = index[i]
-        line = lines[ind].split()
-
-        if '#autotrace' not in lines[ind]:
-            if isloop[i]:
-                offset = 0
-                if str(indloop[i]) == loopid or loopid == 'None':
-                    nlineMod += 1
-                    line[offset] = line[offset]+' #autotrace'
-                    lines[ind] = " ".join(line)
-            else:
+    for i, ind in enumerate(index):
+        if not isloop[i] or str(indloop[i]) == loopid or loopid == 'None':
+            par = Parameter(lines[ind], 0 if isloop[i] else 1)
+            if par.track():
                 nlineMod += 1
-                offset = 1
-                line[offset] = line[offset]+' #autotrace'
-                lines[ind] = " ".join(line)
+                lines[ind] = par.line()
     return lines, nlineMod
 
 
 def untrack_par(lines, index, isloop, indloop, loopid):
     nlineMod = 0
-    for i in range(0, len(index)):
-        ind = index[i]
-        if ' #autotrace' in lines[ind]:
-            nlineMod += 1
-            lines[ind] = lines[ind].replace(' #autotrace', '')
+    for i, ind in enumerate(index):
+        if '#autotrace' in lines[ind]:
+            par = Parameter(lines[ind], 0 if isloop[i] else 1)
+            if par.untrack():
+                nlineMod += 1
+                lines[ind] = par.line()
 
     return lines, nlineMod
 
 
-def ref_par(lines, index, value, isloop, indloop, loopid):
+def ref_par(doc, index, value, isloop, indloop, loopid):
+    # Bind index[0] to #equalTo value[0] + value[1] * #refN of the single parameter in index[1].
+    # A target which already has a reference id keeps it, otherwise it gets #ref value[2] or,
+    # when value[2] is missing or already used in the file, a fresh id from the reference graph
+    lines = doc.lines
     nlineMod = 0
-    # Add loop support here
     assert len(index) == 2, 'Both parts of the reference were not passed in.'
     assert len(
         index[1]) == 1, 'Your second argument specified multiple lines. Only one line can be referenced at a time!'
     for ind in index[1]:
-        line = lines[ind].split()
-        reference = '#ref'+str(value[2])
-        isReference = False
-        for word in line:
-            if '#ref' in word:
-                #print('Target reference already has a number. Using ' + word + ' instead of ' + reference)
-                reference = word
-                isReference = True
-        if not isReference:
+        reference = doc.ref_id(ind)
+        if reference is None:
+            reference = '#ref'+str(value[2]) if len(value) > 2 else None
+            if reference is None or doc.ref_target(reference) is not None or doc.ref_users(reference):
+                reference = doc.new_ref_id()
+            par = Parameter(lines[ind])
+            par.add_ref(reference)
             nlineMod += 1
-            line.append(reference)
-            lines[ind] = " ".join(line)
+            lines[ind] = par.line()
 
     for i, ind in enumerate(index[0]):
-        line = lines[ind].split()
-
-        isEqualTo = False
-        for j in range(len(line)):
-            word = line[j]
-            if '#equalTo' in word:
-
-                isEqualTo = True
-                line[j+1] = value[0]
-                line[j+3] = value[1]
-                line[j+5] = reference
-
-        if not isEqualTo:
-            line.append('#equalTo')
-            line.append(value[0])  # equalTo 0.5 + 0 * #ref8
-            line.append('+')
-            line.append(value[1])
-            line.append('*')
-            line.append(reference)
-
-        if isloop[0][i]:
-            if str(indloop[0][i]) == loopid or loopid == 'None':
-                nlineMod += 1
-                lines[ind] = " ".join(line)
-        else:
+        if not isloop[0][i] or str(indloop[0][i]) == loopid or loopid == 'None':
+            # equalTo 0.5 + 0 * #ref8
+            par = Parameter(lines[ind], 0 if isloop[0][i] else 1)
+            par.equal(value[0], value[1], reference)
             nlineMod += 1
-            lines[ind] = " ".join(line)
+            lines[ind] = par.line()
 
     return lines, nlineMod
 
 
-def reset_odf(lines, index):
+def un_ref_par(doc, index, isloop, indloop, loopid):
+    # Remove the #equalTo expressions. Targets left without bound parameters lose their reference id,
+    # the modified target lines are returned as well
+    lines = doc.lines
     nlineMod = 0
-    for ind in index:
+    released = {}
+    pars = []
+    for i, ind in enumerate(index):
+        if not isloop[i] or str(indloop[i]) == loopid or loopid == 'None':
+            par = Parameter(lines[ind], 0 if isloop[i] else 1)
+            reference = par.refers_to
+            if par.unequal():
+                pars.append((ind, par))
+                if reference is not None:
+                    released.setdefault(reference, set()).add(ind)
+
+    targets = []
+    for reference, inds in released.items():
+        target = doc.ref_target(reference)
+        if target is not None and inds.issuperset(doc.ref_users(reference)):
+            targets.append(target)
+
+    for ind, par in pars:
         nlineMod += 1
-        line = lines[ind].strip().split()
-        for i in range(0, len(line)):
-            line[i] = '1.0'
-        lines[ind] = " ".join(line)
-    return lines, nlineMod
+        lines[ind] = par.line()
+    for ind in targets:
+        par = Parameter(lines[ind])
+        if par.remove_ref():
+            nlineMod += 1
+            lines[ind] = par.line()
+
+    return lines, nlineMod, targets
+
+
+# tasks returning values instead of editing the parameter files
+get_tasks = ('get_phases', 'get_val', 'get_err', 'get_odf')
+
+
+def _odf_loops(doc, index):
+    # ODF blocks with rows in index
+    rows = set(index)
+    return [loop for loop in doc.odf_loops() if loop.row_start in rows]
+
+
+def reset_odf(doc, index):
+    nlineMod = 0
+    for loop in _odf_loops(doc, index):
+        nlineMod += doc.set_odf_values(loop, 1.0)
+    return doc.lines, nlineMod
+
+
+def scale_odf(doc, index, factor):
+    nlineMod = 0
+    for loop in _odf_loops(doc, index):
+        nlineMod += doc.set_odf_values(loop, doc.odf_values(loop)*factor)
+    return doc.lines, nlineMod
+
+
+def copy_odf(doc, index, source, source_index):
+    # the source blocks are assigned in order, a single source block is copied to every target
+    nlineMod = 0
+    loops = _odf_loops(doc, index)
+    source_loops = _odf_loops(source, source_index)
+    assert len(source_loops) == 1 or len(source_loops) == len(loops), \
+        f'{len(source_loops)} source ODF blocks for {len(loops)} ODF blocks'
+    for i, loop in enumerate(loops):
+        nlineMod += doc.copy_odf(loop, source, source_loops[i if len(source_loops) > 1 else 0])
+    return doc.lines, nlineMod
+
+
+def get_odf(doc, index):
+    return [doc.odf_values(loop) for loop in _odf_loops(doc, index)]
 
 
 def template_dict():
@@ -1501,24 +2004,41 @@ def template_dict():
     return d
 
 
-def add_par(lines, index, endloop):
-    nlineMod = 0
-    for i in reversed(range(0, len(index))):
+def _end_loops(doc, index, endloop):
+    # loops with a hit on their last row, last loop first. With reverse_search the row flagged by
+    # endloop is the first row of the loop, so rows are always added and removed at loop.row_end
+    loops = {}
+    for i in range(0, len(index)):
         if endloop[i]:
-            nlineMod += 1
-            lines.insert(index[i]+1, '0 #min -10000.0 #max 10000.0\n')
+            loop = doc.loop_of(index[i])
+            loops[loop.start] = loop
+    return [loops[start] for start in sorted(loops, reverse=True)]
 
-    return lines, nlineMod
 
+def add_par(doc, index, endloop, nrows=1):
+    # nrows rows after the last row of every loop in a single insert each
+    nlineMod = 0
+    for loop in _end_loops(doc, index, endloop):
+        nlineMod += doc.append_rows(loop, ['0 #min -10000.0 #max 10000.0\n']*nrows)
+
+    return doc.lines, nlineMod
 
-def rem_par(lines, index, endloop):
+
+def rem_par(doc, index, endloop, nrows=1):
+    # the last nrows rows (at most all) of every loop in a single delete each
     nlineMod = 0
-    for i in reversed(range(0, len(index))):
-        if endloop[i]:
-            nlineMod += 1
-            lines.pop(index[i])
+    for loop in _end_loops(doc, index, endloop):
+        nlineMod += doc.remove_rows(loop, nrows)
+
+    return doc.lines, nlineMod
 
-    return lines, nlineMod
+
+def resize_par(doc, index, endloop, nrows):
+    nlineMod = 0
+    for loop in _end_loops(doc, index, endloop):
+        nlineMod += abs(doc.resize_loop(loop, nrows))
+
+    return doc.lines, nlineMod
 
 
 def get_arguments(argsin):
@@ -1537,11 +2057,11 @@ def get_arguments(argsin):
     parser.add_argument('--ofile', '-o',
                         help='Define output file to save modifications e.g. "Refinement_1.par"')
     parser.add_argument('--task', '-t',
-                        help='Tasks: free_par,fix_par,set_par,fix_all,ref_par,un_ref_par,add_par,rem_par,reset_odf,track_par,untrack_par,untrack_all')
+                        help='Tasks: free_par,fix_par,set_par,fix_all,ref_par,un_ref_par,add_par,rem_par,resize_par,reset_odf,scale_odf,copy_odf,export_odf,track_par,untrack_par,untrack_all')
     parser.add_argument('--sobj', '-s', nargs='+', action='append',
-                        help='Subordinate object string limits application of task to a sub section of the .par files')
+                        help='Subordinate object string or path query (e.g. phase:alpha/texture) limits application of task to a sub section of the .par files')
     parser.add_argument('--nsobj', '-ns', nargs='+', action='append',
-                        help='Subordinate object string excludes application of task to a sub section of the .par files')
+                        help='Subordinate object string or path query (e.g. datafile:*.gda) excludes application of task to a sub section of the .par files')
     parser.add_argument('--value', '-v', nargs='+',
                         help='Value of parameter e.g. for ')
     parser.add_argument('--loopid', '-l', default='None',
@@ -1558,105 +2078,184 @@ def get_arguments(argsin):
                         help='exits search_list early based on number of hits')
     parser.add_argument('--verbose', '-ver', type=int, default=0,
                         help='specifies the level of information output when modifying parameter files')
+    parser.add_argument('--nworkers', '-nw', type=int, default=1,
+                        help='number of parameter files edited in parallel')
+    parser.add_argument('--pool_type', '-pt', default='thread', choices=['thread', 'process'],
+                        help='edit the parameter files in parallel with a pool of threads or processes')
+    parser.add_argument('--preserve_format', '-pf', action='store_true',
+                        help='keep the line ends and white space of the lines that are not edited')
+    parser.add_argument('--all_runs', '-ar', action='store_true',
+                        help='get tasks return the value of every parameter file in wild order instead of the first')
 
     if argsin == []:
         args = parser.parse_args()
     else:
         args = parser.parse_args(argsin.split(' '))
 
+    # wild_range is given in pairs on the commandline
+    wild_range = None
+    if args.wild_range != None:
+        wild_range = [args.wild_range[pair:pair+2] for pair in range(0, len(args.wild_range), 2)]
+
+    return task_arguments(args.task, [key for keys in args.key for key in keys], args.ifile,
+                          ofile=args.ofile, sobj=args.sobj, nsobj=args.nsobj, value=args.value,
+                          loopid=args.loopid, work_dir=args.work_dir, run_dir=args.run_dir,
+                          wild=args.wild, wild_range=wild_range,
+                          reverse_search=args.reverse_search in 'True',
+                          max_search_hits=args.max_search_hits, verbose=args.verbose,
+                          nworkers=args.nworkers, pool_type=args.pool_type,
+                          preserve_format=args.preserve_format, all_runs=args.all_runs)
+
+
+def _scope_list(scope, nkeys):
+    # one list of subordinate object strings per key, '&' stands in for spaces
+    if scope is None or isinstance(scope, str):
+        scope = [scope]
+    tmp = []
+    for scope1 in scope:
+        if scope1 is None or isinstance(scope1, str):
+            scope1 = [scope1]
+        tmp.append([x.replace('&', ' ') if isinstance(x, str) else x for x in scope1])
+    while len(tmp) < nkeys:
+        tmp.append([None])
+    return tmp
+
+
+def resolve_files(ifile, ofile=None, work_dir=None, run_dir='',
+                  wild=None, wild_range=None):
+    '''
+    build the input and output parameter file paths
+    Required Inputs:
+        ifile    (str): input parameter file, may contain (wild)
+    Optional inputs:
+        ofile    (str): output parameter file name, defaults to ifile
+        work_dir (str): working directory, defaults to the current directory
+        run_dir  (str): run directory relative to work_dir, may contain (wild)
+        wild    (list): run ids
+        wild_range (list): pairs of inclusive run id ranges e.g. [[1, 4], [8, 9]]
+
+    Outputs:
+        ifiles, ofiles (list): full paths
+    '''
     # Set the working work_dir
-    if args.work_dir == None:
-        args.work_dir = os.getcwd()
+    if work_dir == None:
+        work_dir = os.getcwd()
+    if run_dir == None:
+        run_dir = ''
 
     # Get wild cases if any and combine range and wild
     wilds = []
-    if args.wild != None:
-        for i in args.wild:
+    if wild != None:
+        for i in wild:
             wilds.append(i)
 
-    if args.wild_range != None:
-        for pair in range(0, len(args.wild_range), 2):
-            tmp_id = range(args.wild_range[pair], args.wild_range[pair+1]+1)
-            for i in tmp_id:
-                wilds.append(i)
-    wilds = list(set(wilds))
+    if wild_range != None:
+        for pair in wild_range:
+            if pair:
+                wilds += list(range(pair[0], pair[1]+1))
+    wilds = sorted(set(wilds))
 
     # Build input file paths
-    ifile = []
-    tmp = os.path.join(args.work_dir, args.run_dir, args.ifile)
+    ifiles = []
+    tmp = os.path.join(work_dir, run_dir, ifile)
     if wilds==[] or '(wild)' not in tmp:
-        ifile.append(tmp)
+        ifiles.append(tmp)
     else:
         for wild in wilds:
-            ifile.append(tmp.replace('(wild)', str(wild).zfill(3)))
-    args.ifile = ifile
+            ifiles.append(tmp.replace('(wild)', str(wild).zfill(3)))
 
     # Generate the output file names
-    if args.ofile == None:
-        args.ofile = args.ifile
+    if ofile == None:
+        ofiles = ifiles
     else:
-        ofile = []
-        for file in args.ifile:
-            ofile.append(os.path.join(os.path.dirname(file), args.ofile))
-        args.ofile = ofile
-
-    if args.sobj == None:
-        args.sobj = [[None]]
-    else:
-        tmp = []
-        for sobj1 in args.sobj:
-            tmp2 = []
-            for sobj2 in sobj1:
-                tmp2.append(sobj2.replace('&', ' '))
-            tmp.append(tmp2)
-        args.sobj = tmp
-
-    if args.nsobj == None:
-        tmp = []
-        for i in range(0, len(args.sobj)):
-            tmp.append([None])
-        args.nsobj = tmp
-    else:
-        tmp = []
-        for nsobj1 in args.nsobj:
-            tmp2 = []
-            for nsobj2 in nsobj1:
-                tmp2.append(nsobj2.replace('&', ' '))
-            tmp.append(tmp2)
-        args.nsobj = tmp
-
-    #Allow for spaces in keys and values
-    args.key = [[key.replace('&',' ')] for keys in args.key for key in keys]
-    if args.value is not None:
-        for i,value in enumerate(args.value):
-            args.value[i] = value.replace('&',' ')
-    assert len(args.nsobj) == len(args.sobj), 'There is an issue constructing nsobj or sobj'
+        ofiles = []
+        for file in ifiles:
+            ofiles.append(os.path.join(os.path.dirname(file), ofile))
+
+    return ifiles, ofiles
+
+
+def task_arguments(task, key=None, ifile=None, ofile=None, sobj=None, nsobj=None,
+                   value=None, loopid=None, work_dir=None, run_dir='',
+                   wild=None, wild_range=None,
+                   reverse_search=False, max_search_hits=1e6, verbose=0,
+                   ifiles=None, ofiles=None, nworkers=1,
+                   pool_type='thread', preserve_format=False, all_runs=False):
+    '''
+    structured (in-process) equivalent of the commandline arguments used by main
+    Required Inputs:
+        task     (str): free_par,fix_par,set_par,get_val,get_err,get_phases,fix_all,ref_par,un_ref_par,add_par,rem_par,resize_par,
+                        add_datafile_bk_par,reset_odf,scale_odf,copy_odf,get_odf,export_odf,track_par,untrack_par,untrack_all
+        key (str/list): one key or a list of keys (two for ref_par and copy_odf). Spaces are allowed
+        ifile    (str): input parameter file, may contain (wild). Not needed if ifiles is given
+    Optional inputs:
+        sobj, nsobj   : one entry per key, each a string or list of strings that all must (sobj) or
+                        must not (nsobj) be in the subordinate object path. 'First' selects the first hit.
+                        Entries with a ':' are object path queries e.g. 'phase:alpha/texture' or
+                        'datafile:*.gda', see ParDocument.select
+        value (str/list): value(s) of the task e.g. '0 1 100000' for ref_par
+        loopid   (str): a zero based integer specifying a parameter location in a loop variable
+        ifiles, ofiles (list): explicit file paths, bypasses work_dir/run_dir/wild path building
+        nworkers (int): number of parameter files edited in parallel, see edit_parallel
+        pool_type (str): thread or process pool used when nworkers > 1
+        preserve_format (bool): keep the line ends and white space of the lines that are not
+                        edited instead of writing every line in the write_par format
+        all_runs (bool): get tasks return a list with the value of every file in the order of ifiles
+                        (wild order) instead of the value of the first file
+
+    Outputs:
+        argparse.Namespace accepted by edit and apply_task
+    '''
+    if key is None:
+        key = []
+    elif isinstance(key, str):
+        key = [key]
+    keys = [[k.replace('&', ' ')] for k in key]
+
+    if ifiles is None:
+        ifiles, ofiles = resolve_files(ifile, ofile, work_dir, run_dir, wild, wild_range)
+    elif ofiles is None:
+        ofiles = ifiles
+
+    if value is not None:
+        if isinstance(value, str):
+            value = value.split(' ')
+        value = [str(val).replace('&', ' ') for val in value]
 
     # Make sure arguments make sense
-    if args.task == 'set_par':
-        assert args.value != None, 'must pass a value argument to set a parameter!'
+    if task == 'set_par':
+        assert value != None, 'must pass a value argument to set a parameter!'
         #Handle value formating
-        for i, val in enumerate(args.value):
+        for i, val in enumerate(value):
             try:
                 if float(val).is_integer():
-                    args.value[i] = f'{int(val)}' 
+                    value[i] = f'{int(val)}' 
                 else:
-                    args.value[i] = f'{float(val):G}' 
+                    value[i] = f'{float(val):G}' 
             except ValueError:
                 pass
 
     # Make sure arguments make sense
-    if args.task == 'ref_par':
-        assert args.value != None, 'must pass a multiple and addition to reference another parameter'
-
-    # if args.task=='add_par' or args.task=='rem_par':
-    #    assert args.loopid!=None, 'only allowed tosduld only do this for backgrounds..'
-    if args.reverse_search in 'True':
-        args.reverse_search=True
-    else:
-        args.reverse_search=False
-        
-    return args
+    if task == 'ref_par':
+        assert value != None and len(value) >= 2, 'must pass a multiple and addition to reference another parameter'
+    if task in ('scale_odf', 'export_odf', 'resize_par'):
+        assert value != None, f'must pass a value argument to {task}'
+
+    if loopid is None:
+        loopid = 'None'
+    if max_search_hits is None:
+        max_search_hits = 1e6
+    if pool_type is None:
+        pool_type = 'thread'
+    assert pool_type in ('thread', 'process'), f'pool_type must be thread or process not {pool_type}'
+
+    return argparse.Namespace(task=task, key=keys, ifile=ifiles, ofile=ofiles,
+                              sobj=_scope_list(sobj, len(keys)), nsobj=_scope_list(nsobj, len(keys)),
+                              value=value, loopid=str(loopid), work_dir=work_dir, run_dir=run_dir,
+                              reverse_search=reverse_search is True or reverse_search == 'True',
+                              max_search_hits=max_search_hits, verbose=int(verbose or 0),
+                              nworkers=int(nworkers or 1), pool_type=pool_type,
+                              preserve_format=bool(preserve_format), all_runs=bool(all_runs))
 
 
 def getStats(linesMod, nlinesMod, ifile, key):
@@ -1681,32 +2280,26 @@ def add_datafile_background_keys(lines,d,sobj,nsobj):
         '0 #min -10000.0 #max 10000.0\n'
         ]
     
-    #Clean sobj filtering
-    if nsobj[0] is None or nsobj[0] == "None":
-        nsobj=[]
-    if sobj[0] is None or sobj[0] == "None":
-        sobj=[]
+    #Datafiles in the sobj/nsobj scope
+    doc = lines if isinstance(lines, ParDocument) else ParDocument(lines)
+    computed = doc.find("_riet_meas_datafile_compute")
+    computed = {computed[j] for j in doc.scope(computed, sobj, nsobj)}
 
     #Get index to insert lines if no background already there for datafile
     insert_index=[]
     insert_index_exists=[]
     is_datafile=[]
-    sobj_cur=[]
-    sobj_index=[]
 
     for i, line in enumerate(lines):
         # keep track of the subordinate objects
         if 'subordinateObject' in line:
             if 'end' in line:
                 is_datafile.pop()
-                sobj_cur.pop()
             else:
                 is_datafile.append(False)     
-                sobj_cur.append(line.partition('subordinateObject')[2])
                               
         if "_riet_meas_datafile_compute" in line and is_datafile!=[]:
-            sub_text = ''.join(sobj_cur)
-            if all(x not in sub_text for x in nsobj) and all(x in sub_text for x in sobj):               
+            if i in computed:
                 #Get potential index to insert lines_to_insert 
                 ind = i + 1
                 line = lines[ind]
@@ -1733,157 +2326,715 @@ def add_datafile_background_keys(lines,d,sobj,nsobj):
     for index in reversed(insert_index):
         if index in insert_index_exists:
             nlines+=1
-            lines.insert(index,lines_to_insert[-1])
+            lines[index:index]=lines_to_insert[-1:]
         else:
-            for line in reversed(lines_to_insert):
-                nlines+=1
-                lines.insert(index,line)
+            nlines+=len(lines_to_insert)
+            lines[index:index]=lines_to_insert
     return lines,nlines
 
-def main(argsin,lines=None,do_write=True):
-    # Get arguments from user
-    args = get_arguments(argsin)
+def apply_task(doc, args, d=None, stats=None):
+    '''
+    apply one editor task to a parsed parameter file
+    Required Inputs:
+        doc  (ParDocument): parsed parameter file, modified in place
+        args   (Namespace): task arguments from task_arguments or get_arguments
+    Optional inputs:
+        d         (dict): dictionary of standard keys, see template_dict
+        stats     (dict): filled with the number of lines and the hits of each key before
+                          (hits) and after (scoped) the sobj/nsobj filtering, see add_listener
+
+    Outputs:
+        [value, nlinesMod] where value is the result of get_val, get_err, get_phases and get_odf else None
+    '''
+    if d is None:
+        d = template_dict()
+    lines = doc.lines
 
+    index = []
+    sobj_index = []
+    isloop_index = []
+    indloop_index = []
+    endloop_index = []
+    if args.task != 'add_datafile_bk_par':
+        # Search the document for all keywords at once
+        found = search_many(doc, [key[0] for key in args.key], d, args.max_search_hits, args.reverse_search)
+    for i in range(0, len(args.key)):
+        if args.task=='add_datafile_bk_par':
+            linesMod,nlinesMod = add_datafile_background_keys(doc,d,args.sobj[i],args.nsobj[i])
+        else:
+            tmp = found[i]
+            index.append(tmp[0])
+            sobj_index.append(tmp[1])
+            isloop_index.append(tmp[2])
+            indloop_index.append(tmp[3])
+            endloop_index.append(tmp[4])
+
+            # Filter keyword by subordinate object
+            keep = doc.scope(index[i], args.sobj[i], args.nsobj[i])
+            if len(keep) < len(index[i]):
+                index[i] = [index[i][j] for j in keep]
+                sobj_index[i] = [sobj_index[i][j] for j in keep]
+                isloop_index[i] = [isloop_index[i][j] for j in keep]
+                indloop_index[i] = [indloop_index[i][j] for j in keep]
+                endloop_index[i] = [endloop_index[i][j] for j in keep]
+
+    if stats is not None:
+        stats['lines'] = len(lines)
+        stats['hits'] = [len(found[i][0]) for i in range(len(index))]
+        stats['scoped'] = [len(hits) for hits in index]
+
+    # Apply the specified task
+    if args.task == 'free_par':
+        tmp = free_parameter(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
+        doc.refresh(index[0])
+    elif args.task == 'fix_par':
+        tmp = fix_parameter(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
+        doc.refresh(index[0])
+    elif args.task == 'set_par':
+        tmp = set_par(lines, args.value, index[0],
+                    isloop_index[0], indloop_index[0], args.loopid)
+        doc.refresh(index[0])
+    elif args.task == 'fix_all':
+        refined = doc.refined_lines()
+        tmp = fix_all(lines, refined)
+        doc.refresh(refined)
+        if stats is not None:
+            stats['scoped'] = [len(refined)]
+    elif args.task == 'reset_odf':
+        tmp = reset_odf(doc, index[0])
+    elif args.task == 'scale_odf':
+        tmp = scale_odf(doc, index[0], float(args.value[0]))
+    elif args.task == 'copy_odf':
+        # copy from the parameter file in value (relative to work_dir) or from key2 in the same file
+        if args.value:
+            source = ParDocument.from_file(os.path.join(args.work_dir or os.getcwd(), args.value[0]), lazy=True)
+            source_index = source.search(d['ODFValues'])[0]
+            source_index = [source_index[j] for j in source.scope(source_index, args.sobj[1], args.nsobj[1])]
+        else:
+            source = doc
+            source_index = index[1]
+        tmp = copy_odf(doc, index[0], source, source_index)
+    elif args.task == 'get_odf':
+        return [get_odf(doc, index[0]), 0]
+    elif args.task == 'export_odf':
+        # the file name is relative to the directory of the parameter file
+        fname = os.path.join(os.path.dirname(doc.fname or ''), args.value[0])
+        doc.save_odf(fname, args.sobj[0], args.nsobj[0])
+        tmp = [lines, 0]
+    elif args.task == 'ref_par':
+        tmp = ref_par(doc, index, args.value, isloop_index, indloop_index, args.loopid)
+        doc.refresh(index[0]+index[1])
+    elif args.task == 'add_par':
+        tmp = add_par(doc, index[0], endloop_index[0], int(args.value[0]) if args.value else 1)
+    elif args.task == 'rem_par':
+        tmp = rem_par(doc, index[0], endloop_index[0], int(args.value[0]) if args.value else 1)
+    elif args.task == 'resize_par':
+        tmp = resize_par(doc, index[0], endloop_index[0], int(args.value[0]))
+    elif args.task == 'un_ref_par':
+        tmp = un_ref_par(doc, index[0], isloop_index[0], indloop_index[0], args.loopid)
+        doc.refresh(index[0]+tmp[2])
+    elif args.task == 'track_par':
+        tmp = track_par(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
+        doc.refresh(index[0])
+    elif args.task == 'untrack_par':
+        tmp = untrack_par(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
+        doc.refresh(index[0])
+    elif args.task == 'untrack_all':
+        tracked = doc.tracked_lines()
+        tmp = untrack_all(lines, tracked)
+        doc.refresh(tracked)
+        if stats is not None:
+            stats['scoped'] = [len(tracked)]
+    elif args.task == 'get_phases':
+        return [get_phases(lines, index[0]), 0]
+    elif args.task == 'get_val':
+        return [get_val(lines, index[0], isloop_index[0], indloop_index[0], args.loopid), 0]
+    elif args.task == 'get_err':
+        return [get_err(lines, index[0], isloop_index[0], indloop_index[0], args.loopid), 0]
+    elif args.task == 'add_datafile_bk_par':
+        tmp = [linesMod, nlinesMod]
+    else:
+        raise NameError('key is not implemented')
+
+    return [None, tmp[1]]
+
+
+# Listeners of the editor events, see add_listener
+_listeners = []
+
+
+def add_listener(callback):
+    '''
+    report every edit of a parameter file to callback. Nothing is measured while there are no listeners
+    Required Inputs:
+        callback (function): called with one dict per task and parameter file holding
+                             task, key, sobj, nsobj, value: the task arguments
+                             ifile, ofile: the parameter files
+                             time_s:     wall time of reading, editing and writing the file
+                             lines:      number of lines searched
+                             hits:       hits of each key before the sobj/nsobj filtering
+                             scoped:     hits of each key after the filtering
+                             modified:   number of lines modified
+                             bytes_read, bytes_written: 0 for stored parameter files, transactions
+                                         and writes skipped because nothing changed
+                             transaction: True for tasks queued on an editor transaction
+                             timestamp:  time.time() at the end of the edit
+    Outputs:
+        callback
+    '''
+    _listeners.append(callback)
+    return callback
+
+
+def remove_listener(callback):
+    _listeners.remove(callback)
+
+
+@contextmanager
+def listen(callback):
+    '''
+    add_listener for the duration of a with block, a listener with a close method is closed at the end
+    usage:
+        with listen(EventSummary()) as summary:
+            editor.free(key='Biso')
+        print(summary.unmatched())
+    '''
+    add_listener(callback)
+    try:
+        yield callback
+    finally:
+        remove_listener(callback)
+        if hasattr(callback, 'close'):
+            callback.close()
+
+
+def _notify(event):
+    for callback in list(_listeners):
+        callback(event)
+
+
+def _event(args, ifile, ofile, seconds, modified, stats, transaction=False):
+    return {'task': args.task, 'key': [key[0] for key in args.key], 'sobj': args.sobj,
+            'nsobj': args.nsobj, 'value': args.value, 'ifile': ifile, 'ofile': ofile,
+            'time_s': seconds, 'lines': stats.get('lines', 0), 'hits': stats.get('hits', []),
+            'scoped': stats.get('scoped', []), 'modified': modified,
+            'bytes_read': stats.get('bytes_read', 0), 'bytes_written': stats.get('bytes_written', 0),
+            'transaction': transaction, 'timestamp': time.time()}
+
+
+class EventLog:
+    '''
+    editor listener appending every event to a file as one JSON line, see add_listener
+    Required Inputs:
+        fname (str): JSON lines file
+    '''
+    def __init__(self, fname):
+        self.fname = fname
+        self._file = open(fname, 'a')
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event)
+        with self._lock:
+            self._file.write(line+'\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class EventSummary:
+    '''
+    editor listener totalling the events of every operation (task, key, sobj, nsobj and value)
+    over all parameter files, see add_listener
+    '''
+    def __init__(self):
+        self.operations = {}
+
+    def __call__(self, event):
+        op = json.dumps([event['task'], event['key'], event['sobj'], event['nsobj'], event['value']])
+        total = self.operations.get(op)
+        if total is None:
+            total = {name: event[name] for name in ('task', 'key', 'sobj', 'nsobj', 'value')}
+            total.update(files=0, time_s=0.0, lines=0, hits=0, scoped=0, modified=0,
+                         bytes_read=0, bytes_written=0)
+            self.operations[op] = total
+        total['files'] += 1
+        for name in ('time_s', 'lines', 'modified', 'bytes_read', 'bytes_written'):
+            total[name] += event[name]
+        total['hits'] += sum(event['hits'])
+        total['scoped'] += sum(event['scoped'])
+
+    def unmatched(self):
+        '''
+        operations that matched and modified nothing in any of their parameter files
+        '''
+        return [total for total in self.operations.values() if total['scoped'] == 0 and total['modified'] == 0]
+
+    def slowest(self, n=10):
+        '''
+        the n operations that took the longest in total
+        '''
+        return sorted(self.operations.values(), key=lambda total: total['time_s'], reverse=True)[:n]
+
+    def frame(self):
+        import pandas as pd
+        return pd.DataFrame(list(self.operations.values()))
+
+
+def edit_file(args, ifile, ofile, do_write=True,
+              doc=None, d=None):
+    '''
+    apply a task to one parameter file
+    Required Inputs:
+        args   (Namespace): task arguments from task_arguments or get_arguments
+        ifile        (str): parameter file to read
+        ofile        (str): parameter file to save
+    Optional inputs:
+        do_write    (bool): write the modified parameter file to ofile. The file is replaced
+                            atomically and left untouched if the task changed nothing and
+                            ofile already holds the document
+        doc  (ParDocument): parsed parameter file to edit instead of reading ifile
+        d           (dict): dictionary of standard keys, see template_dict
+
+    Outputs:
+        [value, nlinesMod] as returned by apply_task
+    '''
+    if _listeners:
+        result, event = measure_edit_file(args, ifile, ofile, do_write, doc, d)
+        _notify(event)
+        return result
+    return _edit_file(args, ifile, ofile, do_write, doc, d)
+
+
+def measure_edit_file(args, ifile, ofile, do_write=True,
+                      doc=None, d=None):
+    '''
+    edit_file returning the event for the listeners instead of reporting it
+    Outputs:
+        [value, nlinesMod], event (dict, see add_listener)
+    '''
+    stats = {}
+    start = time.perf_counter()
+    result = _edit_file(args, ifile, ofile, do_write, doc, d, stats)
+    return result, _event(args, ifile, ofile, time.perf_counter()-start, result[1], stats)
+
+
+def _edit_file(args, ifile, ofile, do_write=True, doc=None, d=None, stats=None):
+    if doc is None:
+        doc = ParDocument.from_file(ifile, lazy=True, preserve=args.preserve_format)
+        if stats is not None:
+            stats['bytes_read'] = os.path.getsize(ifile)
+
+    if args.task in get_tasks:
+        return apply_task(doc, args, d, stats)
+    value, nlinesMod = apply_task(doc, args, d, stats)
+
+    # write back the par, without modified lines only if ofile does not hold the output yet
+    if do_write:
+        written = doc.write(ofile, skip_unchanged=not nlinesMod)
+        if stats is not None and written:
+            stats['bytes_written'] = os.path.getsize(ofile)
+
+    if args.verbose > 0:
+        getStats(doc.lines, nlinesMod, ifile, args.key[0] if args.key else None)
+
+    return [value, nlinesMod]
+
+
+def edit_parallel(args, do_write=True):
+    '''
+    apply a task to all parameter files in args using a pool of args.nworkers threads or processes
+    (args.pool_type). Every file is attempted, failures are collected and reported together. The get
+    tasks return the value of every file, as edit with args.all_runs e.g.
+        edit_parallel(task_arguments('get_val', key='_cell_length_a', ifile='Analysis.par', run_dir='run(wild)', wild=[0, 1]))
+    Required Inputs:
+        args   (Namespace): task arguments from task_arguments or get_arguments
+    Optional inputs:
+        do_write  (bool): write the modified parameter files to args.ofile
+
+    Outputs:
+        for get_val, get_err, get_phases and get_odf a list with the value of each file in the order
+        of args.ifile (wild order) else None
+    '''
+    # with listeners the events are reported here, also for files edited by a process pool
+    func = measure_edit_file if _listeners else edit_file
+    values = map_files(func, [(args, ifile, ofile, do_write) for ifile, ofile in zip(args.ifile, args.ofile)],
+                       args.ifile, args.nworkers, args.pool_type, args.task)
+    if func is measure_edit_file:
+        for value, event in values:
+            _notify(event)
+        values = [value for value, event in values]
+    if args.task in get_tasks:
+        return [value[0] for value in values]
+
+
+def map_files(func, calls, files, nworkers=1, pool_type='thread',
+              task='edit'):
+    '''
+    call func(*call) for every call, one parameter file each, using a pool of nworkers threads or
+    processes. Every call is attempted, failures are collected and reported together.
+    Required Inputs:
+        func  (function): module level function
+        calls     (list): argument tuples of each call
+        files     (list): parameter file of each call, used in the error message
+    Optional inputs:
+        nworkers   (int): number of parallel calls
+        pool_type  (str): thread or process
+        task       (str): name of the task in the error message
+
+    Outputs:
+        list of the results in the order of calls
+    '''
+    if nworkers is None or nworkers < 1:
+        nworkers = 1
+    if pool_type == 'process':
+        pool = ProcessPoolExecutor(max_workers=min(nworkers, os.cpu_count()))
+    else:
+        pool = ThreadPoolExecutor(max_workers=nworkers)
+
+    with pool:
+        futures = [pool.submit(func, *call) for call in calls]
+
+    values = []
+    errors = []
+    for file, future in zip(files, futures):
+        try:
+            values.append(future.result())
+        except Exception as e:
+            values.append(None)
+            errors.append(f'{file}: {type(e).__name__}: {e}')
+    if errors:
+        raise RuntimeError(f'{task} failed for {len(errors)} of {len(calls)} parameter files:\n'
+                           + '\n'.join(errors))
+    return values
+
+
+def edit(args, lines=None, do_write=True):
+    '''
+    apply a task to all parameter files in args
+    Required Inputs:
+        args   (Namespace): task arguments from task_arguments or get_arguments
+    Optional inputs:
+        lines (list/ParDocument): stored parameter file to edit instead of reading args.ifile
+        do_write  (bool): write the modified parameter files to args.ofile
+
+    Outputs:
+        the value of get_val, get_err, get_phases and get_odf for the first file, with args.all_runs
+        a list with the value of every file in the order of args.ifile (wild order), else None.
+        The same with any args.nworkers
+    '''
     # Get the dictionary of standard edits
     d = template_dict()
 
     if lines is None:
-        do_read = True
+        if args.nworkers > 1 and len(args.ifile) > 1 and (args.task not in get_tasks or args.all_runs):
+            return edit_parallel(args, do_write)
+        doc = None
     else:
         assert len(args.ifile)==1, "Only one ifile should be specified when using stored parameter file." 
-        do_read = False
+        if isinstance(lines, ParDocument):
+            doc = lines
+        else:
+            doc = ParDocument(lines)
 
+    values = []
     for ifile, ofile in zip(args.ifile,args.ofile): 
         # Main loop through files to edit
-        # read in the lines
-        if do_read:
-            lines = read_par(ifile)
-
-        index = []
-        sobj_index = []
-        isloop_index = []
-        indloop_index = []
-        endloop_index = []
-        for i in range(0, len(args.key)):
-            key = args.key[i][0]
-            # Search list of line strings for keyword
-            if key in d:
-                keyword = d[key]
-            else:
-                keyword = key
+        value, nlinesMod = edit_file(args, ifile, ofile, do_write, doc, d)
+        if args.task in get_tasks:
+            if not args.all_runs:
+                return value
+            values.append(value)
+    if args.task in get_tasks:
+        return values
+
+
+async def aedit(args, lines=None, do_write=True):
+    '''
+    asyncio variant of edit. The files are edited one at a time in the event loop and control
+    returns to the loop after each file, so MAUD runs and other tasks of the loop continue
+    while a long list of parameter files is edited. With args.nworkers > 1 the pool of
+    edit_parallel is awaited in the default executor instead, for the get tasks only with
+    args.all_runs.
+    Required Inputs:
+        args   (Namespace): task arguments from task_arguments or get_arguments
+    Optional inputs:
+        lines (list/ParDocument): stored parameter file to edit instead of reading args.ifile
+        do_write  (bool): write the modified parameter files to args.ofile
+
+    Outputs:
+        as edit
+    '''
+    if lines is not None:
+        return edit(args, lines, do_write)
+    if args.nworkers > 1 and len(args.ifile) > 1 and (args.task not in get_tasks or args.all_runs):
+        return await asyncio.get_running_loop().run_in_executor(None, edit_parallel, args, do_write)
 
-            if args.task=='add_datafile_bk_par':
-                linesMod,nlinesMod = add_datafile_background_keys(lines,d,args.sobj[i],args.nsobj[i])
+    d = template_dict()
+    values = []
+    for ifile, ofile in zip(args.ifile,args.ofile):
+        value, nlinesMod = edit_file(args, ifile, ofile, do_write, None, d)
+        if args.task in get_tasks:
+            if not args.all_runs:
+                return value
+            values.append(value)
+        await asyncio.sleep(0)
+    if args.task in get_tasks:
+        return values
+
+
+def _to_float(token):
+    try:
+        return float(token)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def extract_doc(doc, keys, errors=True, fname=None):
+    '''
+    values and errors of keys in one parsed parameter file
+    Required Inputs:
+        doc (ParDocument): parsed parameter file
+        keys       (list): keys or names in template_dict. Keys match like the editor tasks i.e.
+                           _cell_length matches _cell_length_a, _cell_length_b and _cell_length_c
+    Optional inputs:
+        errors     (bool): include the parameter errors
+        fname       (str): file name stored in the file column
+
+    Outputs:
+        dict of columns, see extract
+    '''
+    d = template_dict()
+    lines = doc.lines
+
+    # subordinate object path of each phase and its name
+    phases = []
+    for i in doc.find('_pd_phase_name'):
+        if doc.loop_at(i) is None:
+            phases.append((doc.path(i), get_phases(lines, [i])[0]))
+    phases.sort(key=lambda phase: len(phase[0]), reverse=True)
+
+    columns = {'file': [], 'key': [], 'phase': [], 'object': [], 'row': [], 'value': []}
+    if errors:
+        columns['error'] = []
+    for key, found in zip(keys, search_many(doc, keys, d)):
+        keyword = d.get(key, key)
+        index, sobj, isloop, indloop, _ = found
+        header = None
+        for i, path, inloop, row in zip(index, sobj, isloop, indloop):
+            if inloop:
+                if row == 0 or header is None:
+                    loop = doc.loop_at(i - row - 1)
+                    header = next((k for k in loop.keys if keyword in k), loop.keys[0])
+                    column = loop.keys.index(header)
+                name = header
+                value, err = parameter_value(lines[i], column)
             else:
-                if args.reverse_search:
-                    tmp = search_list_reverse(lines, keyword, d,args.max_search_hits)
-                else:
-                    tmp = search_list(lines, keyword, d, args.max_search_hits)
-                index.append(tmp[0])
-                sobj_index.append(tmp[1])
-                isloop_index.append(tmp[2])
-                indloop_index.append(tmp[3])
-                endloop_index.append(tmp[4])
-
-                # Filter keyword by subordinate object
-                if args.sobj[i][0] == 'First':
-                    index[i] = [index[i][0]]
-                    isloop_index[i] = [isloop_index[i][0]]
-                    indloop_index[i] = [indloop_index[i][0]]
-                    endloop_index[i] = [endloop_index[i][0]]
-                else:
-                    if args.nsobj[i][0] == 'First':
-                        index[i]=index[i][1:]
-                        isloop_index[i]=isloop_index[i][1:]
-                        indloop_index[i]=indloop_index[i][1:]
-                        endloop_index[i]=endloop_index[i][1:]
-                        
-                    if args.sobj[i][0] != None and args.sobj[i][0] != 'None':
-                        indextmp = []
-                        isloop_indextmp = []
-                        indloop_indextmp = []
-                        endloop_indextmp = []
-                        sobj_indextmp = []
-                        for j in range(0, len(index[i])):
-                            sobjs = ''.join(sobj_index[i][j])
-                            if all(x in sobjs for x in args.sobj[i]):
-                                # print(sobjs)
-                                indextmp.append(index[i][j])
-                                isloop_indextmp.append(isloop_index[i][j])
-                                indloop_indextmp.append(indloop_index[i][j])
-                                endloop_indextmp.append(endloop_index[i][j])
-                                sobj_indextmp.append(sobj_index[i][j])
-                        index[i] = indextmp
-                        isloop_index[i] = isloop_indextmp
-                        indloop_index[i] = indloop_indextmp
-                        endloop_index[i] = endloop_indextmp
-                        sobj_index[i] = sobj_indextmp
-                    if args.nsobj[i][0] != None and args.nsobj[i][0] != 'None':
-                        indextmp = []
-                        isloop_indextmp = []
-                        indloop_indextmp = []
-                        endloop_indextmp = []
-                        for j in range(0, len(index[i])):
-                            sobjs = ''.join(sobj_index[i][j])
-                            if all(x not in sobjs for x in args.nsobj[i]):
-                                # print(sobjs)
-                                indextmp.append(index[i][j])
-                                isloop_indextmp.append(isloop_index[i][j])
-                                indloop_indextmp.append(indloop_index[i][j])
-                                endloop_indextmp.append(endloop_index[i][j])
-                        index[i] = indextmp
-                        isloop_index[i] = isloop_indextmp
-                        indloop_index[i] = indloop_indextmp
-                        endloop_index[i] = endloop_indextmp
-
-        lines = lines
-
-        # Apply the specified task
-        if args.task == 'free_par':
-            tmp = free_parameter(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
-        elif args.task == 'fix_par':
-            tmp = fix_parameter(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
-        elif args.task == 'set_par':
-            tmp = set_par(lines, args.value, index[0],
-                        isloop_index[0], indloop_index[0], args.loopid)
-        elif args.task == 'fix_all':
-            tmp = fix_all(lines)
-        elif args.task == 'reset_odf':
-            tmp = reset_odf(lines, index[0])
-        elif args.task == 'ref_par':
-            tmp = ref_par(lines, index, args.value, isloop_index, indloop_index, args.loopid)
-        elif args.task == 'add_par':
-            tmp = add_par(lines, index[0], endloop_index[0])
-        elif args.task == 'rem_par':
-            tmp = rem_par(lines, index[0], endloop_index[0])
-        elif args.task == 'un_ref_par':
-            raise NameError('key is not implemented')
-        elif args.task == 'track_par':
-            tmp = track_par(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
-        elif args.task == 'untrack_par':
-            tmp = untrack_par(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
-        elif args.task == 'untrack_all':
-            tmp = untrack_all(lines)
-        elif args.task == 'get_phases':
-            return get_phases(lines, index[0])
-        elif args.task == 'get_val':
-            return get_val(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
-        elif args.task == 'get_err':
-            return get_err(lines, index[0], isloop_index[0], indloop_index[0], args.loopid)
-        elif args.task == 'add_datafile_bk_par':
-            pass
+                name = lines[i].split(None, 1)[0]
+                value, err = parameter_value(lines[i], 1)
+                row = -1
+            value, err = _to_float(value), _to_float(err)
+            columns['file'].append(fname)
+            columns['key'].append(name)
+            columns['phase'].append(next((phase for p, phase in phases if path.startswith(p)), None))
+            columns['object'].append(path.split('\n')[-2][1:] if path else None)
+            columns['row'].append(row)
+            columns['value'].append(value)
+            if errors:
+                columns['error'].append(err)
+    return columns
+
+
+def extract_file(ifile, keys, errors=True):
+    '''
+    values and errors of keys in one parameter file, see extract_doc
+    '''
+    return extract_doc(ParDocument.from_file(ifile, lazy=True), keys, errors, ifile)
+
+
+def extract_frame(columns, errors=True):
+    '''
+    combine the columns of extract_doc into one typed DataFrame
+    '''
+    import numpy as np
+    import pandas as pd
+    names = ['file', 'key', 'phase', 'object', 'row', 'value'] + (['error'] if errors else [])
+    data = {name: [x for column in columns for x in column[name]] for name in names}
+    df = pd.DataFrame(data, columns=names)
+    df['row'] = df['row'].astype(np.int64)
+    df['value'] = df['value'].astype(np.float64)
+    if errors:
+        df['error'] = df['error'].astype(np.float64)
+    return df
+
+
+def extract(ifiles, keys, errors=True, nworkers=1,
+            pool_type='thread'):
+    '''
+    values and errors of many keys from many parameter files, each file is read and parsed once
+    Required Inputs:
+        ifiles (list): parameter files
+        keys   (list): keys or names in template_dict e.g. ['_cell_length_a', 'Biso']
+    Optional inputs:
+        errors    (bool): include the parameter errors
+        nworkers   (int): number of files read in parallel
+        pool_type  (str): thread or process pool used when nworkers > 1
+
+    Outputs:
+        DataFrame with one row per value and the columns
+            file   (str): parameter file
+            key    (str): matched key
+            phase  (str): name of the phase the value belongs to, None outside of phases
+            object (str): innermost subordinate object
+            row    (int): zero based row of loop values, -1 otherwise
+            value (float): parameter value, NaN if not a number
+            error (float): parameter error, NaN if the parameter is not refined
+    '''
+    if isinstance(ifiles, str):
+        ifiles = [ifiles]
+    if isinstance(keys, str):
+        keys = [keys]
+    if nworkers is not None and nworkers > 1 and len(ifiles) > 1:
+        columns = map_files(extract_file, [(ifile, keys, errors) for ifile in ifiles], ifiles, nworkers,
+                            pool_type, 'extract')
+    else:
+        columns = [extract_file(ifile, keys, errors) for ifile in ifiles]
+    return extract_frame(columns, errors)
+
+
+def set_model(kind, key, ifiles, ofiles=None, sobj=None,
+              nworkers=1, pool_type='thread', preserve=False):
+    '''
+    replace the texture or size-strain model objects of the phases of many parameter files, the
+    model templates are read once and each model object is replaced by one slice assignment
+    Required Inputs:
+        kind   (str): texture or sizeStrain, see model.templates.MODELS
+        key    (str): model name e.g. EWIMV
+        ifiles (list): parameter files
+    Optional inputs:
+        ofiles    (list): output parameter files, defaults to ifiles
+        sobj      (list): subordinate objects the replaced model objects have to be in, all phases by default
+        nworkers   (int): number of files edited in parallel
+        pool_type  (str): thread or process pool used when nworkers > 1
+        preserve  (bool): keep the line endings of the parameter files
+
+    Outputs:
+        list with the number of replaced model objects of each file
+    '''
+    if isinstance(ifiles, str):
+        ifiles = [ifiles]
+    if ofiles is None:
+        ofiles = ifiles
+    elif isinstance(ofiles, str):
+        ofiles = [ofiles]
+    calls = [(kind, key, sobj, ifile, ofile, preserve) for ifile, ofile in zip(ifiles, ofiles)]
+    if nworkers is not None and nworkers > 1 and len(ifiles) > 1:
+        return map_files(splice_model_file, calls, ifiles, nworkers, pool_type, kind)
+    return [splice_model_file(*call) for call in calls]
+
+
+class Transaction:
+    '''
+    parsed copies of the parameter files touched by a batch of editor operations,
+    see editor.transaction
+    '''
+    def __init__(self, preserve=False):
+        self.docs = {}
+        self.pending = {}
+        self.report = []
+        self.d = template_dict()
+        self.preserve = preserve
+        self._modified = {}
+
+    def document(self, ifile, ofile):
+        '''
+        parsed copy of ifile to modify and save as ofile, read only on first use
+        '''
+        if ifile in self.docs:
+            doc = self.docs[ifile]
         else:
-            raise NameError('key is not implemented')
-        if args.task !='add_datafile_bk_par':
-            linesMod = tmp[0]
-            nlinesMod = tmp[1]
+            doc = ParDocument.from_file(ifile, lazy=True, preserve=self.preserve)
+            self.docs[ifile] = doc
+        if ofile != ifile:
+            # ifile itself is left unchanged, continue on a copy saved as ofile
+            self._modified[ofile] = self._modified.get(ifile, 0)
+            doc = doc.copy()
+            doc.fname = ofile
+            self.docs[ofile] = doc
+        return doc
+
+    def apply(self, args):
+        '''
+        apply one task to the parsed copies of all files in args
+        Outputs:
+            the value of get_val, get_err, get_phases and get_odf for the first file, with
+            args.all_runs the list of the values of all files, else None
+        '''
+        key = args.key[0][0] if args.key else None
+        hits = {}
+        values = []
+        for ifile, ofile in zip(args.ifile, args.ofile):
+            if args.task in get_tasks:
+                value, nlinesMod = self._apply_task(self.document(ifile, ifile), args, ifile, ifile)
+                hits[ifile] = len(value)
+                if not args.all_runs:
+                    self.report.append({'task': args.task, 'key': key, 'hits': hits})
+                    return value
+                values.append(value)
+                continue
+            doc = self.document(ifile, ofile)
+            value, nlinesMod = self._apply_task(doc, args, ifile, ofile)
+            self.pending[ofile] = doc
+            self._modified[ofile] = self._modified.get(ofile, 0) + (nlinesMod or 0)
+            hits[ofile] = nlinesMod
+        self.report.append({'task': args.task, 'key': key, 'hits': hits})
+        if args.task in get_tasks:
+            return values
+
+    def _apply_task(self, doc, args, ifile, ofile):
+        if not _listeners:
+            return apply_task(doc, args, self.d)
+        stats = {}
+        start = time.perf_counter()
+        value, nlinesMod = apply_task(doc, args, self.d, stats)
+        _notify(_event(args, ifile, ofile, time.perf_counter()-start, nlinesMod, stats, transaction=True))
+        return value, nlinesMod
+
+    def apply_model(self, model, argsin):
+        '''
+        insert a texture or sizeStrain model into the parsed copies
+        '''
+        args = model.get_arguments(argsin)
+        hits = {}
+        for ifile, ofile in zip(args.ifile, args.ofile):
+            doc = self.document(ifile, ofile)
+            nlines = len(doc.lines)
+            model.set_model(doc, args)
+            self.pending[ofile] = doc
+            self._modified[ofile] = self._modified.get(ofile, 0) + 1
+            hits[ofile] = len(doc.lines)-nlines
+        self.report.append({'task': model.__name__.rsplit('.', 1)[-1], 'key': args.key, 'hits': hits})
+
+    def flush(self):
+        '''
+        write every modified parameter file once
+        '''
+        for ofile, doc in self.pending.items():
+            # files without modified lines are only written if they do not hold the output yet
+            doc.write(ofile, skip_unchanged=not self._modified.get(ofile))
+        self.pending = {}
+
+    def print_report(self):
+        for op in self.report:
+            total = sum(op['hits'].values())
+            print(f"{op['task']} {op['key']}: {total} lines in {len(op['hits'])} files")
 
-        # write back the par
-        if do_write:
-            write_par(linesMod, ofile)
 
-        if args.verbose > 0:
-            getStats(linesMod, nlinesMod, ifile, args.key[0])
+def main(argsin,lines=None,do_write=True):
+    # Get arguments from user
+    args = get_arguments(argsin)
+    return edit(args, lines, do_write)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 10:02:15 2026
+
+"""
+
+from MILK.interface import benchmark
+import argparse
+import sys
+import pandas as pd
+
+
+def plot_scaling(scaling, fname):
+    """Save the scaling curves, one panel per axis."""
+    import matplotlib.pyplot as plt
+    axes = list(scaling['axis'].unique())
+    fig, ax = plt.subplots(1, len(axes), figsize=(6*len(axes), 5), squeeze=False)
+    for i, axis in enumerate(axes):
+        frame = scaling[scaling['axis'] == axis]
+        for case, curve in frame.groupby('case', sort=False):
+            ax[0, i].loglog(curve['size'], curve['best_s'], 'o-', label=case)
+        ax[0, i].set_xlabel(f'number of {axis}')
+        ax[0, i].set_ylabel('time (s)')
+    ax[0, -1].legend(fontsize='small', bbox_to_anchor=(1.02, 1), loc='upper left')
+    fig.tight_layout()
+    fig.savefig(fname)
+
+
+def main():
+    """Benchmark the parameter editor."""
+    parser = argparse.ArgumentParser(
+        description="Time the parameter editor on the shipped templates and synthetic parameter files.")
+    parser.add_argument("-t", "--templates", nargs='*', default=list(benchmark.TEMPLATES),
+                        choices=list(benchmark.TEMPLATES),
+                        help="Shipped templates to benchmark, all by default.")
+    parser.add_argument("-f", "--files", nargs='+', default=[],
+                        help="Additional parameter files to benchmark.")
+    parser.add_argument("-c", "--cases", nargs='+', choices=list(benchmark.CASES),
+                        help="Cases to run, all by default.")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Number of timed calls of each case.")
+    parser.add_argument("-s", "--scaling", nargs='+', default=[], choices=['phases', 'banks', 'datafiles'],
+                        help="Scaling curves of synthetic parameter files with growing number of phases, banks or datafiles.")
+    parser.add_argument("-n", "--sizes", type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help="Numbers of phases, banks or datafiles of the scaling curves.")
+    parser.add_argument("--odf_cells", type=int, default=0,
+                        help="Number of ODF values of each phase of the synthetic parameter files.")
+    parser.add_argument("--no_memory", action='store_true',
+                        help="Skip the peak memory measurement.")
+    parser.add_argument("-o", "--output", type=str, default='milk_benchmark',
+                        help="Results are saved to output.csv.")
+    parser.add_argument("-p", "--plot", action='store_true',
+                        help="Plot the scaling curves to output_scaling.png, requires matplotlib.")
+    parser.add_argument("-b", "--baseline", type=str,
+                        help="Csv file of earlier results. Exits with 1 if a case got slower than tolerance times the baseline.")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="Allowed ratio of the time of a case to the baseline.")
+    args = parser.parse_args()
+
+    memory = not args.no_memory
+    frames = []
+    if args.templates:
+        frames.append(benchmark.run_templates(args.templates, args.cases, args.repeat, memory))
+    for fname in args.files:
+        frames.append(benchmark.run_cases(fname, args.cases, args.repeat, memory))
+    scaling = [benchmark.scaling(axis=axis, sizes=args.sizes, cases=args.cases, repeat=args.repeat,
+                                 memory=memory, odf_cells=args.odf_cells) for axis in args.scaling]
+    results = pd.concat(frames+scaling, ignore_index=True)
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(results.drop(columns=['error']))
+    failed = results[results['error'] != '']
+    for _, row in failed.iterrows():
+        print(f"{row['file']} {row['case']} failed: {row['error']}")
+    results.to_csv(args.output+'.csv', index=False)
+    if scaling and args.plot:
+        plot_scaling(pd.concat(scaling, ignore_index=True), args.output+'_scaling.png')
+
+    if args.baseline is not None:
+        slower = benchmark.compare(results, args.baseline, args.tolerance)
+        if len(slower):
+            print(f'{len(slower)} cases are slower than {args.tolerance} times the baseline')
+            print(slower[[col for col in ('axis', 'size', 'file', 'case', 'best_s', 'best_s_baseline', 'ratio')
+                          if col in slower]])
+            sys.exit(1)
+        print('no case is slower than the baseline')
+
+
+if __name__ == "__main__":
+    main()
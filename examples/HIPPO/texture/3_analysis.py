@@ -24,20 +24,17 @@ def bound_b_factors(editor):
     editor.ref(key1='Biso', key2='Biso', value='0 1 100000', nsobj1='First',sobj2='First')
 
 def add_shared_background(nparameters,editor):
-    for _ in range(0, nparameters):
-        editor.add_loop_par(key='_riet_par_background_pol', nsobj='gda(')  # Add shared background only
+    editor.add_loop_par(key='_riet_par_background_pol', nsobj='gda(', nrows=nparameters)  # Add shared background only
 
 def rem_shared_background(nparameters,editor):
-    for _ in range(0, nparameters):
-        editor.rem_loop_par(key='_riet_par_background_pol', nsobj='gda(')  # Add shared background only
+    editor.rem_loop_par(key='_riet_par_background_pol', nsobj='gda(', nrows=nparameters)  # Add shared background only
 
 def add_individual_background(nparameters,editor):
     for _ in range(0, nparameters):
         editor.add_datafile_bk_par()
 
 def ref_individual_background(nparameters,editor):
-    for _ in range(0, nparameters):
-        editor.rem_loop_par(key='_riet_par_background_pol', sobj='gda(')  # Add shared background only
+    editor.rem_loop_par(key='_riet_par_background_pol', sobj='gda(', nrows=nparameters)  # Add shared background only
 
 def free_scale_parameters(editor,hippo):
     editor.free(key='_pd_phase_atom_')
@@ -91,9 +91,8 @@ if __name__ == '__main__':
     # Add shared background and free 
     #===================================================#
     set_dataset_wild(dataset["run"], editor, maudText)
-    for _ in range(0, 4):
-        editor.add_loop_par(key='_riet_par_background_pol',
-                            nsobj='chi(')  # Add shared background only
+    editor.add_loop_par(key='_riet_par_background_pol',
+                        nsobj='chi(', nrows=4)  # Add shared background only
     editor.free(key='Background')
 
     # Sequential copy lattice parameters based on phase regions
@@ -26,7 +26,8 @@ setup(name='MILK',
               'milk-integrate = bin.milk_integrate:entry_point',
               'milk-esg-loader = bin.milk_esg_loader:main',
               'milk-poni-export = bin.milk_poni_export:entry_point',
-              'milk-examples = bin.milk_examples:main'
+              'milk-examples = bin.milk_examples:main',
+              'milk-benchmark = bin.milk_benchmark:main'
           ],
       },
       install_requires=[],
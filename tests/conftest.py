@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:05:41 2026
+
+Shared fixtures of the MILK tests. Importing MILK needs CINEMA_PATH and MAUD_PATH, the tests
+do not use them and only set them if they are missing.
+"""
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault('CINEMA_PATH', tempfile.gettempdir())
+os.environ.setdefault('MAUD_PATH', tempfile.gettempdir())
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+STAND_IN = os.path.join(TESTS, 'standInMaud.py')
+EXAMPLES = os.path.join(os.path.dirname(TESTS), 'examples', 'maudbatch')
+
+
+@pytest.fixture
+def maud_path(tmp_path):
+    '''
+    MAUD installation whose java executable is standInMaud.py, see callMaudText.java_command
+    '''
+    if sys.platform.startswith('win'):
+        pytest.skip('the stand-in java executable is a shell script')
+    from MILK.MAUDText import callMaudText
+    path = tmp_path / 'maud'
+    java = callMaudText.java_command(str(path), None)[0]
+    os.makedirs(os.path.dirname(java))
+    os.makedirs(os.path.dirname(callMaudText.java_command(str(path), None)[-1]), exist_ok=True)
+    with open(java, 'w') as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{STAND_IN}" "$@"\n')
+    os.chmod(java, os.stat(java).st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+@pytest.fixture
+def ins(tmp_path):
+    '''
+    function writing an ins file for standInMaud.py e.g. ins('run0/a.ins', 'sleep 2'), see its directives
+    '''
+    def write(name, *directives):
+        fname = tmp_path / name
+        fname.parent.mkdir(parents=True, exist_ok=True)
+        with open(fname, 'w') as f:
+            f.write("loop_\n_riet_analysis_file\n_riet_analysis_iteration_number\n_riet_analysis_fileToSave\n\n"
+                    " 'a.par' 4 'b.par'\n")
+            for directive in directives:
+                f.write(f'#stand_in {directive}\n')
+        return str(fname)
+    return write
+
+
+@pytest.fixture
+def fecu_par(tmp_path):
+    '''
+    copy of examples/maudbatch/FeCustart.par
+    '''
+    return shutil.copy(os.path.join(EXAMPLES, 'FeCustart.par'), tmp_path)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:12:05 2026
+
+Stand-in for the MAUD java executable, to test callMaudText and maudWorker without MAUD.
+    standInMaud.py -version                          prints a java version, STAND_IN_JAVA (default 17)
+    standInMaud.py ... MaudWorker.java / --worker    speaks the MaudWorker.java line protocol
+    standInMaud.py ... -file <ins>                   one MaudText run
+A run prints MaudText like output to stdout and stderr and writes <ins>.out holding the pid of
+the process. Lines of the ins file change the run:
+    #stand_in sleep <seconds>    take this long
+    #stand_in fail               raise, status 1 in a worker, exit code 1 otherwise
+    #stand_in exit <code>        end the process in the middle of the run
+"""
+
+import os
+import sys
+import time
+
+
+def maud_text(ins):
+    # one MaudText -file ins run
+    print(f'MaudText: loading analysis {ins}', flush=True)
+    print('Warning: stand-in MAUD', file=sys.stderr, flush=True)
+    with open(ins) as f:
+        directives = [line.split()[1:] for line in f if line.startswith('#stand_in')]
+    for directive in directives:
+        if directive[0] == 'sleep':
+            time.sleep(float(directive[1]))
+        elif directive[0] == 'fail':
+            raise RuntimeError('stand-in refinement failed')
+        elif directive[0] == 'exit':
+            sys.stdout.flush()
+            os._exit(int(directive[1]))
+    with open(ins[:-4]+'.out', 'w') as f:
+        f.write(f'{os.getpid()}\n')
+    print('Refinement finished', flush=True)
+
+
+def worker():
+    protocol = sys.stdout
+    print('MILK_READY', flush=True)
+    for line in sys.stdin:
+        ins, log, err = line.rstrip('\r\n').split('\t')
+        sys.stdout = open(log if log else os.devnull, 'w')
+        sys.stderr = open(err if err else os.devnull, 'w')
+        status = 0
+        try:
+            maud_text(ins)
+        except Exception:
+            status = 1
+        finally:
+            sys.stdout.close()
+            sys.stderr.close()
+            sys.stdout, sys.stderr = protocol, sys.__stderr__
+        print(f'MILK_DONE {status}', flush=True)
+
+
+def main(args):
+    if args == ['-version']:
+        print(f'openjdk version "{os.environ.get("STAND_IN_JAVA", "17.0.2")}" 2023-01-17', file=sys.stderr)
+        return 0
+    if args and (args[-1].endswith('MaudWorker.java') or args[-1] == '--worker'):
+        worker()
+        return 0
+    try:
+        maud_text(args[args.index('-file')+1])
+    except RuntimeError:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 17:12:30 2026
+
+map_runs and amap_runs of callMaudText, run against standInMaud.py
+"""
+
+import argparse
+import asyncio
+import os
+
+import pytest
+
+from MILK.MAUDText import callMaudText, maudWorker
+
+
+def arguments(maud_path, nMAUD, timeout=30, backend='process'):
+    return argparse.Namespace(maud_path=maud_path, java_opt=None, simple_call='False', timeout=timeout,
+                              nMAUD=nMAUD, backend=backend, cur_step=0)
+
+
+@pytest.fixture(autouse=True)
+def cpus(monkeypatch):
+    # nMAUD is limited to the number of cpus
+    monkeypatch.setattr(callMaudText.os, 'cpu_count', lambda: 8)
+
+
+def max_overlap(runs):
+    # most runs of the last schedule running at the same time
+    events = sorted([(s, 1) for s, d in zip(runs._started, runs.seconds) if d is not None] +
+                    [(s+d, -1) for s, d in zip(runs._started, runs.seconds) if d is not None])
+    active = most = 0
+    for _, step in events:
+        active += step
+        most = max(most, active)
+    return most
+
+
+def ran(fname):
+    # the stand-in run finished
+    return os.path.exists(fname[:-4]+'.out')
+
+
+def test_map_runs_order(maud_path, ins):
+    # the runs end in the order 1 3 2 0, 0 and 2 fail
+    files = [ins('run0/a.ins', 'sleep 1.5', 'fail'), ins('run1/a.ins'), ins('run2/a.ins', 'sleep 0.8', 'fail'),
+             ins('run3/a.ins', 'sleep 0.3')]
+    try:
+        assert callMaudText.map_runs(arguments(maud_path, 4, backend='worker'), files) == [1, 0, 1, 0]
+    finally:
+        maudWorker.close_pools()
+    seconds = callMaudText.last_schedule.seconds
+    assert seconds[1] < seconds[3] < seconds[2] < seconds[0]
+
+
+def test_amap_runs_order(maud_path, ins):
+    # the runs end in the order 1 3 0 2, 0 and 2 exceed the timeout of 1 s
+    files = [ins('run0/a.ins', 'sleep 3'), ins('run1/a.ins'), ins('run2/a.ins', 'sleep 3'),
+             ins('run3/a.ins', 'sleep 0.3')]
+    assert asyncio.run(callMaudText.amap_runs(arguments(maud_path, 4, timeout=1), files)) == [1, 0, 1, 0]
+    assert [ran(fname) for fname in files] == [False, True, False, True]
+
+
+@pytest.mark.parametrize('nMAUD', [1, 2, 3])
+def test_map_runs_overlap(maud_path, ins, nMAUD):
+    files = [ins(f'run{i}/a.ins', 'sleep 0.5') for i in range(4)]
+    assert callMaudText.map_runs(arguments(maud_path, nMAUD), files) == [0]*4
+    runs = callMaudText.last_schedule
+    assert max_overlap(runs) == nMAUD
+    assert set(runs._slots) == set(range(nMAUD))
+
+
+@pytest.mark.parametrize('nMAUD', [1, 2, 3])
+def test_amap_runs_overlap(maud_path, ins, nMAUD):
+    files = [ins(f'run{i}/a.ins', 'sleep 0.5') for i in range(4)]
+    assert asyncio.run(callMaudText.amap_runs(arguments(maud_path, nMAUD), files)) == [0]*4
+    runs = callMaudText.last_schedule
+    assert max_overlap(runs) == nMAUD
+    assert set(runs._slots) == set(range(nMAUD))
+
+
+def test_map_runs_shutdown(maud_path, ins, monkeypatch):
+    pools = []
+
+    class Executor(callMaudText.ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    run_MAUD = callMaudText.run_MAUD
+
+    def failing_run(maud_path, java_opt, simple_call, timeout, ins_paths):
+        if 'run1' in ins_paths:
+            raise OSError('no MAUD')
+        return run_MAUD(maud_path, java_opt, simple_call, timeout, ins_paths)
+
+    monkeypatch.setattr(callMaudText, 'ThreadPoolExecutor', Executor)
+    monkeypatch.setattr(callMaudText, 'run_MAUD', failing_run)
+    files = [ins('run0/a.ins'), ins('run1/a.ins'), ins('run2/a.ins'), ins('run3/a.ins')]
+    with pytest.raises(OSError, match='no MAUD'):
+        callMaudText.map_runs(arguments(maud_path, 1), files)
+    assert len(pools) == 1 and pools[0]._shutdown
+    # the run the free thread took next may still finish, the later runs are dropped
+    assert ran(files[0]) and not ran(files[1]) and not ran(files[3])
+    assert callMaudText.last_schedule.seconds[3] is None
+
+
+def test_amap_runs_failure_kills_runs(maud_path, ins, monkeypatch):
+    arun_MAUD = callMaudText.arun_MAUD
+
+    async def failing_run(maud_path, java_opt, simple_call, timeout, ins_paths):
+        if 'run1' in ins_paths:
+            await asyncio.sleep(0.5)
+            raise OSError('no MAUD')
+        return await arun_MAUD(maud_path, java_opt, simple_call, timeout, ins_paths)
+
+    monkeypatch.setattr(callMaudText, 'arun_MAUD', failing_run)
+    files = [ins('run0/a.ins', 'sleep 2'), ins('run1/a.ins'), ins('run2/a.ins')]
+    with pytest.raises(OSError, match='no MAUD'):
+        asyncio.run(callMaudText.amap_runs(arguments(maud_path, 2), files))
+    # the running MAUD is killed, the waiting run is cancelled before MAUD starts
+    assert [ran(fname) for fname in files] == [False, False, False]
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:31:27 2026
+
+MaudWorker, MaudWorkerPool and the worker backend of callMaudText, run against standInMaud.py
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+from MILK.MAUDText import callMaudText, maudWorker
+
+STAND_IN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'standInMaud.py')
+COMMAND = [sys.executable, STAND_IN, '--worker']
+
+
+def pid_of(ins_path):
+    # pid written by the stand-in run
+    with open(ins_path[:-4]+'.out') as f:
+        return int(f.read())
+
+
+@pytest.fixture
+def worker():
+    worker = maudWorker.MaudWorker(COMMAND, start_timeout=60)
+    yield worker
+    worker.stop(kill=True)
+
+
+@pytest.fixture(autouse=True)
+def no_pools():
+    yield
+    maudWorker.close_pools()
+
+
+def test_run(worker, ins):
+    first, second = ins('a.ins'), ins('b.ins')
+    assert worker.run(first) == 0
+    assert worker.run(second) == 0
+    # both runs in the same process, the output in the log and err files
+    assert pid_of(first) == pid_of(second) == worker.process.pid
+    assert worker.runs == 2
+    with open(first[:-4]+'.log') as f:
+        assert 'Refinement finished' in f.read()
+    with open(first[:-4]+'.err') as f:
+        assert 'stand-in' in f.read()
+
+
+def test_simple_call_discards_output(worker, ins):
+    fname = ins('a.ins')
+    assert worker.run(fname, simple_call=True) == 0
+    assert not os.path.exists(fname[:-4]+'.log')
+
+
+def test_failed_run_keeps_worker(worker, ins):
+    assert worker.run(ins('a.ins', 'fail')) == 1
+    pid = worker.process.pid
+    fname = ins('b.ins')
+    assert worker.run(fname) == 0
+    assert pid_of(fname) == pid
+
+
+def test_timeout_kills_and_restarts(worker, ins, capsys):
+    assert worker.run(ins('a.ins'), timeout=30) == 0
+    process = worker.process
+    assert worker.run(ins('slow.ins', 'sleep 30'), timeout=0.5) == 1
+    assert 'exceeded timeout' in capsys.readouterr().out
+    assert process.poll() is not None
+    fname = ins('b.ins')
+    assert worker.run(fname, timeout=30) == 0
+    assert pid_of(fname) != process.pid
+
+
+@pytest.mark.parametrize('code, exit_code', [(0, 0), (3, 1)])
+def test_exit_during_run(worker, ins, code, exit_code):
+    # MaudText ending the JVM ends the run, the next run starts a new worker
+    assert worker.run(ins('a.ins', f'exit {code}')) == exit_code
+    assert not worker.alive()
+    fname = ins('b.ins')
+    assert worker.run(fname) == 0
+    assert pid_of(fname) == worker.process.pid
+
+
+def test_start_failure():
+    worker = maudWorker.MaudWorker([sys.executable, '-c', 'print("no MaudText")'], start_timeout=60)
+    with pytest.raises(RuntimeError, match='no MaudText'):
+        worker.start()
+
+
+def test_pool(ins):
+    files = [ins(f'run{i}/a.ins', 'sleep 0.2') for i in range(6)]
+    out = [None]*len(files)
+    with maudWorker.MaudWorkerPool(COMMAND, 2, start_timeout=60) as pool:
+        def run(i):
+            out[i] = pool.run(files[i])
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(files))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert out == [0]*len(files)
+        assert len({pid_of(fname) for fname in files}) <= 2
+        assert sum(worker.runs for worker in pool.workers) == len(files)
+
+
+def test_pool_start_failure(ins):
+    pool = maudWorker.MaudWorkerPool([sys.executable, '-c', 'pass'], 1, start_timeout=60)
+    with pytest.raises(RuntimeError):
+        pool.run(ins('a.ins'))
+    # later runs fail at once
+    with pytest.raises(RuntimeError, match='failed to start'):
+        pool.run(ins('b.ins'))
+    pool.close()
+
+
+def test_get_pool_reuses_workers(ins):
+    pool = maudWorker.get_pool(COMMAND, 1)
+    assert maudWorker.get_pool(COMMAND, 2) is pool
+    assert len(pool.workers) == 2
+    maudWorker.close_pools()
+    assert maudWorker.get_pool(COMMAND, 1) is not pool
+
+
+def test_worker_command(maud_path, monkeypatch):
+    java = callMaudText.java_command(maud_path, None)
+    command = maudWorker.worker_command(java)
+    assert command[:len(java)] == java
+    assert command[-3:] == ['--source', '17', maudWorker.WORKER_SOURCE]
+    monkeypatch.setenv('STAND_IN_JAVA', '1.8.0_312')
+    maudWorker.java_version.cache_clear()
+    with pytest.raises(RuntimeError, match='java 11'):
+        maudWorker.worker_command(java)
+    maudWorker.java_version.cache_clear()
+
+
+def test_run_MAUD_worker(maud_path, ins, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(ins('a.ins')))
+    files = [ins('a.ins'), ins('b.ins')]
+    out = [callMaudText.run_MAUD_worker(maud_path, None, 'False', 60, 1, fname) for fname in files]
+    assert out == [0, 0]
+    # one worker process ran both files
+    assert pid_of(files[0]) == pid_of(files[1])
+
+
+def test_run_MAUD_worker_falls_back(maud_path, ins, monkeypatch, capsys):
+    # java 8 can not run the worker, MAUD is started for the run instead
+    monkeypatch.setenv('STAND_IN_JAVA', '1.8.0_312')
+    maudWorker.java_version.cache_clear()
+    try:
+        files = [ins('a.ins'), ins('b.ins', 'fail')]
+        out = [callMaudText.run_MAUD_worker(maud_path, None, 'False', 60, 1, fname) for fname in files]
+    finally:
+        maudWorker.java_version.cache_clear()
+    assert 'MAUD worker unavailable' in capsys.readouterr().out
+    assert out == [0, 0]
+    with open(files[0][:-4]+'.log') as f:
+        assert 'Refinement finished' in f.read()
+
+
+def test_run_MAUD(maud_path, ins):
+    fname = ins('a.ins')
+    assert callMaudText.run_MAUD(maud_path, None, 'False', 60, fname) == 0
+    assert callMaudText.run_MAUD(maud_path, None, 'False', 0.5, ins('slow.ins', 'sleep 3')) == 1
+    with open(fname[:-4]+'.log') as f:
+        assert 'Refinement finished' in f.read()
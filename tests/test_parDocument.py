@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:40:09 2026
+
+ParDocument against the line scans of parameterEditor it replaces
+"""
+
+import os
+import pickle
+import random
+
+import pytest
+
+from MILK.interface import parameterEditor, parDocument
+from MILK.interface.parDocument import ParDocument, Parameter
+
+TEXT = """_pd_proc_ls_theoretical_weight 0
+_riet_par_spec_displac_x 0.5(0.01) #min -1.0 #max 1.0 #ref1
+
+#subordinateObject_alpha
+_pd_phase_name 'alpha'
+_cell_length_a 2.87(0.001) #min 2.0 #max 3.0 #autotrace
+
+loop_
+_riet_par_background_pol
+ 1.0(0.1) #min -10000.0 #max 10000.0
+ 2.0 #min -10000.0 #max 10000.0
+ 3.0 #min -10000.0 #max 10000.0 #equalTo 0 + 1 * #ref1
+
+#subordinateObject_Fe
+_atom_site_label Fe
+_atom_site_B_iso_or_equiv 0.4
+#end_subordinateObject_Fe
+
+#end_subordinateObject_alpha
+
+#subordinateObject_beta
+_pd_phase_name 'beta'
+_cell_length_a 3.61 #min 3.0 #max 4.0
+#end_subordinateObject_beta
+"""
+
+
+@pytest.fixture
+def doc():
+    return ParDocument(TEXT.splitlines(keepends=True))
+
+
+def line_of(doc, text):
+    return [i for i, line in enumerate(doc.lines) if line.startswith(text)][0]
+
+
+def fecu_keys(fname):
+    with open(fname) as f:
+        return sorted({line.split(None, 1)[0] for line in f if line.startswith('_')})
+
+
+def test_objects(doc):
+    assert [(obj.name, obj.start, obj.end) for obj in doc.objects()] == \
+        [('alpha', 3, 18), ('Fe', 13, 16), ('beta', 20, 23)]
+    alpha, fe, beta = doc.objects()
+    assert fe.parent is alpha and alpha.children == [fe]
+    assert doc.path(0) == ''
+    assert doc.path(line_of(doc, '_atom_site_label')) == '_alpha\n_Fe\n'
+    assert doc.chain(line_of(doc, '_atom_site_label')) == (alpha, fe)
+    # the end marker belongs to the enclosing object
+    assert doc.path(16) == '_alpha\n'
+    assert doc.object_type(beta) == '_pd_phase_name'
+
+
+def test_loops(doc):
+    loop, = doc.loops()
+    assert (loop.header, loop.row_start, loop.row_end, loop.nrows) == (8, 9, 12, 3)
+    assert loop.keys == ['_riet_par_background_pol'] and not loop.odf
+    assert doc.loop_at(8) is loop and doc.loop_at(9) is None
+    assert doc.loop_of(11) is loop and doc.loop_of(12) is None
+
+
+def test_flags(doc):
+    assert doc.refined_lines() == [1, 5, 9]
+    assert doc.tracked_lines() == [5]
+
+
+def test_search(doc):
+    assert doc.find('_cell_length_a') == [5, 22]
+    index, sobj, isloop, indloop, endloop = doc.search('_riet_par_background_pol')
+    assert index == [9, 10, 11] and isloop == [True]*3
+    assert indloop == [0, 1, 2] and endloop == [False, False, True]
+    assert doc.search('_riet_par_background_pol', reverse=True)[0] == [11, 10, 9]
+    assert doc.search('_cell_length_a', max_hit=1)[0] == [5]
+    # anything but a key is a scan of the lines
+    assert doc.find("'beta'") == [21]
+
+
+def test_scope(doc):
+    index = doc.find('_cell_length_a')
+    assert doc.scope(index, ['alpha']) == [0]
+    assert doc.scope(index, nsobj=['alpha']) == [1]
+    assert doc.scope(index, ['First']) == [0]
+    assert doc.scope(index, nsobj=['First']) == [1]
+    b_iso = doc.find('_atom_site_B_iso_or_equiv')
+    assert doc.scope(b_iso, ['phase:alpha/site:Fe']) == [0]
+    assert doc.scope(b_iso, ['phase:beta/**']) == []
+    with pytest.raises(NameError):
+        doc.select('crystal:alpha')
+
+
+def test_serialize(doc, tmp_path):
+    fname = str(tmp_path / 'a.par')
+    parameterEditor.write_par(TEXT.splitlines(keepends=True), fname)
+    with open(fname) as f:
+        assert doc.serialize() == f.read()
+
+
+def test_search_like_search_list(fecu_par):
+    # every key of a real file, found as parameterEditor.search_list finds it
+    lines = parameterEditor.read_par(fecu_par)
+    doc = ParDocument.from_file(fecu_par)
+    d = parameterEditor.template_dict()
+    for key in fecu_keys(fecu_par):
+        found = doc.search(key)
+        try:
+            index, sobj, isloop, indloop, endloop = parameterEditor.search_list(lines, key, d)
+        except IndexError:
+            # search_list fails on a loop without rows
+            assert found[0] == [], key
+            continue
+        assert found[0] == index and found[2:] == [isloop, indloop, endloop], key
+        assert found[1] == [''.join(path) for path in sobj], key
+
+
+def test_preserve(tmp_path):
+    fname = tmp_path / 'a.par'
+    fname.write_bytes(b'_a 1  \r\n_b 2\r\n')
+    doc = ParDocument.from_file(str(fname), preserve=True)
+    doc[1] = '_b 3\r\n'
+    doc.write(str(tmp_path / 'b.par'))
+    assert (tmp_path / 'b.par').read_bytes() == b'_a 1  \r\n_b 3\r\n'
+
+
+def same_index(doc):
+    # the incrementally maintained indices match a parse of the lines
+    new = ParDocument(list(doc.lines))
+    assert sorted(doc.keys()) == sorted(new.keys())
+    for key in new.keys():
+        assert doc.find(key) == new.find(key), key
+    assert [(lp.header, lp.row_start, lp.row_end) for lp in doc.loops()] == \
+        [(lp.header, lp.row_start, lp.row_end) for lp in new.loops()]
+    assert [(obj.name, obj.start, obj.end) for obj in doc.objects()] == \
+        [(obj.name, obj.start, obj.end) for obj in new.objects()]
+    assert [doc.path(i) for i in range(len(doc))] == [new.path(i) for i in range(len(new))]
+    assert doc.refined_lines() == new.refined_lines()
+    assert doc.tracked_lines() == new.tracked_lines()
+
+
+def test_index_edits(doc):
+    doc.insert(0, '_riet_new_key 1.0(0.0) #min 0.0 #max 2.0\n')
+    same_index(doc)
+    doc.insert(line_of(doc, '#end_subordinateObject_Fe'), '_atom_site_occupancy 1.0 #autotrace\n')
+    same_index(doc)
+    del doc[line_of(doc, "_pd_phase_name 'beta'")]
+    same_index(doc)
+    i = line_of(doc, '#subordinateObject_beta')
+    doc[i:i] = ['#subordinateObject_gamma\n', '_pd_phase_name gamma\n', '#end_subordinateObject_gamma\n']
+    same_index(doc)
+    doc[line_of(doc, '_cell_length_a')] = '_cell_length_b 2.87\n'
+    same_index(doc)
+    assert doc.pop(0).startswith('_riet_new_key')
+    same_index(doc)
+
+
+def test_index_loop_edits(doc):
+    # rows added in and below a loop, the blank line ending it removed and put back
+    doc.insert(line_of(doc, ' 3.0'), ' 2.5 #min -10000.0 #max 10000.0\n')
+    same_index(doc)
+    i = line_of(doc, '#subordinateObject_Fe') - 1
+    del doc[i]
+    same_index(doc)
+    doc.insert(i, '\n')
+    same_index(doc)
+    del doc[line_of(doc, 'loop_'):line_of(doc, '#subordinateObject_Fe')]
+    same_index(doc)
+
+
+def test_index_random_edits(fecu_par):
+    rng = random.Random(4)
+    doc = ParDocument.from_file(fecu_par)
+    pool = list(doc.lines)
+    for step in range(300):
+        i = rng.randrange(len(doc))
+        op = rng.random()
+        if op < 0.4:
+            doc.insert(i, rng.choice(pool))
+        elif op < 0.7:
+            del doc[i:i + rng.randrange(1, 4)]
+        else:
+            doc[i] = rng.choice(pool)
+        if step % 25 == 0:
+            same_index(doc)
+    same_index(doc)
+
+
+def rows(doc, loop):
+    return [line.split()[0] for line in doc.lines[loop.row_start:loop.row_end]]
+
+
+def test_loop_rows(doc):
+    loop, = doc.loops()
+    assert doc.append_rows(loop, ['4.0\n', '5.0\n']) == 2
+    assert rows(doc, loop) == ['1.0(0.1)', '2.0', '3.0', '4.0', '5.0']
+    same_index(doc)
+    assert doc.remove_rows(loop, 3) == 3
+    assert rows(doc, loop) == ['1.0(0.1)', '2.0']
+    assert doc.resize_loop(loop, 4) == 2
+    assert loop.nrows == 4 and doc.lines[loop.row_end - 1] == '0 #min -10000.0 #max 10000.0'
+    assert doc.resize_loop(loop, 1) == -3
+    # at most all rows are removed, the loop stays in the document
+    assert doc.remove_rows(loop, 5) == 1
+    assert loop.nrows == 0 and doc.loops() == [loop]
+    same_index(doc)
+    assert doc.append_rows(loop, ['6.0\n']) == 1
+    assert doc.search('_riet_par_background_pol')[0] == [loop.row_start]
+    same_index(doc)
+
+
+def loop_rows(fname, key):
+    doc = ParDocument.from_file(fname)
+    return [rows(doc, doc.loop_at(i)) for i in doc.find(key)]
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+def test_loop_row_tasks(fecu_par, tmp_path, reverse):
+    # rows are added and removed at the end of the loop, also with reverse_search
+    key = '_riet_par_background_pol'
+    before, = loop_rows(fecu_par, key)
+    out = str(tmp_path / 'out.par')
+
+    def run(task, value=None):
+        args = parameterEditor.task_arguments(task, key, ifiles=[fecu_par], ofiles=[out], value=value,
+                                              reverse_search=reverse, max_search_hits=1)
+        parameterEditor.edit(args)
+        return loop_rows(out, key)[0]
+
+    assert run('add_par', '2') == before + ['0', '0']
+    assert run('rem_par') == before[:-1]
+    assert run('rem_par', '2') == before[:-2]
+    assert run('resize_par', '2') == before[:2]
+
+
+def test_parameter():
+    par = Parameter('_cell_length_a 2.87(0.001) #min 2.0 #max 3.0 #autotrace #ref3')
+    assert (par.value, par.error, par.min, par.max) == ('2.87', '0.001', '2.0', '3.0')
+    assert par.refined and par.autotrace and par.ref == '#ref3' and par.refers_to is None
+    assert par.fix() and par.line() == '_cell_length_a 2.87 #min 2.0 #max 3.0 #autotrace #ref3'
+    row = Parameter(' 1.0 #min -1 #max 1', 0)
+    assert row.free() and row.line() == '1.0(0.0) #min -1 #max 1'
+    # only numbers carry an error, quoted values are left as they are
+    name = Parameter("_pd_phase_name 'Fe(1)'")
+    assert (name.value, name.error) == ("'Fe(1)'", None)
+    assert not name.fix() and name.line() == "_pd_phase_name 'Fe(1)'"
+    assert parDocument.parameter_value("_pd_phase_name 'Fe(1)'") == ("'Fe(1)'", None)
+
+
+def test_fix_quoted_value():
+    doc = ParDocument(["_pd_phase_name 'Fe(1)'\n", '_cell_length_a 2.87(0.001) #min 2.0 #max 3.0\n'])
+    for key in ('_pd_phase_name', '_cell_length_a'):
+        args = parameterEditor.task_arguments('fix_par', key, ifiles=['a.par'])
+        parameterEditor.edit(args, doc, do_write=False)
+    assert doc.lines == ["_pd_phase_name 'Fe(1)'\n", '_cell_length_a 2.87 #min 2.0 #max 3.0']
+
+
+def test_parameter_equal():
+    # tokens in the order MAUD writes them: #equalTo addition + multiple * ref
+    par = Parameter('_a 1.0 #min 0 #max 2')
+    par.equal('0.5', '2', '#ref3')
+    assert par.line() == '_a 1.0 #min 0 #max 2 #equalTo 0.5 + 2 * #ref3'
+    par = Parameter(par.line())
+    assert par.refers_to == '#ref3' and par.ref is None
+    par.equal('1', '3', '#ref4')
+    assert par.line() == '_a 1.0 #min 0 #max 2 #equalTo 1 + 3 * #ref4'
+    assert par.unequal() and par.line() == '_a 1.0 #min 0 #max 2'
+
+
+def test_ref_graph(doc):
+    shift = line_of(doc, '_riet_par_spec_displac_x')
+    row = line_of(doc, ' 3.0')
+    assert doc.ref_id(shift) == '#ref1' and doc.ref_target('#ref1') == shift
+    assert doc.ref_users('#ref1') == [row] and doc.referrers(shift) == [row]
+    assert doc.referent(row) == shift and doc.referent(shift) is None
+    assert doc.new_ref_id() == '#ref2'
+    # edits drop the graph
+    doc.insert(0, '_riet_new 1.0 #ref7\n')
+    assert doc.ref_target('#ref1') == shift + 1 and doc.new_ref_id() == '#ref8'
+
+
+def ref_task(doc, task, key, value=None, sobj=None):
+    args = parameterEditor.task_arguments(task, key, ifiles=['a.par'], value=value, sobj=sobj)
+    parameterEditor.edit(args, doc, do_write=False)
+
+
+def test_ref_tasks(doc):
+    ref_task(doc, 'ref_par', ['_cell_length_a', '_cell_length_a'], '0.5 2', [['beta'], ['alpha']])
+    alpha, beta = doc.find('_cell_length_a')
+    assert doc.lines[alpha].endswith('#autotrace #ref2')
+    assert doc.lines[beta].endswith('#equalTo 0.5 + 2 * #ref2')
+    assert doc.referent(beta) == alpha
+    # a target keeps its reference id
+    ref_task(doc, 'ref_par', ['_atom_site_B_iso_or_equiv', '_cell_length_a'], '0 1', [None, ['alpha']])
+    assert doc.referrers(alpha) == [doc.find('_atom_site_B_iso_or_equiv')[0], beta]
+    ref_task(doc, 'un_ref_par', '_cell_length_a', sobj=['beta'])
+    assert doc.lines[alpha].endswith('#ref2')
+    # the last bound parameter released, the target loses its id
+    ref_task(doc, 'un_ref_par', '_atom_site_B_iso_or_equiv')
+    assert doc.ref_id(alpha) is None and doc.lines[alpha].endswith('#autotrace')
+
+
+@pytest.fixture
+def cache():
+    # restores ParDocument.from_file without a cache
+    yield parDocument.use_cache
+    parDocument.use_cache(0)
+
+
+def touch(fname):
+    stat = os.stat(fname)
+    os.utime(fname, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_cache(fecu_par, cache):
+    pc = cache(4)
+    doc = ParDocument.from_file(fecu_par)
+    doc[0] = '_edited 1\n'
+    again = ParDocument.from_file(fecu_par)
+    assert (pc.hits, pc.misses) == (1, 1)
+    # copies are independent of each other and of the cached document
+    assert again[0] != '_edited 1\n' and again.find('_edited') == []
+    # same contents with a new modification time
+    touch(fecu_par)
+    ParDocument.from_file(fecu_par)
+    assert (pc.hits, pc.misses) == (2, 1)
+    with open(fecu_par, 'a') as f:
+        f.write('_pd_new_key 1\n')
+    assert ParDocument.from_file(fecu_par).find('_pd_new_key') == [len(again)]
+    assert (pc.hits, pc.misses) == (2, 2)
+    assert cache(0) is None and ParDocument.cache is None
+
+
+def test_cache_directory(fecu_par, tmp_path, cache):
+    directory = str(tmp_path / 'cache')
+    cache(4, directory)
+    first = ParDocument.from_file(fecu_par, lazy=True)
+    # another process, same directory
+    pc = cache(4, directory)
+    doc = ParDocument.from_file(fecu_par, lazy=True)
+    assert (pc.hits, pc.misses) == (1, 0)
+    assert doc.keys() == first.keys() and doc.loops()[0].row_end == first.loops()[0].row_end
+    out = str(tmp_path / 'out.par')
+    doc.write(out)
+    first.write(str(tmp_path / 'first.par'))
+    with open(out) as f, open(tmp_path / 'first.par') as g:
+        assert f.read() == g.read()
+
+
+def test_bulk_data_in_place(fecu_par, tmp_path):
+    # the lazy Fhkl block is read from the file while the file is replaced by the write
+    with open(fecu_par) as f:
+        eager = f.readlines()
+    doc = ParDocument.from_file(fecu_par, lazy=True)
+    assert any(isinstance(line, parDocument.BulkData) for line in doc.lines)
+    for _ in range(2):
+        doc[0] = '_edited 1\n'
+        doc.write(fecu_par)
+    expected = ParDocument(['_edited 1\n'] + eager[1:])
+    with open(fecu_par) as f:
+        assert f.read() == expected.serialize()
+    copy = pickle.loads(pickle.dumps(doc))
+    copy.write(str(tmp_path / 'copy.par'))
+    with open(tmp_path / 'copy.par') as f:
+        assert f.read() == expected.serialize()
+
+
+def par_files(directory):
+    return sorted(name for name in os.listdir(directory) if 'par' in name)
+
+
+def test_write_skip_unchanged(tmp_path):
+    fname = str(tmp_path / 'a.par')
+    lines = ['_a 1\n', '_b 2\n']
+    assert parDocument.write_lines(lines, fname, skip_unchanged=True)
+    os.utime(fname, ns=(10**18, 10**18))
+    inode = os.stat(fname).st_ino
+    assert not parDocument.write_lines(lines, fname, skip_unchanged=True)
+    assert os.stat(fname).st_mtime_ns == 10**18 and os.stat(fname).st_ino == inode
+    # a changed line or a longer file is written
+    assert parDocument.write_lines(['_a 1\n', '_b 3\n'], fname, skip_unchanged=True)
+    assert parDocument.write_lines(['_a 1\n', '_b 3\n', '_c 4\n'], fname, skip_unchanged=True)
+    assert not parDocument.write_lines(['_a 1', '  _b 3  ', '_c 4\n'], fname, skip_unchanged=True)
+    assert os.stat(fname).st_mtime_ns != 10**18
+    assert par_files(tmp_path) == ['a.par']
+
+
+def test_edit_without_hits_not_rewritten(fecu_par):
+    # fix_par of a fixed parameter leaves the file alone
+    parameterEditor.edit(parameterEditor.task_arguments('fix_par', '_cell_length_a', ifiles=[fecu_par]))
+    os.utime(fecu_par, ns=(10**18, 10**18))
+    with open(fecu_par) as f:
+        before = f.read()
+    parameterEditor.edit(parameterEditor.task_arguments('fix_par', '_cell_length_a', ifiles=[fecu_par]))
+    assert os.stat(fecu_par).st_mtime_ns == 10**18
+    with open(fecu_par) as f:
+        assert f.read() == before
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='POSIX file modes')
+def test_write_file_mode(tmp_path):
+    fname = str(tmp_path / 'a.par')
+    umask = os.umask(0o027)
+    try:
+        parDocument.write_lines(['_a 1\n'], fname)
+    finally:
+        os.umask(umask)
+    # a new file gets the mode open would give it, an existing file keeps its mode
+    assert os.stat(fname).st_mode & 0o777 == 0o640
+    os.chmod(fname, 0o600)
+    parDocument.write_lines(['_a 2\n'], fname)
+    assert os.stat(fname).st_mode & 0o777 == 0o600
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='symbolic links')
+def test_write_through_link(tmp_path):
+    fname = str(tmp_path / 'a.par')
+    parDocument.write_lines(['_a 1\n'], fname)
+    os.symlink(fname, tmp_path / 'link.par')
+    parDocument.write_lines(['_a 2\n'], str(tmp_path / 'link.par'))
+    assert os.path.islink(tmp_path / 'link.par')
+    with open(fname) as f:
+        assert f.read() == '_a 2\n'
+
+
+def test_write_failure_leaves_no_temp_file(tmp_path):
+    fname = str(tmp_path / 'a.par')
+    parDocument.write_lines(['_a 1\n'], fname)
+    # the second line can not be written
+    with pytest.raises(AttributeError):
+        parDocument.write_lines(['_a 2\n', None], fname)
+    assert par_files(tmp_path) == ['a.par']
+    with open(fname) as f:
+        assert f.read() == '_a 1\n'
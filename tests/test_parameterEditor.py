@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:40 2026
+
+editor tasks over the parameter files of several runs, serially and with edit_parallel
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pytest
+
+from MILK.interface import parameterEditor
+from MILK.interface.parDocument import ParDocument
+
+WILD = [0, 1, 2, 3]
+
+
+@pytest.fixture
+def runs(tmp_path, fecu_par):
+    '''
+    work_dir with run000 to run003 holding a.par, _cell_length_a of run i is 2.i
+    '''
+    with open(fecu_par) as f:
+        text = f.read()
+    for i in WILD:
+        os.makedirs(tmp_path / f'run{i:03d}')
+        with open(tmp_path / f'run{i:03d}' / 'a.par', 'w') as f:
+            f.write(text.replace('_cell_length_a 2.8665', f'_cell_length_a 2.{i}', 1))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def editor(runs):
+    '''
+    editor of a.par in the runs, written back in place
+    '''
+    e = parameterEditor.editor()
+    e.work_dir, e.run_dirs, e.wild, e.wild_range = runs, 'run(wild)', WILD, [[]]
+    e.ifile = e.ofile = 'a.par'
+    return e
+
+
+def arguments(runs, task, key, **kwargs):
+    return parameterEditor.task_arguments(task, key, 'a.par', work_dir=runs, run_dir='run(wild)',
+                                          wild=WILD, **kwargs)
+
+
+def run_files(runs, name):
+    out = []
+    for i in WILD:
+        with open(os.path.join(runs, f'run{i:03d}', name)) as f:
+            out.append(f.read())
+    return out
+
+
+def cell_length(i):
+    return ['2.'+str(i), '3.6242']
+
+
+@pytest.mark.parametrize('nworkers, pool_type', [(1, 'thread'), (3, 'thread'), (3, 'process')])
+def test_pools_write_like_serial(runs, nworkers, pool_type):
+    serial = arguments(runs, 'free_par', '_cell_length_a', ofile='serial.par')
+    parameterEditor.edit(serial)
+    args = arguments(runs, 'free_par', '_cell_length_a', ofile='out.par', nworkers=nworkers, pool_type=pool_type)
+    assert parameterEditor.edit(args) is None
+    assert run_files(runs, 'out.par') == run_files(runs, 'serial.par')
+    assert all('_cell_length_a 2.' in text and '(0.0)' in text for text in run_files(runs, 'out.par'))
+
+
+@pytest.mark.parametrize('nworkers', [1, 3])
+def test_get_first_or_all_runs(runs, nworkers):
+    # the return value depends on all_runs, not on nworkers
+    args = arguments(runs, 'get_val', '_cell_length_a', nworkers=nworkers)
+    assert parameterEditor.edit(args) == cell_length(0)
+    assert asyncio.run(parameterEditor.aedit(args)) == cell_length(0)
+    args = arguments(runs, 'get_val', '_cell_length_a', nworkers=nworkers, all_runs=True)
+    assert parameterEditor.edit(args) == [cell_length(i) for i in WILD]
+    assert asyncio.run(parameterEditor.aedit(args)) == [cell_length(i) for i in WILD]
+
+
+def test_get_single_file(runs):
+    args = parameterEditor.task_arguments('get_val', '_cell_length_a', 'run002/a.par', work_dir=runs, nworkers=3)
+    assert parameterEditor.edit(args) == cell_length(2)
+
+
+@pytest.mark.parametrize('nworkers', [1, 2])
+def test_editor_all_runs(editor, nworkers):
+    e = editor
+    e.nworkers = nworkers
+    e.get_val('_cell_length_a')
+    assert e.value == cell_length(0)
+    e.get_val('_cell_length_a', all_runs=True)
+    assert e.value == [cell_length(i) for i in WILD]
+    e.get_phases()
+    assert e.value == [['Iron - alpha', 'Copper']]*len(WILD)
+    with e.transaction():
+        e.get_val('_cell_length_a')
+    assert e.value == [cell_length(i) for i in WILD]
+
+
+def test_main_all_runs(runs):
+    argsin = f'--task get_val --key _cell_length_a --ifile a.par --work_dir {runs} --run_dir run(wild) ' \
+             '--wild 3 1 --nworkers 2 --all_runs'
+    assert parameterEditor.main(argsin) == [cell_length(1), cell_length(3)]
+
+
+def test_parallel_values_in_wild_order(runs, monkeypatch):
+    # the first runs finish last
+    edit_file = parameterEditor.edit_file
+
+    def slow_edit_file(args, ifile, ofile, *rest):
+        time.sleep(0.05*(len(WILD) - args.ifile.index(ifile)))
+        return edit_file(args, ifile, ofile, *rest)
+    monkeypatch.setattr(parameterEditor, 'edit_file', slow_edit_file)
+    args = arguments(runs, 'get_val', '_cell_length_a', nworkers=len(WILD))
+    assert parameterEditor.edit_parallel(args) == [cell_length(i) for i in WILD]
+
+
+def test_map_files_order():
+    delays = [0.2, 0.1, 0.0, 0.15]
+    values = parameterEditor.map_files(_sleep, [(d,) for d in delays], ['a', 'b', 'c', 'd'], nworkers=4)
+    assert values == delays
+
+
+def test_map_files_collects_errors(runs):
+    shutil.rmtree(os.path.join(runs, 'run001'))
+    os.remove(os.path.join(runs, 'run003', 'a.par'))
+    args = arguments(runs, 'free_par', '_cell_length_a', nworkers=2)
+    with pytest.raises(RuntimeError) as error:
+        parameterEditor.edit(args)
+    message = str(error.value)
+    assert 'free_par failed for 2 of 4 parameter files' in message
+    assert os.path.join('run001', 'a.par') in message and os.path.join('run003', 'a.par') in message
+    # the other files are edited
+    with open(os.path.join(runs, 'run002', 'a.par')) as f:
+        assert '_cell_length_a 2.2(0.0)' in f.read()
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def file_io(monkeypatch):
+    '''
+    parameter files read and written, by path
+    '''
+    io = {'read': [], 'written': []}
+    read, write = ParDocument._read.__func__, ParDocument.write
+
+    def counted_read(cls, fname, *args, **kwargs):
+        io['read'].append(fname)
+        return read(cls, fname, *args, **kwargs)
+
+    def counted_write(self, ofile, *args, **kwargs):
+        io['written'].append(ofile)
+        return write(self, ofile, *args, **kwargs)
+    monkeypatch.setattr(ParDocument, '_read', classmethod(counted_read))
+    monkeypatch.setattr(ParDocument, 'write', counted_write)
+    return io
+
+
+def test_transaction_reads_and_writes_once(runs, editor, file_io):
+    serial = run_files(runs, 'a.par')
+    with editor.transaction() as t:
+        editor.free('_cell_length_a')
+        editor.set_val('_atom_site_B_iso_or_equiv', '0.5')
+        editor.track('_cell_length_a')
+        editor.fix('_cell_length_a', sobj='Copper')
+        assert file_io['written'] == []
+    files = [os.path.join(runs, f'run{i:03d}', 'a.par') for i in WILD]
+    assert sorted(file_io['read']) == sorted(files)
+    assert sorted(file_io['written']) == sorted(files)
+    for before, after in zip(serial, run_files(runs, 'a.par')):
+        assert after != before
+        assert '_cell_length_a 2.' in after and '#autotrace' in after
+        assert '_cell_length_a 3.6242 #autotrace' in after
+        assert after.count('_atom_site_B_iso_or_equiv 0.5 ') == 2
+    assert [(op['task'], op['key']) for op in t.report] == \
+        [('free_par', '_cell_length_a'), ('set_par', '_atom_site_B_iso_or_equiv'),
+         ('track_par', '_cell_length_a'), ('fix_par', '_cell_length_a')]
+    assert [op['hits'] for op in t.report] == [dict.fromkeys(files, n) for n in (2, 2, 2, 1)]
+
+
+def test_transaction_same_as_serial(runs, editor):
+    before = run_files(runs, 'a.par')
+    editor.ofile = 'serial.par'
+    editor.free('_cell_length_a')
+    editor.ifile = 'serial.par'
+    editor.set_val('_atom_site_B_iso_or_equiv', '0.5')
+    editor.ifile, editor.ofile = 'a.par', 'batch.par'
+    with editor.transaction():
+        editor.free('_cell_length_a')
+        editor.set_val('_atom_site_B_iso_or_equiv', '0.5')
+    assert run_files(runs, 'batch.par') == run_files(runs, 'serial.par')
+    # the input files are left unchanged
+    assert run_files(runs, 'a.par') == before
+
+
+def test_transaction_raises(runs, editor, file_io):
+    before = run_files(runs, 'a.par')
+    with pytest.raises(KeyError):
+        with editor.transaction():
+            editor.free('_cell_length_a')
+            raise KeyError('stop')
+    assert file_io['written'] == []
+    assert run_files(runs, 'a.par') == before
+    # the editor is usable again
+    with editor.transaction():
+        editor.free('_cell_length_a')
+    assert all('(0.0)' in text for text in run_files(runs, 'a.par'))
+
+
+def test_transaction_not_nested(editor):
+    with editor.transaction():
+        with pytest.raises(AssertionError, match='nested'):
+            with editor.transaction():
+                pass
+
+
+
+def test_listener_event(runs, editor):
+    fname = os.path.join(runs, 'run002', 'a.par')
+    # lines of the document, a data block read on demand is one line
+    size, nlines = os.path.getsize(fname), len(ParDocument.from_file(fname, lazy=True).lines)
+    events = []
+    editor.wild = [2]
+    with parameterEditor.listen(events.append):
+        editor.free('_cell_length_a', sobj='Copper')
+    assert parameterEditor._listeners == []
+    assert len(events) == 1
+    event = events[0]
+    assert (event['task'], event['key'], event['ifile'], event['ofile']) == ('free_par', ['_cell_length_a'], fname, fname)
+    assert event['lines'] == nlines
+    # the alpha and copper cell length, the copper one in scope
+    assert (event['hits'], event['scoped'], event['modified']) == ([2], [1], 1)
+    assert event['bytes_read'] == size
+    assert event['bytes_written'] == os.path.getsize(fname) > 0
+    assert event['transaction'] is False and event['time_s'] >= 0
+
+
+@pytest.mark.parametrize('nworkers, pool_type', [(1, 'thread'), (2, 'thread'), (2, 'process')])
+def test_event_log(runs, editor, tmp_path, nworkers, pool_type):
+    editor.nworkers, editor.pool_type = nworkers, pool_type
+    with parameterEditor.listen(parameterEditor.EventLog(str(tmp_path / 'events.jsonl'))) as log:
+        editor.free('_cell_length_a')
+        editor.fix('_cell_length_a', sobj='Nickel')
+    assert log._file.closed
+    with open(tmp_path / 'events.jsonl') as f:
+        events = [json.loads(line) for line in f]
+    files = [os.path.join(runs, f'run{i:03d}', 'a.par') for i in WILD]
+    assert [event['task'] for event in events] == ['free_par']*len(WILD) + ['fix_par']*len(WILD)
+    assert sorted(event['ifile'] for event in events[:len(WILD)]) == files
+    assert all(event['scoped'] == [2] and event['modified'] == 2 and event['bytes_written'] > 0
+               for event in events[:len(WILD)])
+    # nothing in scope, the files are not rewritten
+    assert all(event['hits'] == [2] and event['scoped'] == [0] and event['modified'] == 0 and
+               event['bytes_read'] > 0 and event['bytes_written'] == 0 for event in events[len(WILD):])
+
+
+def test_transaction_events(runs, editor):
+    events = []
+    with parameterEditor.listen(events.append):
+        with editor.transaction():
+            editor.free('_cell_length_a', sobj='Copper')
+    assert len(events) == len(WILD)
+    assert all(event['transaction'] and event['scoped'] == [1] and event['bytes_read'] == 0
+               for event in events)
+
+
+@pytest.mark.parametrize('nworkers', [1, 2])
+def test_no_events_without_listener(runs, editor, monkeypatch, nworkers):
+    def measured(*args, **kwargs):
+        raise AssertionError('measured without listener')
+    monkeypatch.setattr(parameterEditor, 'measure_edit_file', measured)
+    monkeypatch.setattr(parameterEditor, '_event', measured)
+    monkeypatch.setattr(parameterEditor, '_notify', measured)
+    editor.nworkers = nworkers
+    editor.free('_cell_length_a')
+    with editor.transaction():
+        editor.fix('_cell_length_a')
+    assert all('(0.0)' not in text for text in run_files(runs, 'a.par'))
+
+ODF = """#subordinateObject_alpha
+_pd_phase_name 'alpha'
+#subordinateObject_E-WIMV
+#custom_object_odf
+loop_
+_rita_wimv_odf_values
+ 1.0 2.0 3.0 4.0
+ 5.0 6.0 7.0 8.0
+ 9.0 10.0
+#end_custom_object_odf
+#end_subordinateObject_E-WIMV
+#end_subordinateObject_alpha
+
+#subordinateObject_beta
+_pd_phase_name 'beta'
+#subordinateObject_E-WIMV
+#custom_object_odf
+loop_
+_rita_wimv_odf_values
+ 0.5 0.5 0.5
+ 0.5 0.5 0.5
+ 0.5 0.5 0.5 0.5
+#end_custom_object_odf
+#end_subordinateObject_E-WIMV
+#end_subordinateObject_beta
+"""
+
+
+@pytest.fixture
+def odf_par(tmp_path):
+    fname = tmp_path / 'odf.par'
+    fname.write_text(ODF)
+    return str(fname)
+
+
+def odf_task(fname, task, value=None, sobj=None, ofile=None, key='ODFValues', **kwargs):
+    args = parameterEditor.task_arguments(task, key, ifiles=[fname], ofiles=[ofile or fname], value=value,
+                                          sobj=sobj, work_dir=os.path.dirname(fname), **kwargs)
+    return parameterEditor.edit(args)
+
+
+def odf_rows(fname):
+    # values of each row of each ODF block as text
+    doc = ParDocument.from_file(fname)
+    return [[doc.lines[i].split() for i in range(loop.row_start, loop.row_end)] for loop in doc.odf_loops()]
+
+
+def test_odf_round_trip(odf_par):
+    doc = ParDocument.from_file(odf_par)
+    alpha, beta = doc.odf_loops()
+    assert alpha.odf and doc.odf_loops(sobj=['beta']) == [beta]
+    assert doc.set_odf_values(alpha, doc.odf_values(alpha)) == 3
+    assert [row.split() for row in doc.lines[alpha.row_start:alpha.row_end]] == \
+        [['1', '2', '3', '4'], ['5', '6', '7', '8'], ['9', '10']]
+    assert doc.odf_values(alpha).tolist() == [float(v) for v in range(1, 11)]
+    with pytest.raises(AssertionError):
+        doc.set_odf_values(alpha, np.ones(9))
+    assert doc.copy_odf(beta, ParDocument.from_file(odf_par), alpha) == 3
+    assert doc.odf_values(beta).tolist() == [float(v) for v in range(1, 11)]
+    assert [len(row.split()) for row in doc.lines[beta.row_start:beta.row_end]] == [3, 3, 4]
+
+
+def test_get_odf(odf_par):
+    alpha, beta = odf_task(odf_par, 'get_odf')
+    assert alpha.tolist() == [float(v) for v in range(1, 11)]
+    assert beta.tolist() == [0.5]*10
+    beta, = odf_task(odf_par, 'get_odf', sobj='beta')
+    assert beta.shape == (10,)
+
+
+def test_scale_odf(odf_par):
+    odf_task(odf_par, 'scale_odf', '2', sobj='alpha')
+    alpha, beta = odf_rows(odf_par)
+    # the number of values on every row is kept, the other phase is untouched
+    assert alpha == [['2', '4', '6', '8'], ['10', '12', '14', '16'], ['18', '20']]
+    assert beta == [['0.5']*3, ['0.5']*3, ['0.5']*4]
+    odf_task(odf_par, 'scale_odf', '0.1', sobj='alpha')
+    assert odf_task(odf_par, 'get_odf', sobj='alpha')[0] == pytest.approx([v/5 for v in range(1, 11)])
+
+
+def test_reset_odf(odf_par):
+    odf_task(odf_par, 'reset_odf')
+    alpha, beta = odf_rows(odf_par)
+    assert alpha == [['1.0']*4, ['1.0']*4, ['1.0']*2]
+    assert beta == [['1.0']*3, ['1.0']*3, ['1.0']*4]
+
+
+def test_copy_odf(odf_par, tmp_path):
+    # same file, the alpha values in the beta layout
+    odf_task(odf_par, 'copy_odf', sobj=['beta', 'alpha'], key=['ODFValues', 'ODFValues'])
+    alpha, beta = odf_rows(odf_par)
+    assert beta == [['1', '2', '3'], ['4', '5', '6'], ['7', '8', '9', '10']]
+    # another file, beta into alpha is reformatted to the alpha layout, into beta copied as text
+    source = tmp_path / 'source.par'
+    source.write_text(ODF.replace('0.5', '0.250'))
+    odf_task(odf_par, 'copy_odf', 'source.par', sobj=['alpha', 'beta'], key=['ODFValues', 'ODFValues'])
+    assert odf_rows(odf_par)[0] == [['0.25']*4, ['0.25']*4, ['0.25']*2]
+    odf_task(odf_par, 'copy_odf', 'source.par', sobj=['beta', 'beta'], key=['ODFValues', 'ODFValues'])
+    assert odf_rows(odf_par)[1] == [['0.250']*3, ['0.250']*3, ['0.250']*4]
+
+
+def test_export_odf(odf_par, tmp_path):
+    odf_task(odf_par, 'export_odf', 'odf.npz')
+    with np.load(tmp_path / 'odf.npz') as saved:
+        assert sorted(saved.files) == ['arr_0', 'arr_1']
+        assert saved['arr_0'].tolist() == [float(v) for v in range(1, 11)]
+        assert saved['arr_1'].tolist() == [0.5]*10
+    odf_task(odf_par, 'export_odf', 'beta.npy', sobj='beta')
+    assert np.load(tmp_path / 'beta.npy').tolist() == [0.5]*10
+    # a single file can not hold both blocks
+    with pytest.raises(AssertionError):
+        odf_task(odf_par, 'export_odf', 'both.npy')
+    assert odf_rows(odf_par) == [[['1.0', '2.0', '3.0', '4.0'], ['5.0', '6.0', '7.0', '8.0'], ['9.0', '10.0']],
+                                 [['0.5']*3, ['0.5']*3, ['0.5']*4]]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:46 2026
+
+run_key of resultCache, a run is only restored if none of its inputs changed
+"""
+
+import os
+import shutil
+
+from conftest import EXAMPLES
+from MILK.MAUDText import resultCache
+
+
+def rewrite(fname, text):
+    # new content with a new modification time, file_digest remembers digests by size and mtime
+    stat = os.stat(fname)
+    with open(fname, 'w') as f:
+        f.write(text)
+    os.utime(fname, ns=(stat.st_atime_ns, stat.st_mtime_ns+10**9))
+
+
+def fecu(tmp_path):
+    shutil.copy(os.path.join(EXAMPLES, 'fecu.ins'), tmp_path)
+    shutil.copy(os.path.join(EXAMPLES, 'FeCustart.par'), tmp_path)
+    for i in (1010, 1011):
+        (tmp_path / f'FECU{i}.UDF').write_text(f'{i}\n1 2\n')
+    return str(tmp_path / 'fecu.ins')
+
+
+def test_run_key_stable(tmp_path):
+    ins = fecu(tmp_path)
+    assert resultCache.run_key(ins, 'v') == resultCache.run_key(ins, 'v')
+    assert resultCache.run_key(ins, 'v') != resultCache.run_key(ins, 'w')
+    assert resultCache.run_key(str(tmp_path / 'none.ins'), 'v') is None
+
+
+def test_run_key_par(tmp_path):
+    ins = fecu(tmp_path)
+    key = resultCache.run_key(ins, 'v')
+    par = str(tmp_path / 'FeCustart.par')
+    with open(par) as f:
+        text = f.read()
+    rewrite(par, text+'\n')
+    assert resultCache.run_key(ins, 'v') != key
+
+
+def test_run_key_ins_data(tmp_path):
+    # a data file named by _riet_meas_datafile_name in the ins file
+    ins = fecu(tmp_path)
+    key = resultCache.run_key(ins, 'v')
+    rewrite(str(tmp_path / 'FECU1010.UDF'), '1010\n1 3\n')
+    changed = resultCache.run_key(ins, 'v')
+    assert changed != key
+    os.remove(tmp_path / 'FECU1011.UDF')
+    assert resultCache.run_key(ins, 'v') not in (key, changed)
+
+
+def test_run_key_relative_to_cwd(tmp_path, monkeypatch):
+    ins = fecu(tmp_path)
+    key = resultCache.run_key(ins, 'v')
+    os.mkdir(tmp_path / 'run')
+    shutil.move(ins, tmp_path / 'run')
+    monkeypatch.chdir(tmp_path)
+    assert resultCache.run_key(os.path.join('run', 'fecu.ins'), 'v') == key
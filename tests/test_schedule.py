@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:22:51 2026
+
+cost estimates, longest-expected-first order and runtime history of schedule
+"""
+
+import os
+import shutil
+
+import pytest
+
+from conftest import EXAMPLES
+from MILK.MAUDText import schedule
+
+PAR = """_pd_phase_name 'alpha'
+_pd_phase_name 'beta'
+_riet_meas_datafile_name 'a.esg'
+_riet_meas_datafile_name 'b.esg'
+_riet_meas_datafile_name 'c.esg'
+loop_
+_rita_wimv_odf_values
+ 1.0 1.0 1.0 1.0 1.0
+ 1.0 1.0 1.0 1.0 1.0
+#end_custom_object_odf
+"""
+
+
+def write_ins(path, iterations, par='a.par'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("loop_\n_riet_analysis_file\n_riet_analysis_iteration_number\n_riet_analysis_fileToSave\n\n"
+                    f" '{par}' {iterations} 'b.par'\n")
+    return str(path)
+
+
+def test_read_ins():
+    rows = schedule.read_ins(os.path.join(EXAMPLES, 'fecu.ins'))
+    assert len(rows) == 25
+    assert rows[0]['_riet_analysis_file'] == 'FeCustart.par'
+    assert rows[0]['_riet_meas_datafile_name'] == 'FECU1010.UDF'
+
+
+def test_par_metadata(tmp_path):
+    (tmp_path / 'a.par').write_text(PAR)
+    assert schedule.par_metadata(str(tmp_path / 'a.par')) == {'datafiles': 3, 'phases': 2, 'odf_cells': 10}
+
+
+def test_estimate_cost(tmp_path):
+    (tmp_path / 'a.par').write_text(PAR)
+    ins = write_ins(tmp_path / 'a.ins', 4)
+    assert schedule.estimate_cost(ins) == pytest.approx(4*3*(2 + 10/schedule.ODF_CELLS_PER_PHASE))
+    # a missing par file is one unit per iteration
+    assert schedule.estimate_cost(write_ins(tmp_path / 'b.ins', 4, 'none.par')) == 4
+    assert schedule.estimate_cost(str(tmp_path / 'none.ins')) is None
+
+
+def test_estimate_cost_fecu(tmp_path):
+    shutil.copy(os.path.join(EXAMPLES, 'fecu.ins'), tmp_path)
+    shutil.copy(os.path.join(EXAMPLES, 'FeCustart.par'), tmp_path)
+    meta = schedule.par_metadata(str(tmp_path / 'FeCustart.par'))
+    cost = schedule.estimate_cost(str(tmp_path / 'fecu.ins'))
+    assert cost == pytest.approx(25*7*max(meta['datafiles'], 1) *
+                                 (max(meta['phases'], 1) + meta['odf_cells']/schedule.ODF_CELLS_PER_PHASE))
+
+
+def test_order(tmp_path):
+    ins = [str(tmp_path / f'{i}.ins') for i in range(5)]
+    sched = schedule.Schedule(ins, 2, costs=[3, 7, 2, 5, 4])
+    assert sched.unit == 'cost'
+    assert sched.order == [1, 3, 4, 0, 2]
+    # 7 3 | 5 4 2, each run on the worker free first
+    assert [sched.worker[i] for i in sched.order] == [0, 1, 1, 0, 1]
+    assert sched.makespan == 11
+    assert sched.utilization == pytest.approx([10/11, 1.0])
+    assert sched.makespans([1, 5]) == {1: (21, 1.0), 5: (7, pytest.approx(21/35))}
+
+
+def test_unknown_cost(tmp_path):
+    # runs without a cost estimate count as the median run
+    ins = [str(tmp_path / f'{i}.ins') for i in range(3)]
+    sched = schedule.Schedule(ins, 1, costs=[2, None, 6])
+    assert sched.predicted == [2, 4, 6]
+
+
+def test_history(tmp_path):
+    (tmp_path / 'a.par').write_text(PAR)
+    ins = [write_ins(tmp_path / f'run{i}' / 'a.ins', i + 1, '../a.par') for i in range(3)]
+    assert schedule.read_history(ins[0]) is None
+    costs = [1.0, 2.0, 3.0]
+    schedule.write_history(ins[0], 0, 10.0, costs[0], 0)
+    schedule.write_history(ins[1], 0, 99.0, costs[1], 1)
+    assert schedule.read_history(ins[0]) == (10.0, 1.0)
+    assert schedule.read_history(ins[1]) is None
+    sched = schedule.Schedule(ins, 2, costs=costs)
+    # the run with a history keeps its time, the others scale with the seconds per cost unit
+    assert sched.unit == 's'
+    assert sched.predicted == [10.0, 20.0, 30.0]
+    # a new session reads the runtime file
+    schedule._runtimes.clear()
+    assert schedule.read_history(ins[0]) == (10.0, 1.0)
+    with open(os.path.join(os.path.dirname(ins[0]), schedule.HISTORY_FILE)) as f:
+        assert f.readline().strip() == ','.join(schedule.HISTORY_FIELDS)
+
+
+def test_history_rows(tmp_path):
+    ins = write_ins(tmp_path / 'a.ins', 1)
+    for step in range(schedule.HISTORY_ROWS + 5):
+        schedule.write_history(ins, step, float(step), None, 0)
+    with open(tmp_path / schedule.HISTORY_FILE) as f:
+        assert len(f.readlines()) == schedule.HISTORY_ROWS + 1
+    schedule._runtimes.clear()
+    assert schedule.read_history(ins) == (schedule.HISTORY_ROWS + 4.0, None)
+
+
+def test_run_and_save(tmp_path):
+    ins = [write_ins(tmp_path / f'run{i}' / 'a.ins', 1) for i in range(3)]
+    sched = schedule.Schedule(ins, 2, costs=[1, 2, 3])
+    for i in sched.order:
+        assert sched.run(lambda fname: fname, i) == ins[i]
+    assert all(seconds is not None for seconds in sched.seconds)
+    assert sched.measured_makespan >= 0
+    assert 'measured makespan' in sched.summary()
+    sched.save(2, [0, 1, None])
+    assert schedule.read_history(ins[0])[1] == 1
+    assert not os.path.exists(os.path.join(os.path.dirname(ins[2]), schedule.HISTORY_FILE))
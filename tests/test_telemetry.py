@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 18:02:44 2026
+
+telemetry rows of the callMaudText run functions and their step_N and csv files, run against standInMaud.py
+"""
+
+import asyncio
+import csv
+import json
+import os
+
+import pytest
+
+from MILK.MAUDText import callMaudText, telemetry
+
+
+@pytest.fixture(autouse=True)
+def no_records():
+    # rows of other tests are not collected
+    telemetry._records.clear()
+    yield
+    telemetry._records.clear()
+
+
+def row_of(fname):
+    return telemetry.collect([fname], step=0)[0]
+
+
+@pytest.mark.parametrize('simple_call', ['False', 'True'])
+def test_run_MAUD_row(maud_path, ins, simple_call):
+    fname = ins('a.ins', 'sleep 0.2')
+    assert callMaudText.run_MAUD(maud_path, None, simple_call, 60, fname) == 0
+    row = row_of(fname)
+    assert set(row) == set(telemetry.FIELDS)
+    assert row['backend'] == 'process'
+    assert row['wall_s'] >= 0.2
+    assert row['exit_status'] == 0 and row['exit_code'] == 0
+    assert row['timeout'] is False and row['restored'] is False
+    if hasattr(os, 'wait4'):
+        assert row['user_s'] is not None and row['max_rss_mb'] > 0
+    # the row is taken once
+    assert row_of(fname)['wall_s'] is None
+
+
+def test_run_MAUD_timeout_row(maud_path, ins):
+    fname = ins('slow.ins', 'sleep 3')
+    assert callMaudText.run_MAUD(maud_path, None, 'True', 0.5, fname) == 1
+    row = row_of(fname)
+    assert row['timeout'] is True and row['exit_code'] == 1
+    assert row['exit_status'] != 0
+    assert 0.5 <= row['wall_s'] < 3
+
+
+def test_arun_MAUD_row(maud_path, ins):
+    fname = ins('a.ins', 'sleep 0.2')
+    assert asyncio.run(callMaudText.arun_MAUD(maud_path, None, 'False', 60, fname)) == 0
+    row = row_of(fname)
+    assert row['backend'] == 'async'
+    assert row['wall_s'] >= 0.2
+    assert row['exit_status'] == 0 and row['timeout'] is False
+
+
+def test_main_saves_telemetry(maud_path, ins, tmp_path, monkeypatch):
+    for i in range(2):
+        ins(f'run00{i}/a.ins', 'sleep 0.2')
+        # the latest par file is archived with the step
+        (tmp_path / f'run00{i}' / 'b.par').write_text('data_global\n')
+    monkeypatch.chdir(tmp_path)
+    out = callMaudText.main(f'-a a.ins -n 0 1 -dir {tmp_path} -rd run(wild) -i 2 -mp {maud_path} -cs 1 '
+                            '-results results.txt -simple_results simple.txt')
+    assert out == [0, 0]
+    rows = callMaudText.last_telemetry
+    assert [row['run'] for row in rows] == ['run000', 'run001']
+    for i, row in enumerate(rows):
+        with open(tmp_path / f'run00{i}' / 'step_1' / telemetry.TELEMETRY_FILE) as f:
+            saved = json.load(f)
+        assert saved == row
+        assert saved['step'] == '1' and saved['wall_s'] >= 0.2 and saved['exit_status'] == 0
+        assert saved['timeout'] is False
+    with open(tmp_path / 'maud_telemetry01.csv', newline='') as f:
+        reader = csv.DictReader(f)
+        assert reader.fieldnames == telemetry.FIELDS
+        saved = list(reader)
+    assert [row['run'] for row in saved] == ['run000', 'run001']
+    assert [float(row['wall_s']) for row in saved] == pytest.approx([row['wall_s'] for row in rows])
+
+
+def test_save_without_step_dir(tmp_path):
+    # runs whose step_N folder is missing only go to the csv file
+    rows = telemetry.collect([str(tmp_path / 'a.ins')], step=3, wall_s=1.0)
+    telemetry.save(rows, str(tmp_path / 'telemetry.csv'))
+    assert not os.path.exists(tmp_path / 'step_3')
+    with open(tmp_path / 'telemetry.csv', newline='') as f:
+        assert [row['wall_s'] for row in csv.DictReader(f)] == ['1.0']
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 16:05:48 2026
+
+model template splicing of model.templates against the line insertion of the original texture.py
+"""
+
+import copy
+import os
+
+import pytest
+
+from conftest import EXAMPLES
+from MILK.interface import parameterEditor
+from MILK.interface.model import templates, texture
+
+RESOURCES = os.path.join(os.path.dirname(templates.__file__), 'resources')
+
+
+def old_set_texture(lines, key, sobj=None):
+    # search_list, sobj filter and insert_tex of the original texture.py
+    index, sobj_index = texture.search_list(lines)
+    if sobj is not None:
+        index = [index[j] for j in range(len(index)) if all(x in ''.join(sobj_index[j]) for x in sobj)]
+    with open(os.path.join(RESOURCES, templates.MODELS['texture']['keys'][key])) as f:
+        lines_model = f.readlines()
+    for i in reversed(range(0, len(index), 2)):
+        for line in reversed(lines_model):
+            lines.insert(index[i+1]+1, line)
+        for j in reversed(range(index[i], index[i+1]+1)):
+            lines.pop(j)
+    return ''.join('%s\n' % line.strip() for line in lines)
+
+
+@pytest.fixture
+def tex_par(tmp_path):
+    # FeCustart with an arbitrary tex object in both phases and one before the phases
+    with open(os.path.join(EXAMPLES, 'FeCustart.par')) as f:
+        lines = f.readlines()
+    with open(os.path.join(RESOURCES, 'arbitraryTexture.txt')) as f:
+        tex = f.read().splitlines(keepends=True)
+    tex[-1] = tex[-1].rstrip('\n')+'\n'
+    for i in (877, 480, 30):
+        lines[i:i] = tex + ['\n']
+    path = tmp_path / 'tex.par'
+    path.write_text(''.join(lines))
+    return str(path)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.fixture
+def models(monkeypatch):
+    # registered models do not leak into other tests
+    monkeypatch.setattr(templates, 'MODELS', copy.deepcopy(templates.MODELS))
+    monkeypatch.setattr(templates, '_templates', {})
+
+
+@pytest.mark.parametrize('key', ['EWIMV', 'None'])
+@pytest.mark.parametrize('sobj, n', [(None, 2), (['Copper'], 1), (['Iron - alpha'], 1), (['Nickel'], 0)])
+def test_splice_matches_insert_tex(tex_par, tmp_path, key, sobj, n):
+    with open(tex_par) as f:
+        expected = old_set_texture(f.readlines(), key, sobj)
+    ofile = str(tmp_path / 'out.par')
+    assert templates.splice_model_file('texture', key, sobj, tex_par, ofile) == n
+    assert read(ofile) == expected
+
+
+def test_splice_scope(tex_par, tmp_path):
+    ofile = str(tmp_path / 'out.par')
+    templates.splice_model_file('texture', 'EWIMV', ['Copper'], tex_par, ofile)
+    text = read(ofile)
+    # the object before the phases is never replaced
+    assert text.count('#subordinateObject_arbitrary tex') == 2
+    assert text.count('#subordinateObject_E-WIMV') == 1
+    assert text.index('#subordinateObject_E-WIMV') > text.index('#subordinateObject_Copper')
+
+
+def test_set_model_files(tex_par, tmp_path):
+    ofiles = [str(tmp_path / f'out{i}.par') for i in range(2)]
+    assert parameterEditor.set_model('texture', 'EWIMV', [tex_par]*2, ofiles, nworkers=2) == [2, 2]
+    with open(tex_par) as f:
+        expected = old_set_texture(f.readlines(), 'EWIMV')
+    assert [read(ofile) for ofile in ofiles] == [expected]*2
+
+
+def test_unknown_key(tex_par):
+    with pytest.raises(NameError, match='EWIMV'):
+        templates.splice_model_file('texture', 'Fiber', None, tex_par, tex_par)
+
+
+def test_register_inline_key(models, tex_par, tmp_path):
+    lines = ['#subordinateObject_fiber tex', "_pd_proc_ls_pref_orient_corr 'fiber tex'\r\n",
+             '#end_subordinateObject_fiber tex']
+    templates.register_model('texture', 'Fiber', lines)
+    assert templates.model_lines('texture', 'Fiber') == tuple(line.rstrip('\r\n')+'\n' for line in lines)
+    ofile = str(tmp_path / 'out.par')
+    assert templates.splice_model_file('texture', 'Fiber', ['Iron'], tex_par, ofile) == 1
+    text = read(ofile)
+    assert text.count('#subordinateObject_fiber tex') == 1
+    assert text.index('#subordinateObject_fiber tex') < text.index('#subordinateObject_Copper')
+    # a template file name replaces the inline lines
+    templates.register_model('texture', 'Fiber', 'NoTexture.txt')
+    assert templates.model_lines('texture', 'Fiber') == templates.model_lines('texture', 'None')
+
+
+def test_register_inline_kind(models, tmp_path):
+    par = os.path.join(EXAMPLES, 'FeCustart.par')
+    with pytest.raises(AssertionError):
+        templates.register_model('absorption', 'Test', ['#subordinateObject_test abm'])
+    lines = ['#subordinateObject_test abm', '', '#end_subordinateObject_test abm']
+    templates.register_model('absorption', 'Test', lines, objects=('none abm',))
+    ofile = str(tmp_path / 'out.par')
+    assert templates.splice_model_file('absorption', 'Test', None, par, ofile) == 2
+    text = read(ofile)
+    assert '#subordinateObject_none abm' not in text
+    assert text.count('#end_subordinateObject_test abm\n') == 2